@@ -0,0 +1,72 @@
+"""Per-message gating cost: SQLite connection per check vs the in-memory access cache.
+
+Each message used to run is_user_banned + is_channel_activated in every loaded
+cog (about 18), each opening its own connection. Run from the repository root:
+    python benchmarks/bench_access_control.py
+"""
+import os
+import sys
+import time
+import sqlite3
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from shared.access_control import AccessControl  # noqa: E402
+
+COGS = 18
+MESSAGES = 500
+
+
+def make_db(path):
+    db = sqlite3.connect(path)
+    db.executescript('''
+        CREATE TABLE banned_users (user_id TEXT PRIMARY KEY, banned_at DATETIME DEFAULT CURRENT_TIMESTAMP, reason TEXT DEFAULT 'opt-out');
+        CREATE TABLE channel_activations (channel_id TEXT PRIMARY KEY, guild_id TEXT NOT NULL, activated_by TEXT NOT NULL,
+                                          activated_at DATETIME DEFAULT CURRENT_TIMESTAMP, is_active BOOLEAN NOT NULL DEFAULT TRUE);
+    ''')
+    db.executemany('INSERT INTO banned_users (user_id) VALUES (?)', [(str(i),) for i in range(1000)])
+    db.executemany('INSERT INTO channel_activations (channel_id, guild_id, activated_by) VALUES (?, ?, ?)',
+                   [(str(10000 + i), '1', '7') for i in range(1000)])
+    db.commit()
+    db.close()
+
+
+def old_checks(path, user_id, channel_id, guild_id):
+    """BaseCog.is_user_banned + is_channel_activated before the cache"""
+    db = sqlite3.connect(path)
+    cursor = db.cursor()
+    cursor.execute('SELECT 1 FROM banned_users WHERE user_id = ?', (user_id,))
+    banned = cursor.fetchone() is not None
+    db.close()
+    db = sqlite3.connect(path)
+    cursor = db.cursor()
+    cursor.execute('SELECT is_active FROM channel_activations WHERE channel_id = ? AND guild_id = ?', (channel_id, guild_id))
+    result = cursor.fetchone()
+    db.close()
+    return not banned and bool(result[0]) if result else False
+
+
+def main():
+    path = os.path.join(tempfile.mkdtemp(), 'interaction_logs.db')
+    make_db(path)
+    acl = AccessControl(path)
+    acl.load()
+
+    start = time.perf_counter()
+    for i in range(MESSAGES):
+        for _ in range(COGS):
+            old_checks(path, str(5000 + i), '10001', '1')
+    before = (time.perf_counter() - start) / MESSAGES
+
+    start = time.perf_counter()
+    for i in range(MESSAGES):
+        for _ in range(COGS):
+            not acl.is_banned(str(5000 + i)) and acl.is_channel_active('10001', '1')
+    after = (time.perf_counter() - start) / MESSAGES
+
+    print(f"before (SQLite per check, {COGS} cogs)  {before * 1e6:10.1f} us/message")
+    print(f"after (in-memory cache, {COGS} cogs)    {after * 1e6:10.1f} us/message")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,92 @@
+"""LLM calls for bursty channel traffic: one turn per message vs BurstCoalescer.
+
+Ten users each send bursts of one to four short lines a few hundred ms
+apart, as people do in activated channels. "before" routes and generates
+every message on its own (a router call plus a generation each); "after"
+holds messages in BurstCoalescer with the default 1.5 s window. The time is
+simulated at 20x speed. Run from the repository root:
+    python benchmarks/bench_burst_coalescer.py
+"""
+import os
+import sys
+import random
+import asyncio
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from shared.burst_coalescer import BurstCoalescer  # noqa: E402
+from shared.dispatcher import Route  # noqa: E402
+
+USERS = 10
+BURSTS_PER_USER = 10
+SPEEDUP = 20
+
+
+class Author:
+    def __init__(self, user_id):
+        self.id = user_id
+        self.display_name = f"user{user_id}"
+
+
+class Channel:
+    id = 100
+
+
+class Message:
+    channel = Channel()
+
+    def __init__(self, message_id, author, content):
+        self.id = message_id
+        self.author = author
+        self.content = content
+
+
+def script(seed=7):
+    """(delay before sending, user id, text) for every message, per user"""
+    rng = random.Random(seed)
+    plans = []
+    for user_id in range(USERS):
+        plan = []
+        for _ in range(BURSTS_PER_USER):
+            plan.append((rng.uniform(5, 15), user_id))  # think time before a burst
+            for _ in range(rng.randint(0, 3)):
+                plan.append((rng.uniform(0.3, 1.0), user_id))  # follow-up lines
+        plans.append(plan)
+    return plans
+
+
+async def run(label, coalescer=None):
+    calls = {'router': 0, 'generation': 0, 'turns': 0}
+    route = Route(None, Route.ROUTER)
+
+    async def handler(route, message):
+        calls['router'] += 1
+        calls['generation'] += 1
+        calls['turns'] += 1
+
+    async def user(plan):
+        for i, (delay, user_id) in enumerate(plan):
+            await asyncio.sleep(delay / SPEEDUP)
+            message = Message(i, Author(user_id), f"line {i}")
+            if coalescer is None:
+                await handler(route, message)
+            else:
+                coalescer.add(message, route, handler)
+
+    plans = script()
+    await asyncio.gather(*(user(plan) for plan in plans))
+    await asyncio.sleep(coalescer.max_hold if coalescer else 0)
+    messages = sum(len(plan) for plan in plans)
+    print(f"{label:<26} {messages:4d} messages  {calls['turns']:4d} turns  "
+          f"{calls['router'] + calls['generation']:4d} LLM calls")
+
+
+async def main():
+    await run("before (per message)")
+    # The window and hold are scaled by the same speedup as the traffic
+    coalescer = BurstCoalescer(window=1.5 / SPEEDUP, max_hold=5 / SPEEDUP)
+    await run("after (BurstCoalescer)", coalescer)
+    print(f"{'':<26} stats: {coalescer.stats}")
+
+
+if __name__ == '__main__':
+    sys.exit(asyncio.run(main()))
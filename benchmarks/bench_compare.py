@@ -0,0 +1,99 @@
+"""Asking three personas the same question: one after another vs /compare's fan-out.
+
+Each persona reads the channel history (a 40 ms SQLite query) and then
+streams a 1.5 s generation. "before" is a user triggering Grok, Claude3Haiku
+and GPT4O in turn. "after" is CompareCog.fan_out: the generations run at
+once. Both share one history query, since the ContextAssembler builds a
+message's context once. Run from the repository root:
+    python benchmarks/bench_compare.py
+"""
+import os
+import sys
+import time
+import asyncio
+import logging
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.chdir(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from cogs.base_cog import BaseCog  # noqa: E402
+from cogs.compare_cog import CompareCog  # noqa: E402
+from shared.reply_result import ReplyResult  # noqa: E402
+
+PERSONAS = ("Grok", "Claude3Haiku", "GPT4O")
+QUERY_SECONDS = 0.04
+GENERATION_SECONDS = 1.5
+
+
+class Bot:
+    api_client = object()
+    config = object()
+    cogs = {}
+
+    def get_cog(self, name):
+        return None
+
+
+class ContextStore:
+    queries = 0
+
+    async def get_context_messages(self, channel_id, **kwargs):
+        ContextStore.queries += 1
+        await asyncio.sleep(QUERY_SECONDS)
+        return [{'content': 'earlier message', 'is_assistant': False}]
+
+
+class Persona(BaseCog):
+    async def handle_message(self, message):
+        result = ReplyResult(self.name)
+        await self.build_messages(message, "system prompt")
+        result.lap('request')
+        await asyncio.sleep(GENERATION_SECONDS)
+        result.text = "..."
+        result.lap('stream')
+        return result
+
+
+class Guild:
+    id = 1
+
+
+class Author:
+    id = 42
+
+
+class Channel:
+    id = 100
+
+
+class Message:
+    guild = Guild()
+    author = Author()
+    channel = Channel()
+
+    def __init__(self, message_id):
+        self.id = message_id
+        self.content = "Why is the sky blue?"
+
+
+async def main():
+    logging.disable(logging.WARNING)
+    bot = Bot()
+    personas = [Persona(bot, name, name, [], "model") for name in PERSONAS]
+    for persona in personas:
+        persona.context_cog = ContextStore()
+
+    ContextStore.queries = 0
+    start = time.perf_counter()
+    for persona in personas:
+        await persona.handle_message(Message(1))
+    before = time.perf_counter() - start
+    print(f"before (one after another)  {before:5.2f}s  {ContextStore.queries} history queries")
+
+    ContextStore.queries = 0
+    _, wall, sequential = await CompareCog(bot).fan_out(Message(2), personas)
+    print(f"after (CompareCog.fan_out)  {wall:5.2f}s  {ContextStore.queries} history queries  "
+          f"(sequential equivalent {sequential:.2f}s)")
+
+
+if __name__ == '__main__':
+    sys.exit(asyncio.run(main()))
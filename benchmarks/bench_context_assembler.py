@@ -0,0 +1,98 @@
+"""Preparing the request messages of 3 personas and 2 rerolls per Discord message: per cog vs ContextAssembler.
+
+Each message has 50 rows of history, read in 5 ms, and the personas answer
+one after another. "before" is the generate_response loop the cogs had:
+each persona read the history (rerolls reused their snapshot of the
+rows), every persona and reroll mapped it to roles and appended the
+message, then call_openpipe copied every dict again in
+_validate_message_roles. "after" is BaseCog.build_messages: one read and
+one mapping per message, then only a system prompt put in front, and
+call_openpipe sends the messages as they are. Run from the repository
+root:
+    python benchmarks/bench_context_assembler.py
+"""
+import os
+import sys
+import time
+import asyncio
+import logging
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.chdir(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from shared.api import API  # noqa: E402
+from shared.context_assembler import AssembledMessages, ContextAssembler  # noqa: E402
+
+MESSAGES = 200
+HISTORY = 50
+PERSONAS = 3
+CALLERS = 5  # the personas and 2 rerolls
+READ_SECONDS = 0.005
+
+
+class ContextCog:
+    reads = 0
+
+    async def get_context_messages(self, channel_id, **kwargs):
+        ContextCog.reads += 1
+        await asyncio.sleep(READ_SECONDS)
+        rows = [{'user_id': str(i % 4), 'content': f"user{i % 4}: message number {i} " + "words " * 20,
+                 'is_assistant': i % 3 == 0} for i in range(HISTORY - 1)]
+        return [{'user_id': 'SYSTEM', 'content': "[SUMMARY] earlier talk", 'is_assistant': False}] + rows
+
+
+class Channel:
+    id = 100
+
+
+class Message:
+    channel = Channel()
+
+    def __init__(self, message_id):
+        self.id = message_id
+        self.content = "What did we decide?"
+
+
+async def before(api, context_cog, message):
+    for caller in range(CALLERS):
+        if caller < PERSONAS:
+            history = await context_cog.get_context_messages(str(message.channel.id), limit=HISTORY)
+        messages = [{"role": "system", "content": "prompt"}]
+        for msg in history:
+            role = "assistant" if msg['is_assistant'] else "user"
+            content = msg['content']
+            if msg['user_id'] == 'SYSTEM' and content.startswith('[SUMMARY]'):
+                role = "system"
+                content = content[9:].strip()
+            messages.append({"role": role, "content": content})
+        messages.append({"role": "user", "content": message.content})
+        await api._validate_message_roles(messages)
+
+
+async def after(assembler, context_cog, message):
+    for _ in range(CALLERS):
+        messages = (await assembler.assemble(context_cog, message, limit=HISTORY)).with_system("prompt")
+        if not isinstance(messages, AssembledMessages):
+            raise AssertionError("call_openpipe would validate these again")
+        list(messages)
+
+
+async def main():
+    logging.disable(logging.WARNING)
+    api = object.__new__(API)
+    api.session = object()
+    context_cog = ContextCog()
+
+    for name, prepare in (("before (per cog)", lambda message: before(api, context_cog, message)),
+                          ("after (ContextAssembler)", lambda message: after(assembler, context_cog, message))):
+        assembler = ContextAssembler()
+        ContextCog.reads = 0
+        start, cpu = time.perf_counter(), time.process_time()
+        for i in range(MESSAGES):
+            await prepare(Message(i))
+        wall, cpu = time.perf_counter() - start, time.process_time() - cpu
+        print(f"{name:26} {wall / MESSAGES * 1000:6.2f} ms/message  {cpu / MESSAGES * 1000:6.3f} ms CPU/message  "
+              f"{ContextCog.reads / MESSAGES:.0f} history reads/message")
+
+
+if __name__ == '__main__':
+    sys.exit(asyncio.run(main()))
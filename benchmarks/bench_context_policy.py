@@ -0,0 +1,73 @@
+"""History sent per request for a busy channel: the fixed limit=50 vs the context policy.
+
+The channel has a message a minute, a third of them persona replies, and
+context_settings.json as shipped (10 messages, 30 minutes). "before" is
+what every cog asked for, limit=50, whatever the settings said. "after"
+resolves the policy per (guild, channel, persona), cached, and applies it
+in the ring query. Run from the repository root:
+    python benchmarks/bench_context_policy.py
+"""
+import os
+import sys
+import time
+import asyncio
+import logging
+import tempfile
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.chdir(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from cogs.context_cog import ContextCog  # noqa: E402
+from shared import migrations  # noqa: E402
+from shared.context_policy import ContextPolicies, ContextPolicy  # noqa: E402
+from shared.retrieval import row_tokens  # noqa: E402
+
+ROWS = 64
+REQUESTS = 2000
+
+
+async def measure(cog, policy_for):
+    rows = tokens = 0
+    start = time.perf_counter()
+    for _ in range(REQUESTS):
+        messages = await cog.get_context_messages("100", policy=policy_for())
+        rows += len(messages)
+        tokens += sum(row_tokens(message) for message in messages)
+    return (time.perf_counter() - start) / REQUESTS, rows / REQUESTS, tokens / REQUESTS
+
+
+async def main():
+    logging.disable(logging.WARNING)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'channel.db')
+        migrations.migrate(path)
+        cog = ContextCog.__new__(ContextCog)
+        cog.bot = MagicMock()
+        cog.last_messages = {}
+        cog.db_path = path
+        cog.summarizer.threshold = 0
+        now = datetime.now()
+        for i in range(ROWS):
+            is_assistant = i % 3 == 0
+            cog.store.append({
+                'id': str(i), 'channel_id': "100", 'guild_id': "1", 'user_id': "7" if is_assistant else "42",
+                'content': ("Assistant: " if is_assistant else "alice: ") + f"line {i} of the chat " * 8,
+                'is_assistant': is_assistant, 'persona_name': None, 'emotion': None,
+                'timestamp': (now - timedelta(minutes=ROWS - i)).isoformat(),
+            })
+        await cog.store.flush()
+
+        fixed = ContextPolicy(max_messages=50)
+        seconds, rows, tokens = await measure(cog, lambda: fixed)
+        print(f"before (limit=50)       {seconds * 1e6:7.1f} us/request  {rows:5.1f} rows  {tokens:6.0f} tokens")
+
+        policies = ContextPolicies('context_settings.json', {})
+        seconds, rows, tokens = await measure(cog, lambda: policies.resolve("1", "100", "Grok"))
+        print(f"after (context policy)  {seconds * 1e6:7.1f} us/request  {rows:5.1f} rows  {tokens:6.0f} tokens  "
+              f"{policies.stats['hits']} of {REQUESTS} policies from cache")
+        await cog.store.close()
+
+
+if __name__ == '__main__':
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,110 @@
+"""Context reads and writes in a busy channel: SQLite per call vs ContextStore.
+
+The channel already holds 20,000 messages. Each turn writes the user's
+message, reads the last 50 for the prompt, then writes the reply. That is
+the pattern every persona reply follows. "before" is ContextCog as it was:
+a commit per write, and a SELECT on every read, because each write emptied
+the channel's cache entries. "after" is ContextStore, with reads served
+from the ring and writes flushed in batches. Run from the repository root:
+    python benchmarks/bench_context_store.py
+"""
+import os
+import sys
+import time
+import sqlite3
+import asyncio
+import tempfile
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from shared.context_store import ContextStore  # noqa: E402
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+EXISTING = 20000
+TURNS = 300
+CHANNEL = "100"
+
+SELECT = '''
+SELECT DISTINCT m.discord_message_id, m.user_id, m.content, m.is_assistant, m.persona_name, m.emotion, m.timestamp
+FROM messages m
+WHERE m.channel_id = ? AND (? IS NULL OR m.discord_message_id != ?)
+AND m.content IS NOT NULL AND m.content != ''
+ORDER BY m.timestamp DESC LIMIT ?
+'''
+INSERT = '''
+INSERT OR REPLACE INTO messages
+(discord_message_id, channel_id, guild_id, user_id, content, is_assistant, persona_name, emotion, timestamp)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+
+def make_db(path):
+    with sqlite3.connect(path) as conn:
+        with open(os.path.join(ROOT, 'databases', 'schema.sql'), 'r') as f:
+            conn.executescript(f.read())
+        start = datetime(2024, 1, 1)
+        conn.executemany(INSERT, [
+            (str(i), CHANNEL, "1", "42", f"User: message {i} " + "words " * 20, i % 2 == 1, None, None,
+             (start + timedelta(seconds=i)).isoformat())
+            for i in range(EXISTING)
+        ])
+
+
+def row(message_id, content, is_assistant):
+    return {'id': str(message_id), 'channel_id': CHANNEL, 'guild_id': "1", 'user_id': "42", 'content': content,
+            'is_assistant': is_assistant, 'persona_name': None, 'emotion': None,
+            'timestamp': datetime.now().isoformat()}
+
+
+def before(path):
+    reads = 0.0
+    for turn in range(TURNS):
+        message_id = EXISTING + turn * 2
+        for mid, is_assistant in ((message_id, False), (message_id + 1, True)):
+            with sqlite3.connect(path) as conn:
+                conn.execute(INSERT, tuple(row(mid, f"turn {turn}", is_assistant).values()))
+                conn.commit()
+            if not is_assistant:
+                start = time.perf_counter()
+                with sqlite3.connect(path) as conn:
+                    conn.execute(SELECT, (CHANNEL, str(mid), str(mid), 50)).fetchall()
+                reads += time.perf_counter() - start
+    return reads
+
+
+async def after(path):
+    store = ContextStore(path, flush_delay=0.05)
+    reads = 0.0
+    for turn in range(TURNS):
+        message_id = EXISTING + turn * 2
+        store.append(row(message_id, f"turn {turn}", False))
+        start = time.perf_counter()
+        await store.recent(CHANNEL, 50, str(message_id))
+        reads += time.perf_counter() - start
+        store.append(row(message_id + 1, f"turn {turn}", True))
+        await asyncio.sleep(0)
+    await store.close()
+    return reads, dict(store.stats, commits=store.writer.stats['batches'])
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        old_db, new_db = os.path.join(tmp, 'old.db'), os.path.join(tmp, 'new.db')
+        make_db(old_db)
+        make_db(new_db)
+
+        start = time.perf_counter()
+        reads = before(old_db)
+        total = time.perf_counter() - start
+        print(f"before (SQLite per call)  {reads / TURNS * 1000:7.3f} ms/read  {total:6.2f}s total  "
+              f"{TURNS} queries  {TURNS * 2} commits")
+
+        start = time.perf_counter()
+        reads, stats = asyncio.run(after(new_db))
+        total = time.perf_counter() - start
+        print(f"after (ContextStore)      {reads / TURNS * 1000:7.3f} ms/read  {total:6.2f}s total  "
+              f"{stats['loads']} queries  {stats['commits']} commits")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,66 @@
+"""Message dedupe: the old unbounded/arbitrarily pruned sets vs MessageDedupe.
+
+"before" is a cog's `handled_messages` set pruned the way RouterCog did it,
+`set(list(s)[-1000:])` once it grew past 1000, plus `bot.processed_messages`,
+which only ever grew. Every message ID arrives twice, as after a gateway
+resume. Run from the repository root:
+    python benchmarks/bench_dedupe.py
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from shared.dedupe import MessageDedupe, DISCORD_EPOCH_MS  # noqa: E402
+
+MESSAGES = 200000
+RATE = 50  # messages per second
+
+
+def message_ids():
+    start = 1700000000.0
+    for i in range(MESSAGES):
+        now = start + i / RATE
+        snowflake = (int(now * 1000) - DISCORD_EPOCH_MS) << 22 | i % 4096
+        yield now, snowflake
+
+
+def before():
+    handled = set()
+    processed = set()
+    duplicates = 0
+    for _, message_id in message_ids():
+        for _ in range(2):
+            if message_id in handled:
+                duplicates += 1
+                continue
+            handled.add(message_id)
+            processed.add(message_id)
+            if len(handled) > 1000:
+                handled = set(list(handled)[-1000:])
+    return duplicates, len(handled) + len(processed)
+
+
+def after():
+    dedupe = MessageDedupe()
+    for now, message_id in message_ids():
+        dedupe.check(message_id, now=now)
+        dedupe.check(message_id, now=now)
+    return dedupe.stats['duplicates'], len(dedupe)
+
+
+def main():
+    for label, fn in (("before (pruned set + processed)", before), ("after (MessageDedupe)", after)):
+        tracemalloc.start()
+        start = time.perf_counter()
+        duplicates, retained = fn()
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"{label:<32} {elapsed / (2 * MESSAGES) * 1e6:7.2f} us/check  "
+              f"{retained:>7} ids kept  peak {peak / 1024 / 1024:6.1f} MB  {duplicates} duplicates caught")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,159 @@
+"""Per-message dispatch cost: one on_message listener per cog vs the central dispatcher.
+
+discord.py schedules a task per listener for every message, so the old layout
+woke ~18 model cogs plus the router, each lowercasing the content, running the
+gating checks and scanning trigger words, before bot.on_message called the
+router again. Handlers are no-ops here; only dispatch overhead is measured.
+Run from the repository root:
+    python benchmarks/bench_dispatch.py
+"""
+import os
+import sys
+import time
+import asyncio
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from shared.dispatcher import MessageDispatcher  # noqa: E402
+
+MESSAGES = 5000
+TRIGGERS = [
+    ['grok', 'x.ai'], ['claude', 'haiku'], ['gpt', '4o', 'openai'], ['hermes'], ['sonar', 'perplexity'],
+    ['sydney', 'bing'], ['inferor'], ['magnum'], ['nemotron', 'nvidia'], ['qwen'], ['rocinante'],
+    ['unslop'], ['wizard'], ['deepseek'], ['llama', 'vision'], ['sorcerer'], ['ministral'], ['gemini'],
+]
+
+
+class Author:
+    bot = False
+    id = 67890
+
+
+class Channel:
+    id = 100
+
+
+class Guild:
+    id = 1
+
+
+class Message:
+    def __init__(self, message_id, content):
+        self.id = message_id
+        self.content = content
+        self.author = Author()
+        self.channel = Channel()
+        self.guild = Guild()
+        self.mentions = []
+
+
+class Acl:
+    """Stands in for the in-memory access cache"""
+    banned = {'42'}
+    channels = {'100': ('1', True)}
+
+    def is_banned(self, user_id):
+        return str(user_id) in self.banned
+
+    def is_channel_active(self, channel_id, guild_id):
+        entry = self.channels.get(str(channel_id))
+        return entry is not None and entry[1] and entry[0] == str(guild_id)
+
+
+ACL = Acl()
+
+
+class Cog:
+    def __init__(self, name, trigger_words):
+        self.name = name
+        self.trigger_words = trigger_words
+        self.handled_messages = set()
+
+    async def handle_message(self, message):
+        pass
+
+    async def route_message(self, message):
+        pass
+
+    def _mentions_other_bot(self, message):
+        return False
+
+    async def on_message(self, message):
+        """BaseCog.on_message before the dispatcher"""
+        if message.author.bot:
+            return
+        if ACL.is_banned(str(message.author.id)):
+            return
+        if not ACL.is_channel_active(str(message.channel.id), str(message.guild.id)):
+            return
+        msg_content = message.content.lower()
+        if any(word in msg_content for word in self.trigger_words):
+            if message.id not in self.handled_messages:
+                self.handled_messages.add(message.id)
+                await self.handle_message(message)
+
+
+class Router(Cog):
+    def __init__(self, bot):
+        super().__init__("Router", [])
+        self.bot = bot
+
+    async def route_message(self, message):
+        if message.id in self.handled_messages:
+            return
+        self.handled_messages.add(message.id)
+
+    async def on_message(self, message):
+        """RouterCog.on_message before the dispatcher"""
+        if message.author.bot or message.id in self.handled_messages:
+            return
+        if ACL.is_channel_active(str(message.channel.id), str(message.guild.id)):
+            for cog in self.bot.cogs.values():
+                if hasattr(cog, 'trigger_words') and any(word.lower() in message.content.lower() for word in cog.trigger_words):
+                    return
+            await self.route_message(message)
+
+
+class Bot:
+    def __init__(self):
+        self.user = object()
+        self.cogs = {f"Cog{i}": Cog(f"Cog{i}", words) for i, words in enumerate(TRIGGERS)}
+        self.cogs['RouterCog'] = Router(self)
+
+    def get_cog(self, name):
+        return self.cogs.get(name)
+
+
+def messages():
+    texts = ["what do you all think about the weather today?", "hey grok tell me a joke", "I like turtles"]
+    return [Message(i, texts[i % len(texts)]) for i in range(MESSAGES)]
+
+
+async def fan_out(bot, batch):
+    router = bot.cogs['RouterCog']
+    for message in batch:
+        # discord.py runs every listener in its own task, plus bot.on_message
+        tasks = [asyncio.create_task(cog.on_message(message)) for cog in bot.cogs.values()]
+        tasks.append(asyncio.create_task(router.route_message(message)))
+        await asyncio.gather(*tasks)
+
+
+async def central(bot, batch):
+    dispatcher = MessageDispatcher(bot)
+    for message in batch:
+        await asyncio.create_task(dispatcher.dispatch(message))
+
+
+async def main():
+    for label, fn in (("before (listener per cog)", fan_out), ("after (central dispatcher)", central)):
+        bot = Bot()
+        batch = messages()
+        start = time.perf_counter()
+        await fn(bot, batch)
+        elapsed = time.perf_counter() - start
+        print(f"{label:<30} {elapsed / MESSAGES * 1e6:8.1f} us/message")
+
+
+if __name__ == '__main__':
+    with patch('shared.dispatcher.access_control', ACL):
+        sys.exit(asyncio.run(main()))
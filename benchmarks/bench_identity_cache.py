@@ -0,0 +1,63 @@
+"""Storing 250 user messages from 50 authors: fetch_user per message vs IdentityCache.
+
+Each fetch_user is a Discord REST call, modelled as 80 ms. "before" is
+ContextCog._store_message as it was, fetching the author for every message.
+"after" remembers the author carried by each message, as on_message now
+does, and resolves the name from memory. Run from the repository root:
+    python benchmarks/bench_identity_cache.py
+"""
+import os
+import sys
+import time
+import random
+import asyncio
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from shared.identity_cache import IdentityCache  # noqa: E402
+
+MESSAGES = 250
+AUTHORS = 50
+REST_SECONDS = 0.08
+
+
+class User:
+    def __init__(self, user_id):
+        self.id = user_id
+        self.display_name = f"user{user_id}"
+
+
+class Bot:
+    def __init__(self):
+        self.rest_calls = 0
+
+    def get_user(self, user_id):
+        return None
+
+    async def fetch_user(self, user_id):
+        self.rest_calls += 1
+        await asyncio.sleep(REST_SECONDS)
+        return User(user_id)
+
+
+async def main():
+    random.seed(7)
+    authors = [User(i) for i in range(AUTHORS)]
+    stream = [random.choice(authors) for _ in range(MESSAGES)]
+
+    bot = Bot()
+    start = time.perf_counter()
+    for author in stream:
+        (await bot.fetch_user(author.id)).display_name
+    print(f"before (fetch_user per message)  {time.perf_counter() - start:6.2f}s  {bot.rest_calls} REST calls")
+
+    bot, cache = Bot(), IdentityCache()
+    start = time.perf_counter()
+    for author in stream:
+        cache.remember(author, 1)
+        await cache.resolve(bot, author.id, 1)
+    print(f"after (IdentityCache)            {time.perf_counter() - start:6.2f}s  {bot.rest_calls} REST calls  "
+          f"{cache.hit_rate:.0%} hit rate, {cache.fetches_avoided} calls avoided")
+
+
+if __name__ == '__main__':
+    sys.exit(asyncio.run(main()))
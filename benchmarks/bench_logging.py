@@ -0,0 +1,81 @@
+"""Per-message logging overhead: synchronous FileHandler + f-strings vs queued handlers + lazy args.
+
+Run from the repository root:
+    python benchmarks/bench_logging.py
+"""
+import os
+import sys
+import time
+import queue
+import logging
+import tempfile
+from logging.handlers import QueueListener, RotatingFileHandler
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from shared.logging_setup import LocalQueueHandler  # noqa: E402
+
+MESSAGES = 5000
+PROMPT = "You are Grok chatting with someone in a Discord server. " * 40
+HISTORY = [{"role": "user", "content": "hello " * 20} for _ in range(50)]
+FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+
+def per_message_fstring(logger, name="Grok"):
+    """The logging a model cog did for one message before the change"""
+    logger.debug(f"[{name}] Sending {len(HISTORY)} messages to API")
+    logger.debug(f"[{name}] Formatted prompt: {PROMPT}")
+    logger.debug(f"[{name}] Using temperature: {0.7}")
+    logger.debug(f"[API] Making OpenPipe request to model: {'openpipe:xai/grok-beta'}")
+    logger.debug(f"[API] Stream mode: {True}")
+    logger.info(f"[Router] Normalized cog name: {name}")
+
+
+def per_message_lazy(logger, name="Grok"):
+    """The same calls with %-style arguments"""
+    logger.debug("[%s] Sending %s messages to API", name, len(HISTORY))
+    logger.debug("[%s] Formatted prompt: %s", name, PROMPT)
+    logger.debug("[%s] Using temperature: %s", name, 0.7)
+    logger.debug("[API] Making OpenPipe request to model: %s", 'openpipe:xai/grok-beta')
+    logger.debug("[API] Stream mode: %s", True)
+    logger.info("[Router] Normalized cog name: %s", name)
+
+
+def run(label, logger, fn):
+    start = time.perf_counter()
+    for _ in range(MESSAGES):
+        fn(logger)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<40} {elapsed / MESSAGES * 1e6:8.2f} us/message")
+
+
+def main():
+    tmp = tempfile.mkdtemp()
+    devnull = open(os.devnull, 'w')
+
+    # Before: synchronous FileHandler + StreamHandler on the calling thread
+    before = logging.getLogger('bench.before')
+    before.propagate = False
+    before.setLevel(logging.INFO)
+    for handler in (logging.FileHandler(os.path.join(tmp, 'before.log')), logging.StreamHandler(devnull)):
+        handler.setFormatter(logging.Formatter(FORMAT))
+        before.addHandler(handler)
+    run("before (sync handlers, f-strings)", before, per_message_fstring)
+
+    # After: QueueHandler on the calling thread, rotating file + stream in a listener thread
+    after = logging.getLogger('bench.after')
+    after.propagate = False
+    after.setLevel(logging.INFO)
+    log_queue = queue.SimpleQueue()
+    file_handler = RotatingFileHandler(os.path.join(tmp, 'after.log'), maxBytes=10 * 1024 * 1024, backupCount=5)
+    stream_handler = logging.StreamHandler(devnull)
+    for handler in (file_handler, stream_handler):
+        handler.setFormatter(logging.Formatter(FORMAT))
+    listener = QueueListener(log_queue, file_handler, stream_handler)
+    listener.start()
+    after.addHandler(LocalQueueHandler(log_queue))
+    run("after (queued handlers, lazy args)", after, per_message_lazy)
+    listener.stop()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,97 @@
+"""Splitting 100 KB outputs: old rebuild-and-rfind loop vs MessageSplitter.
+
+Streamed: ~8k small deltas, the live-edit case. Whole text: one delta, as for a
+non-streamed reply or help text, where the old loop copies the remainder on
+every split and becomes quadratic (shown again at 1 MB).
+
+Run from the repository root:
+    python benchmarks/bench_message_splitter.py
+"""
+import os
+import sys
+import time
+import random
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from shared.message_splitter import MessageSplitter  # noqa: E402
+
+PREFIX = "[Grok] "
+SIZE = 100 * 1024
+ROUNDS = 20
+
+
+def make_text(rng):
+    words = ["the", "splinter", "tree", "answers", "naïve", "👍🏽", "- item", "value = 1"]
+    parts = []
+    size = 0
+    while size < SIZE:
+        if rng.random() < 0.02:
+            part = "\n```python\n" + "\n".join(f"x_{i} = {i}" for i in range(rng.randint(5, 60))) + "\n```\n"
+        else:
+            part = rng.choice(words) + rng.choice([" ", " ", " ", "\n"])
+        parts.append(part)
+        size += len(part)
+    return "".join(parts)
+
+
+def make_deltas(rng, text):
+    deltas = []
+    pos = 0
+    while pos < len(text):
+        step = rng.randint(2, 24)  # roughly one streamed token
+        deltas.append(text[pos:pos + step])
+        pos += step
+    return deltas
+
+
+def old_split(deltas, name="Grok"):
+    """The loop BaseCog.handle_message used before, without the Discord calls"""
+    messages = []
+    current_chunk = f"[{name}] "
+    for chunk in deltas:
+        current_chunk += chunk
+        while len(current_chunk) > 2000:
+            split_index = current_chunk[:2000].rfind(' ')
+            if split_index == -1:
+                split_index = 1999
+            messages.append(current_chunk[:split_index])
+            current_chunk = f"[{name}] " + current_chunk[split_index:].lstrip()
+    messages.append(current_chunk)
+    return messages
+
+
+def new_split(deltas):
+    splitter = MessageSplitter(PREFIX)
+    messages = []
+    for chunk in deltas:
+        messages.extend(splitter.feed(chunk))
+        splitter.current  # the live edit text is read after every delta
+    messages.append(splitter.finish())
+    return messages
+
+
+def run(label, fn, deltas, rounds=ROUNDS):
+    size = sum(len(delta) for delta in deltas)
+    start = time.perf_counter()
+    for _ in range(rounds):
+        messages = fn(deltas)
+    elapsed = (time.perf_counter() - start) / rounds
+    print(f"{label:<36} {elapsed * 1e3:8.2f} ms  {size / elapsed / 1024 / 1024:8.1f} MB/s  {len(messages)} messages")
+
+
+def main():
+    rng = random.Random(42)
+    text = make_text(rng)
+    deltas = make_deltas(rng, text)
+    print(f"{len(text)} characters in {len(deltas)} deltas")
+    run("streamed, before (rebuild + rfind)", old_split, deltas)
+    run("streamed, after (MessageSplitter)", new_split, deltas)
+    run("whole text, before", old_split, [text])
+    run("whole text, after", new_split, [text])
+    big = [text * 10]
+    run("whole 1 MB text, before", old_split, big, rounds=2)
+    run("whole 1 MB text, after", new_split, big, rounds=2)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
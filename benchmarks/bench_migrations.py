@@ -0,0 +1,75 @@
+"""Channel history query on 200,000 messages: single-column indexes vs migration 1.
+
+200 channels share the table. "before" is the legacy schema, where SQLite
+has to choose between idx_messages_channel (then sort the channel's rows)
+and idx_messages_timestamp (then walk the whole table newest first). "after"
+is the same data after migrate(), which finds the newest rows of the
+channel in idx_messages_channel_time. Run from the repository root:
+    python benchmarks/bench_migrations.py
+"""
+import os
+import sys
+import time
+import shutil
+import sqlite3
+import logging
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.chdir(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from shared.migrations import migrate  # noqa: E402
+
+MESSAGES = 200000
+CHANNELS = 200
+QUERIES = 500
+
+HISTORY = '''
+SELECT content, is_assistant, persona_name, timestamp FROM messages
+WHERE channel_id = ? ORDER BY timestamp DESC LIMIT 50
+'''
+LEGACY_INDEXES = '''
+CREATE INDEX idx_messages_channel ON messages(channel_id);
+CREATE INDEX idx_messages_persona ON messages(persona_name);
+CREATE INDEX idx_messages_discord_id ON messages(discord_message_id);
+CREATE INDEX idx_summaries_channel ON chat_summaries(channel_id);
+'''
+
+
+def make_legacy(path):
+    with sqlite3.connect(path) as conn:
+        with open('databases/schema.sql', 'r') as f:
+            conn.executescript(f.read())
+        conn.executescript(LEGACY_INDEXES)
+        conn.executemany(
+            'INSERT INTO messages (discord_message_id, channel_id, user_id, content, is_assistant, timestamp) '
+            'VALUES (?, ?, ?, ?, ?, ?)',
+            ((str(i), str(i % CHANNELS), "42", f"message {i}", i % 2, f"2024-01-01 {i // 3600 % 24:02d}:{i // 60 % 60:02d}:{i % 60:02d}.{i:06d}")
+             for i in range(MESSAGES))
+        )
+
+
+def run(path):
+    with sqlite3.connect(path) as conn:
+        plan = conn.execute(f'EXPLAIN QUERY PLAN {HISTORY}', ("7",)).fetchall()[-1][-1]
+        start = time.perf_counter()
+        for i in range(QUERIES):
+            conn.execute(HISTORY, (str(i % CHANNELS),)).fetchall()
+        return (time.perf_counter() - start) / QUERIES * 1000, plan
+
+
+def main():
+    logging.disable(logging.WARNING)
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy, migrated = os.path.join(tmp, 'legacy.db'), os.path.join(tmp, 'migrated.db')
+        make_legacy(legacy)
+        shutil.copy(legacy, migrated)
+        migrate(migrated)
+
+        ms, plan = run(legacy)
+        print(f"before (single-column indexes)  {ms:6.3f} ms/query  {plan}")
+        ms, plan = run(migrated)
+        print(f"after (migration 1)             {ms:6.3f} ms/query  {plan}")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
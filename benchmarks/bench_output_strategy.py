@@ -0,0 +1,79 @@
+"""REST calls to deliver one long streamed response, for each output strategy.
+
+A 12,000 character response (a long Nemotron answer) is streamed through
+BaseCog.stream_reply in 100 character chunks, 20 ms apart, with the real
+edit scheduler pacing live edits. Sends and edits reaching the simulated
+Discord are counted; "split" is what every response used before. Run from
+the repository root:
+    python benchmarks/bench_output_strategy.py
+"""
+import os
+import sys
+import asyncio
+import logging
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.chdir(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from cogs.base_cog import BaseCog  # noqa: E402
+from shared.output_strategy import OutputStrategy, SPLIT, ATTACHMENT, PAGINATE  # noqa: E402
+
+RESPONSE_CHARS = 12000
+CHUNK = 100
+CHUNK_DELAY = 0.02
+
+
+class Bot:
+    api_client = object()
+    config = object()
+
+    def get_cog(self, name):
+        return None
+
+
+class Channel:
+    id = 100
+
+
+class Message:
+    channel = Channel()
+    counts = None
+
+    def __init__(self, message_id):
+        self.id = message_id
+
+    async def edit(self, **kwargs):
+        Message.counts['edits'] += 1
+
+
+async def chunks():
+    text = ("The quick brown fox jumps over the lazy dog. " * 400)[:RESPONSE_CHARS]
+    for i in range(0, len(text), CHUNK):
+        await asyncio.sleep(CHUNK_DELAY)
+        yield text[i:i + CHUNK]
+
+
+async def run(cog, mode):
+    counts = Message.counts = {'sends': 0, 'edits': 0}
+
+    async def send_reply(message, content, view=None):
+        counts['sends'] += 1
+        return Message(100 + counts['sends'])
+
+    cog.send_reply = send_reply
+    with patch('cogs.base_cog.output_strategy', OutputStrategy(mode, max_parts=2)):
+        _, sent = await cog.stream_reply(Message(1), chunks())
+    total = counts['sends'] + counts['edits']
+    print(f"{mode:<12} {counts['sends']:3d} sends  {counts['edits']:3d} edits  {total:3d} REST calls  "
+          f"{len(sent)} messages in channel")
+
+
+async def main():
+    logging.disable(logging.WARNING)
+    cog = BaseCog(Bot(), "Nemotron", "Nemotron", [], "nemotron")
+    for mode in (SPLIT, ATTACHMENT, PAGINATE):
+        await run(cog, mode)
+
+
+if __name__ == '__main__':
+    sys.exit(asyncio.run(main()))
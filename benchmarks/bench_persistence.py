@@ -0,0 +1,98 @@
+"""Writes to the messages table during 200 replies: a connection per write vs MessageWriter.
+
+Every reply stores the user's message and the reply in the context and
+logs the interaction (two more rows). 50 concurrent tasks do this, as
+replies in many channels would. "before" opens a connection and commits for
+each write, as ContextCog and log_interactions did. "after" sends them all
+through the single MessageWriter. Run from the repository root:
+    python benchmarks/bench_persistence.py
+"""
+import os
+import sys
+import time
+import asyncio
+import logging
+import sqlite3
+import tempfile
+
+import aiosqlite
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.chdir(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from shared.persistence import MessageWriter, MESSAGE_COLUMNS  # noqa: E402
+
+REPLIES = 200
+CONCURRENCY = 50
+
+LOG = ("INSERT INTO messages (channel_id, guild_id, user_id, content, is_assistant, timestamp) "
+       "VALUES (?, '1', '42', ?, ?, '2024-01-01T00:00:00')")
+
+
+def make_db(path):
+    with sqlite3.connect(path) as conn:
+        with open('databases/schema.sql', 'r') as f:
+            conn.executescript(f.read())
+
+
+def row(message_id, channel_id, content, is_assistant):
+    return {'id': str(message_id), 'channel_id': channel_id, 'guild_id': "1", 'user_id': "42", 'content': content,
+            'is_assistant': is_assistant, 'persona_name': None, 'emotion': None, 'timestamp': '2024-01-01T00:00:00'}
+
+
+async def before(path):
+    commits = 0
+
+    async def write(sql, params):
+        nonlocal commits
+        async with aiosqlite.connect(path, timeout=30) as conn:
+            await conn.execute(sql, params)
+            await conn.commit()
+            commits += 1
+
+    async def reply(i):
+        channel = str(i % CONCURRENCY)
+        for message_id, is_assistant in ((i * 2, False), (i * 2 + 1, True)):
+            values = row(message_id, channel, f"message {message_id}", is_assistant)
+            await write(f'INSERT OR REPLACE INTO messages ({MESSAGE_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                        tuple(values.values()))
+        await write(LOG, (channel, "question", False))
+        await write(LOG, (channel, "answer", True))
+
+    await asyncio.gather(*(reply(i) for i in range(REPLIES)))
+    return commits
+
+
+async def after(path):
+    writer = MessageWriter(path, flush_delay=0.05)
+
+    async def reply(i):
+        channel = str(i % CONCURRENCY)
+        writer.upsert(row(i * 2, channel, f"message {i * 2}", False))
+        writer.upsert(row(i * 2 + 1, channel, f"message {i * 2 + 1}", True))
+
+        async def log(conn):
+            await conn.execute(LOG, (channel, "question", False))
+            await conn.execute(LOG, (channel, "answer", True))
+        await writer.execute(log)
+
+    await asyncio.gather(*(reply(i) for i in range(REPLIES)))
+    await writer.close()
+    return writer.stats['batches']
+
+
+def main():
+    logging.disable(logging.WARNING)
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, run in (("before (connection per write)", before), ("after (MessageWriter)        ", after)):
+            path = os.path.join(tmp, f"{run.__name__}.db")
+            make_db(path)
+            start = time.perf_counter()
+            commits = asyncio.run(run(path))
+            elapsed = time.perf_counter() - start
+            with sqlite3.connect(path) as conn:
+                rows = conn.execute("SELECT COUNT(*) FROM messages").fetchone()[0]
+            print(f"{label}  {elapsed:5.2f}s  {commits:4d} commits  {rows} rows")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,86 @@
+"""Startup cost of one gateway client per persona vs webhook personas on one client.
+
+With PERSONA_CLIENTS every persona that has a token logs in its own
+discord.Client with the members intent, so each one keeps a full copy of every
+guild, channel and member. Webhook personas share the bot's single cache. The
+gateway can't be reached from here, so each client is built and fed synthetic
+GUILD_CREATE payloads the way the READY handshake would; the network side
+(one more websocket, heartbeat and IDENTIFY per persona) comes on top and is
+not measured. Each mode runs in a fresh interpreter so RSS is comparable.
+Run from the repository root:
+    python benchmarks/bench_persona_clients.py
+"""
+import os
+import sys
+import time
+import asyncio
+import resource
+import subprocess
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+PERSONAS = 16  # persona cogs that ship with a *_TOKEN variable
+GUILDS = 5
+MEMBERS = 2000
+CHANNELS = 40
+
+
+def guild_payload(guild_id):
+    return {
+        'id': str(guild_id),
+        'name': f'guild{guild_id}',
+        'member_count': MEMBERS,
+        'roles': [{'id': str(guild_id), 'name': '@everyone', 'permissions': '0', 'position': 0,
+                   'color': 0, 'hoist': False, 'managed': False, 'mentionable': False}],
+        'channels': [{'id': str(guild_id * 1000 + i), 'type': 0, 'name': f'channel{i}', 'position': i,
+                      'permission_overwrites': []} for i in range(CHANNELS)],
+        'members': [{'user': {'id': str(10 ** 17 + guild_id * MEMBERS + i), 'username': f'user{i}',
+                              'discriminator': '0', 'avatar': None, 'global_name': f'User {i}'},
+                     'roles': [], 'joined_at': '2024-01-01T00:00:00+00:00', 'deaf': False, 'mute': False,
+                     'flags': 0} for i in range(MEMBERS)],
+    }
+
+
+def make_client():
+    import discord
+    intents = discord.Intents.default()
+    intents.messages = True
+    intents.message_content = True
+    intents.guilds = True
+    intents.members = True
+    client = discord.Client(intents=intents)
+    for guild_id in range(1, GUILDS + 1):
+        client._connection._add_guild(discord.Guild(data=guild_payload(guild_id), state=client._connection))
+    return client
+
+
+async def run(mode):
+    start = time.perf_counter()
+    import discord  # noqa: F401 - imported by both modes, counted in startup
+    clients = [make_client()]  # the main bot
+    if mode == 'clients':
+        clients += [make_client() for _ in range(PERSONAS)]
+    else:
+        from shared.persona_webhooks import PersonaPresenter
+        presenter = PersonaPresenter()  # noqa: F841 - webhooks are created lazily per channel
+    elapsed = time.perf_counter() - start
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    print(f"{elapsed:.3f} {usage.ru_utime + usage.ru_stime:.3f} {usage.ru_maxrss}")
+    for client in clients:
+        await client.close()
+
+
+def main():
+    if len(sys.argv) > 1:
+        asyncio.run(run(sys.argv[1]))
+        return
+    rows = (("before (client per persona)", 'clients'), ("after (webhook personas)", 'webhooks'))
+    print(f"{'':<28} {'startup':>9} {'cpu':>8} {'max rss':>10}")
+    for label, mode in rows:
+        out = subprocess.run([sys.executable, __file__, mode], capture_output=True, text=True, check=True).stdout
+        elapsed, cpu, rss = out.split()
+        print(f"{label:<28} {float(elapsed):8.2f}s {float(cpu):7.2f}s {int(rss) / 1024:7.1f} MB")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,82 @@
+"""System prompt rendering: per-message ZoneInfo + str.format vs PromptStore.render.
+
+"before" is BaseCog.format_prompt as it was: build ZoneInfo, read the clock,
+then str.format the whole template on every message. Run from the repository
+root:
+    python benchmarks/bench_prompt_store.py
+"""
+import os
+import sys
+import time
+import json
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from shared.prompt_store import PromptStore  # noqa: E402
+
+MESSAGES = 50000
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+class Guild:
+    id = 1
+    name = "Server"
+
+
+class Channel:
+    id = 100
+    name = "general"
+
+
+class Author:
+    id = 42
+    display_name = "Alice"
+
+
+class Message:
+    guild = Guild()
+    channel = Channel()
+    author = Author()
+
+
+def before(raw_prompt, message):
+    tz = ZoneInfo("America/Los_Angeles")
+    current_time = datetime.now(tz).strftime("%I:%M %p")
+    return raw_prompt.format(
+        MODEL_ID="Grok",
+        USERNAME=message.author.display_name,
+        DISCORD_USER_ID=message.author.id,
+        TIME=current_time,
+        TZ="Pacific Time",
+        SERVER_NAME=message.guild.name if message.guild else "Direct Message",
+        CHANNEL_NAME=message.channel.name if hasattr(message.channel, 'name') else "DM"
+    )
+
+
+def main():
+    prompts_file = os.path.join(ROOT, 'prompts', 'consolidated_prompts.json')
+    with open(prompts_file, 'r', encoding='utf-8') as f:
+        raw_prompt = json.load(f)['system_prompts']['grok']
+    store = PromptStore(':memory:', prompts_file)
+    store.loaded = True  # no overrides table needed here
+    store.register("Grok", "grok", "")
+    message = Message()
+    assert before(raw_prompt, message) == store.render("Grok", message)
+
+    start = time.perf_counter()
+    for _ in range(MESSAGES):
+        before(raw_prompt, message)
+    old = (time.perf_counter() - start) / MESSAGES
+
+    start = time.perf_counter()
+    for _ in range(MESSAGES):
+        store.render("Grok", message)
+    new = (time.perf_counter() - start) / MESSAGES
+
+    print(f"before (ZoneInfo + str.format)  {old * 1e6:7.2f} us/message")
+    print(f"after (PromptStore.render)      {new * 1e6:7.2f} us/message")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,109 @@
+"""Relevant-history search on a 1,000,000-message channel: LIKE scan vs the FTS5 index.
+
+Messages are 12 words drawn from a 20,000-word vocabulary with a Zipf
+distribution, so some query words are common and some are rare. "before"
+is the only way to find old messages without an index: a LIKE scan per
+query word, stopping at 8 hits. "after" is HistorySearch: a BM25 query on
+messages_fts, built by migration 2, which also times the backfill, with
+words found in over 2% of messages left out. Run from the repository root:
+    python benchmarks/bench_retrieval.py
+"""
+import os
+import sys
+import time
+import random
+import itertools
+import sqlite3
+import asyncio
+import logging
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.chdir(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from shared import migrations  # noqa: E402
+from shared.retrieval import HistorySearch, match_query  # noqa: E402
+
+MESSAGES = int(os.getenv("BENCH_MESSAGES", "1000000"))
+VOCABULARY = 20000
+WORDS = 12
+QUERIES = 50
+CHANNEL = "100"
+
+
+def word(i):
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    out = ""
+    i += 26 * 26  # at least three letters
+    while i:
+        i, r = divmod(i, 26)
+        out += letters[r]
+    return out
+
+
+def make_db(path, rng):
+    weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(VOCABULARY)))
+    vocabulary = [word(i) for i in range(VOCABULARY)]
+    with sqlite3.connect(path) as conn:
+        with open('databases/schema.sql', 'r') as f:
+            conn.executescript(f.read())
+        for start in range(0, MESSAGES, 100000):
+            conn.executemany(
+                'INSERT INTO messages (discord_message_id, channel_id, user_id, content, is_assistant, timestamp) '
+                'VALUES (?, ?, ?, ?, 0, ?)',
+                ((str(i), CHANNEL, "42", "User: " + " ".join(rng.choices(vocabulary, cum_weights=weights, k=WORDS)),
+                  f"2024-01-01T00:00:{i:07d}") for i in range(start, min(start + 100000, MESSAGES)))
+            )
+    return vocabulary
+
+
+def like_scan(conn, text):
+    found = {}
+    for term in match_query(text).replace('"', '').split(' OR '):
+        for message_id, content in conn.execute(
+                "SELECT discord_message_id, content FROM messages WHERE channel_id = ? AND content LIKE ? LIMIT 8",
+                (CHANNEL, f"% {term}%")):
+            found.setdefault(message_id, content)
+        if len(found) >= 8:
+            break
+    return found
+
+
+async def main():
+    logging.disable(logging.WARNING)
+    rng = random.Random(7)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'channel.db')
+        start = time.perf_counter()
+        vocabulary = make_db(path, rng)
+        print(f"built {MESSAGES:,} messages in {time.perf_counter() - start:.1f}s")
+
+        start = time.perf_counter()
+        migrations.migrate(path)
+        print(f"migration 2 backfilled the index in {time.perf_counter() - start:.1f}s")
+
+        # Questions mixing a common word with rarer ones
+        questions = [" ".join([vocabulary[rng.randrange(50)], vocabulary[rng.randrange(500, 5000)],
+                               vocabulary[rng.randrange(5000, VOCABULARY)]]) for _ in range(QUERIES)]
+
+        with sqlite3.connect(path) as conn:
+            start = time.perf_counter()
+            for question in questions[:5]:
+                like_scan(conn, question)
+            before = (time.perf_counter() - start) / 5
+        print(f"before (LIKE scan)      {before * 1000:9.1f} ms/query")
+
+        search = HistorySearch(path)
+        try:
+            for question in questions:
+                await search.search(CHANNEL, question)
+        finally:
+            # Its worker thread outlives the event loop unless closed here
+            await search.close()
+        after = search.stats['seconds'] / search.stats['queries']
+        print(f"after (FTS5 + BM25)     {after * 1000:9.1f} ms/query  "
+              f"{search.stats['matches'] / search.stats['queries']:.1f} matches/query  "
+              f"{search.stats['common_terms']} common words left out")
+
+
+if __name__ == '__main__':
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,98 @@
+"""Time a reply handler holds after streaming: inline side effects vs the background queue.
+
+Discord REST calls and SQLite writes are simulated with sleeps of typical
+latency. "before" awaits the nickname edit, reaction, context write and
+interaction log one after another for every reply, as BaseCog did; "after"
+submits them to SideEffectQueue. REST calls issued counts the nickname edits
+and reactions that reached Discord. Run from the repository root:
+    python benchmarks/bench_side_effects.py
+"""
+import os
+import sys
+import time
+import asyncio
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from shared.side_effects import SideEffectQueue, HIGH  # noqa: E402
+
+REPLIES = 100
+REST_LATENCY = 0.08
+DB_LATENCY = 0.01
+
+
+class Counter:
+    rest = 0
+    db = 0
+
+
+class Member:
+    async def edit(self, nick):
+        Counter.rest += 1
+        await asyncio.sleep(REST_LATENCY)
+
+
+class Guild:
+    id = 1
+    me = Member()
+
+
+class Message:
+    def __init__(self, message_id):
+        self.id = message_id
+
+    async def add_reaction(self, emoji):
+        Counter.rest += 1
+        await asyncio.sleep(REST_LATENCY)
+
+
+async def context_write():
+    Counter.db += 1
+    await asyncio.sleep(DB_LATENCY)
+
+
+async def log_write(entries=None):
+    Counter.db += 1
+    await asyncio.sleep(DB_LATENCY)
+
+
+async def before(guild, message):
+    await guild.me.edit(nick="Grok")
+    await message.add_reaction("😄")
+    await context_write()
+    await log_write()
+
+
+def after(queue):
+    async def handler(guild, message):
+        queue.set_nickname(guild, "Grok")
+        queue.add_reaction(message, "😄")
+        queue.submit(context_write, HIGH)
+        queue.submit_batch('log', message.id, log_write)
+    return handler
+
+
+async def run(label, handler, queue=None):
+    Counter.rest = Counter.db = 0
+    guild = Guild()
+    held = 0.0
+    start = time.perf_counter()
+    for i in range(REPLIES):
+        t0 = time.perf_counter()
+        await handler(guild, Message(i))
+        held += time.perf_counter() - t0
+        await asyncio.sleep(0.005)  # next reply arrives a little later
+    if queue:
+        await queue.drain()
+    total = time.perf_counter() - start
+    print(f"{label:<28} {held / REPLIES * 1000:8.2f} ms held/reply  {Counter.rest:4d} REST calls  "
+          f"{Counter.db:4d} DB writes  {total:5.2f}s total")
+
+
+async def main():
+    await run("before (inline awaits)", before)
+    queue = SideEffectQueue()
+    await run("after (SideEffectQueue)", after(queue), queue)
+
+
+if __name__ == '__main__':
+    sys.exit(asyncio.run(main()))
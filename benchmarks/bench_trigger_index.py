@@ -0,0 +1,72 @@
+"""Trigger detection: per-cog substring scans vs the compiled TriggerIndex.
+
+"before" is what one message cost before the dispatcher: every model cog's
+`any(word in content)` plus RouterCog's `word.lower() in content.lower()` pass
+over all cogs. Run from the repository root:
+    python benchmarks/bench_trigger_index.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from shared.trigger_index import TriggerIndex  # noqa: E402
+
+MESSAGES = 20000
+TRIGGERS = [
+    ['claude3haiku', 'haiku', 'claude'], ['deepseek', 'deepseek-chat'], ['gpt4o', '4o', 'openai'], ['grok', 'xAI'],
+    ['hermes', 'hermes-3', 'nous'], ['inferor'], ['llamavision', 'vision', 'image', 'describe this image'],
+    ['magnum', 'anthracite'], ['nemotron', 'nvidia'], ['qwen', 'qwen2.5'], ['rocinante'],
+    ['sonar', 'perplexity', 'search'], ['sorcerer', 'sorcererlm'], ['sydney', 'court'], ['unslop', 'unslopnemo'],
+    ['wizard', 'wizardlm'],
+]
+TEXTS = [
+    "what do you all think about the weather today? I was reading an article earlier about it",
+    "hey grok tell me a joke",
+    "I have 40 apples and some oranges, can someone help me count them all",
+    "ok so the meeting is at 4 and then we go get food after, anyone in?",
+]
+
+
+class Cog:
+    def __init__(self, name, trigger_words):
+        self.name = name
+        self.trigger_words = trigger_words
+
+    async def handle_message(self, message):
+        pass
+
+
+def before(cogs, content):
+    msg_content = content.lower()
+    hit = None
+    for cog in cogs:  # one BaseCog.on_message per cog
+        if any(word in msg_content for word in cog.trigger_words):
+            hit = hit or cog
+    for cog in cogs:  # RouterCog.on_message
+        if any(word.lower() in content.lower() for word in cog.trigger_words):
+            break
+    return hit
+
+
+def main():
+    cogs = [Cog(f"Cog{i}", words) for i, words in enumerate(TRIGGERS)]
+    index = TriggerIndex(cogs)
+    messages = [TEXTS[i % len(TEXTS)] for i in range(MESSAGES)]
+
+    start = time.perf_counter()
+    for content in messages:
+        before(cogs, content)
+    old = (time.perf_counter() - start) / MESSAGES
+
+    start = time.perf_counter()
+    for content in messages:
+        index.best(content)
+    new = (time.perf_counter() - start) / MESSAGES
+
+    print(f"before (substring scans per cog + router)  {old * 1e6:8.2f} us/message")
+    print(f"after (TriggerIndex.best)                   {new * 1e6:8.2f} us/message")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -13,19 +13,21 @@ import re
 import pytz
 import traceback
 from shared.api import api  # Import the API singleton
+from shared.logging_setup import configure_logging
+from shared.access_control import access_control
+from shared.dispatcher import MessageDispatcher
+from shared.dedupe import message_dedupe
+from shared.prompt_store import prompt_store
+from shared.side_effects import side_effects
+from shared.generation_scheduler import generation_scheduler
+from shared.burst_coalescer import burst_coalescer
+from shared.context_policy import context_policies
 
 # Define BOT_DIR as the current working directory
 BOT_DIR = os.path.dirname(os.path.abspath(__file__))
 
-# Configure logging
-logging.basicConfig(
-    level=config.LOG_LEVEL, 
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(),
-        logging.FileHandler('bot.log')
-    ]
-)
+# Configure logging (queued, rotating; file and stream I/O happen off the event loop)
+configure_logging('logs/bot.log', level=config.LOG_LEVEL)
 
 # Set up intents
 intents = discord.Intents.default()
@@ -39,7 +41,6 @@ intents.members = True
 class SplinterTreeBot(commands.Bot):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.processed_messages = set()
         self.api_client = api
         self.loaded_cogs = []
         self.message_history = {}
@@ -55,6 +56,19 @@ class SplinterTreeBot(commands.Bot):
         self.tree.on_error = self.on_app_command_error  # Set up error handler for slash commands
         self._cleanup_tasks = []
         self.config = config  # Store config module for cogs to access
+        # Routes each message to exactly one handler, within the shared generation limits;
+        # quick follow-ups in activated channels are merged into one turn first
+        self.dispatcher = MessageDispatcher(self, dedupe=message_dedupe, scheduler=generation_scheduler,
+                                            coalescer=burst_coalescer)
+
+    async def add_cog(self, cog, /, **kwargs):
+        await super().add_cog(cog, **kwargs)
+        self.dispatcher.invalidate()
+
+    async def remove_cog(self, name, /, **kwargs):
+        cog = await super().remove_cog(name, **kwargs)
+        self.dispatcher.invalidate()
+        return cog
 
     async def close(self):
         """Cleanup when bot is shutting down"""
@@ -73,6 +87,11 @@ class SplinterTreeBot(commands.Bot):
         if update_status.is_running():
             update_status.cancel()
 
+        # Answer the bursts still waiting to be merged, then finish queued reactions,
+        # context writes and logs while cogs are still loaded
+        await burst_coalescer.close()
+        await side_effects.drain()
+
         # Unload all cogs
         for extension in list(self.extensions.keys()):
             try:
@@ -168,7 +187,13 @@ async def load_context_settings():
         if os.path.exists(settings_file):
             with open(settings_file, 'r') as f:
                 settings = json.load(f)
-                config.CONTEXT_WINDOWS.update(settings)
+                # ContextCog saves the channel sizes under CONTEXT_WINDOWS, next to the default;
+                # anything else in the file (named presets like "default") isn't a channel
+                windows = settings.get('CONTEXT_WINDOWS') if isinstance(settings, dict) else None
+                if isinstance(windows, dict):
+                    config.CONTEXT_WINDOWS.update({str(channel): size for channel, size in windows.items()
+                                                   if str(channel).isdigit() and isinstance(size, int)})
+                context_policies.invalidate()
                 logging.info("Loaded context window settings")
     except Exception as e:
         logging.error(f"Error loading context settings: {str(e)}")
@@ -189,6 +214,11 @@ async def setup_cogs(bot: SplinterTreeBot):
         logging.error(f"Failed to initialize API client: {str(e)}")
         return
 
+    # Load ban and channel activation state once; ManagementCog writes through it
+    access_control.load()
+    # Prompt overrides, likewise written through by the prompt commands
+    prompt_store.load()
+
     bot.loaded_cogs = []  # Reset loaded cogs list
 
     # Load context settings
@@ -211,7 +241,7 @@ async def setup_cogs(bot: SplinterTreeBot):
             module_name = filename[:-3]
             try:
                 await bot.load_extension(f'cogs.{module_name}')
-                logging.debug(f"Attempting to load cog: {module_name}")
+                logging.debug("Attempting to load cog: %s", module_name)
                 
                 # Dynamically derive the cog class name from the module name
                 class_name = ''.join(word.capitalize() for word in module_name.split('_'))
@@ -251,7 +281,7 @@ async def setup_cogs(bot: SplinterTreeBot):
 
     logging.info(f"Total loaded cogs with handle_message: {len(bot.loaded_cogs)}")
     for cog in bot.loaded_cogs:
-        logging.debug(f"Available cog: {cog.name} (Vision: {getattr(cog, 'supports_vision', False)})")
+        logging.debug("Available cog: %s (Vision: %s)", cog.name, getattr(cog, 'supports_vision', False))
     logging.info(f"Loaded extensions: {list(bot.extensions.keys())}")
 
     bot.cogs_loaded = True  # Set the flag to indicate cogs have been loaded
@@ -259,28 +289,6 @@ async def setup_cogs(bot: SplinterTreeBot):
 # Initialize bot with a default command prefix
 bot = SplinterTreeBot(command_prefix='!', intents=intents, help_command=None)
 
-# File to persist processed messages
-PROCESSED_MESSAGES_FILE = os.path.join(BOT_DIR, 'processed_messages.json')
-
-def load_processed_messages():
-    """Load processed messages from file"""
-    if os.path.exists(PROCESSED_MESSAGES_FILE):
-        try:
-            with open(PROCESSED_MESSAGES_FILE, 'r') as f:
-                bot.processed_messages = set(json.load(f))
-            logging.info(f"Loaded {len(bot.processed_messages)} processed messages from file")
-        except Exception as e:
-            logging.error(f"Error loading processed messages: {str(e)}")
-
-def save_processed_messages():
-    """Save processed messages to file"""
-    try:
-        with open(PROCESSED_MESSAGES_FILE, 'w') as f:
-            json.dump(list(bot.processed_messages), f)
-        logging.info(f"Saved {len(bot.processed_messages)} processed messages to file")
-    except Exception as e:
-        logging.error(f"Error saving processed messages: {str(e)}")
-
 @tasks.loop(seconds=30)
 async def update_status():
     """Update bot status"""
@@ -344,17 +352,18 @@ async def on_message(message):
     if message.author == bot.user:
         return
 
-    # Process commands first
-    await bot.process_commands(message)
-
     # Update last interaction
     bot.last_interaction['user'] = message.author.display_name
     bot.last_interaction['time'] = datetime.now(pytz.timezone('US/Pacific'))
 
-    # Get the router cog and handle the message
-    router_cog = bot.get_cog('RouterCog')
-    if router_cog:
-        await router_cog.handle_message(message)
+    # Valid commands are only run as commands, never routed to a persona
+    ctx = await bot.get_context(message)
+    if ctx.valid:
+        await bot.invoke(ctx)
+        return
+
+    # Gating, trigger resolution and routing happen once, in the dispatcher
+    await bot.dispatcher.dispatch(message)
 
 @bot.event
 async def on_command_error(ctx, error):
@@ -373,7 +382,6 @@ async def on_command_error(ctx, error):
 # Run bot
 if __name__ == "__main__":
     logging.debug("Starting bot...")
-    load_processed_messages()  # Load processed messages on startup
     
     async def run_bot():
         try:
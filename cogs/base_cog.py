@@ -1,53 +1,90 @@
 import discord
 from discord.ext import commands
-import json
 import logging
 import os
-from datetime import datetime
-from zoneinfo import ZoneInfo
 import time
-from shared.utils import analyze_emotion, log_interaction
+from shared.utils import analyze_emotion, log_interactions
+from shared.access_control import access_control
+from shared.edit_scheduler import edit_scheduler
+from shared.message_splitter import MessageSplitter
+from shared.output_strategy import output_strategy
+from shared.reply_result import ReplyResult
+from shared.persona_webhooks import persona_presenter
+from shared.dedupe import message_dedupe
+from shared.prompt_store import prompt_store
+from shared.side_effects import side_effects, HIGH
+from shared.context_assembler import context_assembler
+from config import PERSONA_CLIENTS, PERSONA_AVATAR_URL
 import re
 import aiohttp
 import asyncio
-import sqlite3
 from typing import Optional, Dict, AsyncGenerator
+from collections import OrderedDict
 from urllib.parse import urlparse
 
+# Context snapshots kept per cog so rerolls see the same history as the original response
+HISTORY_SNAPSHOTS = 256
+
 class RerollView(discord.ui.View):
-    def __init__(self, cog, message, original_response):
+    def __init__(self, cog, message, original_response, history=None):
         super().__init__(timeout=300)  # 5 minute timeout
         self.cog = cog
         self.message = message
         self.original_response = original_response
+        self.history = history  # Context the original response was generated from
+        self.generation: Optional[asyncio.Task] = None  # Reroll currently streaming
+
+    @staticmethod
+    def _editor(interaction: discord.Interaction):
+        """Edits the button's message through the interaction, which also works for webhook messages"""
+        async def edit(target, content, view=None, **extra):
+            kwargs = {'content': content, **extra}
+            if view is not None:
+                kwargs['view'] = view
+            if target is interaction.message:
+                await interaction.edit_original_response(**kwargs)
+            else:
+                await target.edit(**kwargs)
+        return edit
 
     @discord.ui.button(label="🎲 Reroll Response", style=discord.ButtonStyle.secondary, custom_id="reroll_button")
     async def reroll(self, interaction: discord.Interaction, button: discord.ui.Button):
         try:
             await interaction.response.defer()
-            # Process message again for new response
+            # A newer reroll supersedes the one still streaming into this message
+            previous, self.generation = self.generation, asyncio.current_task()
+            if previous and not previous.done():
+                previous.cancel()
+                await asyncio.gather(previous, return_exceptions=True)
+
+            # Generate from the original context instead of the channel's current state
+            if self.history is not None:
+                self.cog.remember_history(self.message, self.history)
             new_response_stream = await self.cog.generate_response(self.message)
             if new_response_stream:
-                new_response = ""
-                async for chunk in new_response_stream:
-                    if chunk:
-                        new_response += chunk
-                # Format response with model name
-                prefixed_response = f"[{self.cog.name}] {new_response}"
-                # Edit the original response
-                await interaction.message.edit(content=prefixed_response, view=self)
-                # Add emotion reaction
+                # Stream into the original response the same way as a first reply
+                new_response, _ = await self.cog.stream_reply(
+                    self.message,
+                    new_response_stream,
+                    live_message=interaction.message,
+                    editor=self._editor(interaction),
+                    view=self
+                )
+                # Add emotion reaction in the background
                 emotion = analyze_emotion(new_response)
                 if emotion:
-                    try:
-                        await self.message.add_reaction(emotion)
-                    except discord.errors.Forbidden:
-                        logging.warning(f"[{self.cog.name}] Missing permission to add reaction")
+                    side_effects.add_reaction(self.message, emotion, self.cog.name)
             else:
                 await interaction.followup.send("Failed to generate a new response. Please try again.", ephemeral=True)
+        except asyncio.CancelledError:
+            logging.info(f"[{self.cog.name}] Reroll superseded by a newer one")
+            raise
         except Exception as e:
             logging.error(f"Error in reroll button: {str(e)}")
             await interaction.followup.send("An error occurred while generating a new response.", ephemeral=True)
+        finally:
+            if self.generation is asyncio.current_task():
+                self.generation = None
 
 class BaseCog(commands.Cog):
     def __init__(self, bot, name, nickname, trigger_words, model, provider="openrouter", prompt_file=None, supports_vision=False):
@@ -61,7 +98,7 @@ class BaseCog(commands.Cog):
         self.supports_vision = supports_vision
         self._image_processing_lock = asyncio.Lock()
         self.context_cog = bot.get_cog('ContextCog')
-        self.handled_messages = set()  # Instance variable for handled messages
+        self.context_snapshots = OrderedDict()  # message ID -> history used for its response
         
         # Get API client from bot instance
         self.api_client = getattr(bot, 'api_client', None)
@@ -69,15 +106,19 @@ class BaseCog(commands.Cog):
             logging.error(f"[{name}] No API client found on bot")
             raise ValueError("Bot must have api_client attribute")
 
-        # Create individual Discord client for this cog if token exists
+        # Avatar shown on persona webhook messages
+        self.avatar_url = PERSONA_AVATAR_URL.format(name=self.name.lower()) if PERSONA_AVATAR_URL else None
+
+        # Create individual Discord client for this cog if enabled and a token exists.
+        # Personas normally speak through webhooks over the bot's own connection.
         self.client = None
         # Convert cog name to token variable name (e.g. "Claude-3-Haiku" -> "CLAUDE3HAIKU_TOKEN")
         token_var = f"{self.name.upper().replace('-', '').replace(' ', '')}_TOKEN"
-        logging.info(f"[{name}] Looking for token variable: {token_var}")
         
-        if hasattr(bot.config, token_var):
+        if PERSONA_CLIENTS and hasattr(bot.config, token_var):
+            logging.info("[%s] Looking for token variable: %s", name, token_var)
             token = getattr(bot.config, token_var)
-            logging.info(f"[{name}] Found token: {token is not None}")
+            logging.info("[%s] Found token: %s", name, token is not None)
             if token:
                 intents = discord.Intents.default()
                 intents.messages = True
@@ -94,32 +135,17 @@ class BaseCog(commands.Cog):
         # Default system prompt template
         self.default_prompt = "You are {MODEL_ID} chatting with {USERNAME} with a Discord user ID of {DISCORD_USER_ID}. It's {TIME} in {TZ}. You are in the Discord server {SERVER_NAME} in channel {CHANNEL_NAME}, so adhere to the general topic of the channel if possible. GwynTel on Discord created your bot. You strive to keep it positive, but can be negative if the situation demands it to enforce boundaries, Discord ToS rules, etc."
 
-        # Load any custom prompt from consolidated_prompts.json
-        try:
-            with open('prompts/consolidated_prompts.json', 'r', encoding='utf-8') as f:
-                consolidated_prompts = json.load(f).get('system_prompts', {})
-                if prompt_file:
-                    self.raw_prompt = consolidated_prompts.get(prompt_file.lower(), self.default_prompt)
-                else:
-                    self.raw_prompt = consolidated_prompts.get(name.lower(), self.default_prompt)
-            logging.debug(f"[{name}] Loaded raw prompt: {self.raw_prompt}")
-        except Exception as e:
-            logging.warning(f"Failed to load prompt for {self.name}, using default: {str(e)}")
-            self.raw_prompt = self.default_prompt
+        # Base prompt from consolidated_prompts.json; overrides are applied by the prompt store
+        prompt_store.register(self.name, prompt_file or name, self.default_prompt)
+
+    @property
+    def raw_prompt(self):
+        """Persona-wide system prompt template (server and channel overrides aside)"""
+        return prompt_store.template(self.name)
 
     async def is_channel_activated(self, channel_id: str, guild_id: str) -> bool:
         """Check if a channel is activated for bot interactions"""
-        try:
-            db = sqlite3.connect('databases/interaction_logs.db')
-            cursor = db.cursor()
-            cursor.execute('SELECT is_active FROM channel_activations WHERE channel_id = ? AND guild_id = ?', 
-                         (str(channel_id), str(guild_id)))
-            result = cursor.fetchone()
-            db.close()
-            return bool(result[0]) if result else False
-        except Exception as e:
-            logging.error(f"Error checking channel activation status: {str(e)}")
-            return False
+        return access_control.is_channel_active(channel_id, guild_id)
 
     async def start_client(self, token):
         """Start the individual Discord client for this cog"""
@@ -150,7 +176,14 @@ class BaseCog(commands.Cog):
 
     async def on_message(self, message):
         """Handle messages for individual client"""
-        if message.author == self.client.user:
+        if message.author.bot:
+            return
+
+        if await self.is_user_banned(str(message.author.id)):
+            return
+
+        # The main bot's dispatcher may already have answered this message
+        if not message_dedupe.check(message.id):
             return
 
         # Handle DM messages
@@ -170,16 +203,7 @@ class BaseCog(commands.Cog):
 
     async def is_user_banned(self, user_id: str) -> bool:
         """Check if a user is banned from bot interactions"""
-        try:
-            db = sqlite3.connect('databases/interaction_logs.db')
-            cursor = db.cursor()
-            cursor.execute('SELECT 1 FROM banned_users WHERE user_id = ?', (str(user_id),))
-            result = cursor.fetchone() is not None
-            db.close()
-            return result
-        except Exception as e:
-            logging.error(f"Error checking banned status: {str(e)}")
-            return False
+        return access_control.is_banned(user_id)
 
     async def update_bot_profile(self, guild: discord.Guild, model_name: str):
         """Update bot's server profile without glitch text"""
@@ -191,12 +215,38 @@ class BaseCog(commands.Cog):
             if len(nick) > 32:
                 nick = nick[:32]
             
-            # Update the bot's nickname in the guild
-            await guild.me.edit(nick=nick)
-            logging.debug(f"[{self.name}] Updated profile in {guild.name} to {nick}")
+            # Queue the edit; skipped when the guild already shows this nickname
+            if side_effects.set_nickname(guild, nick):
+                logging.debug("[%s] Queued profile update in %s to %s", self.name, guild.name, nick)
         except Exception as e:
             logging.error(f"[{self.name}] Failed to update profile: {str(e)}")
 
+    async def send_reply(self, message, content, view=None):
+        """Post a new reply as this persona, through the channel's webhook when available"""
+        return await persona_presenter.send(message, content, self.name, self.avatar_url, view=view)
+
+    def remember_history(self, message, history):
+        """Keep the context a response was generated from, for rerolls"""
+        self.context_snapshots[message.id] = history
+        self.context_snapshots.move_to_end(message.id)
+        while len(self.context_snapshots) > HISTORY_SNAPSHOTS:
+            self.context_snapshots.popitem(last=False)
+
+    async def build_messages(self, message, system_prompt, limit=None, model_id=None):
+        """The system prompt, channel history and the message itself, ready for call_openpipe.
+
+        How much history is set by the context policy of this persona in the
+        channel; `limit` can only lower it. History and message are assembled
+        once per Discord message and shared by every persona answering it; a
+        rerolled message gets the snapshot of its first response.
+        """
+        history = self.context_snapshots.get(message.id)
+        if history is None:
+            history = await context_assembler.assemble(self.context_cog, message, limit=limit, model_id=model_id,
+                                                       persona=self.name)
+            self.remember_history(message, history)
+        return history.with_system(system_prompt)
+
     async def start_typing(self, channel):
         """Start a typing indicator in the channel"""
         try:
@@ -218,174 +268,184 @@ class BaseCog(commands.Cog):
         except Exception:
             return False
 
-    async def handle_message(self, message, full_content=None):
-        """Handle incoming messages and generate responses"""
-        try:
-            # Check if user is banned
-            if await self.is_user_banned(str(message.author.id)):
-                return
+    async def handle_message(self, message, full_content=None) -> ReplyResult:
+        """Handle incoming messages and generate responses.
 
-            # Check channel activation for non-DM messages
-            if not isinstance(message.channel, discord.DMChannel):
-                if not await self.is_channel_activated(str(message.channel.id), str(message.guild.id)):
-                    return
+        Returns a ReplyResult with the response text, the ids of the sent
+        messages and stage timings; `error` is set when no reply was made.
+        """
+        result = ReplyResult(self.name)
+        try:
+            # Gating (bans, channel activation) is done once by the dispatcher before this is called
 
-            # If full_content is not provided, use message.content
+            # full_content (a merged burst) is what gets answered; if not provided, use message.content
             modified_content = full_content or message.content
 
             # Start typing indicator
             await self.start_typing(message.channel)
 
-            # Add message to context (skip for DMs)
+            # Add message to context in the background (skip for DMs)
             if self.context_cog and message.guild:
-                try:
-                    guild_id = str(message.guild.id) if message.guild else None
-                    await self.context_cog.add_message_to_context(
+                side_effects.submit(
+                    lambda: self.context_cog.add_message_to_context(
                         message.id,
                         str(message.channel.id),
-                        guild_id,
+                        str(message.guild.id),
                         str(message.author.id),
-                        modified_content,  # Username prefix handled by context_cog
+                        # Only this message's own text: each message of a burst is stored as its own row
+                        message.content,  # Username prefix handled by context_cog
                         False,  # is_assistant
                         None,   # persona_name
                         None    # emotion
-                    )
-                except Exception as e:
-                    logging.error(f"[{self.name}] Failed to add message to context: {str(e)}")
+                    ),
+                    HIGH,
+                    name='user context'
+                )
 
             # Generate and send response
             try:
                 response_stream = await self.generate_response(message)
             except Exception as e:
                 logging.error(f"[{self.name}] Error generating response: {str(e)}")
+                result.error = str(e)
                 await message.reply(f"❌ Error generating response: {str(e)}")
-                return
+                return result
+            result.lap('request')
 
             if response_stream:
-                response = ""
-                sent_messages = []
-                last_update = time.time()
-                current_chunk = f"[{self.name}] "
-                
-                # Update bot's profile if in a guild
-                if message.guild:
+                # Rename the bot only where the persona can't post through a webhook
+                if message.guild and not await persona_presenter.webhook_for(message.channel):
                     await self.update_bot_profile(message.guild, self.name)
                 
-                # Consume the async generator
                 try:
-                    async for chunk in response_stream:
-                        if chunk:
-                            response += chunk
-                            current_chunk += chunk
-                            
-                            # Check if it's time to update (every 0.5 seconds)
-                            current_time = time.time()
-                            if current_time - last_update >= 0.5:
-                                # If current chunk exceeds Discord's limit, split and create new message
-                                while len(current_chunk) > 2000:
-                                    # Find last space before 2000 chars
-                                    split_index = current_chunk[:2000].rfind(' ')
-                                    if split_index == -1:
-                                        split_index = 1999
-
-                                    # Send first part
-                                    if not sent_messages:
-                                        # First message as reply
-                                        sent_message = await message.reply(current_chunk[:split_index])
-                                        sent_messages.append(sent_message)
-                                    else:
-                                        # Update last message
-                                        await sent_messages[-1].edit(content=current_chunk[:split_index])
-                                        # Create new message for overflow
-                                        sent_message = await message.reply(f"[{self.name}] " + current_chunk[split_index:].lstrip())
-                                        sent_messages.append(sent_message)
-                                        current_chunk = f"[{self.name}] " + current_chunk[split_index:].lstrip()
-
-                                # Update or send current chunk if under 2000 chars
-                                if len(current_chunk) <= 2000:
-                                    if sent_messages:
-                                        await sent_messages[-1].edit(content=current_chunk)
-                                    else:
-                                        sent_message = await message.reply(current_chunk)
-                                        sent_messages.append(sent_message)
-                                
-                                last_update = current_time
-
-                    # Handle final update
-                    while len(current_chunk) > 2000:
-                        split_index = current_chunk[:2000].rfind(' ')
-                        if split_index == -1:
-                            split_index = 1999
-
-                        if not sent_messages:
-                            sent_message = await message.reply(current_chunk[:split_index])
-                            sent_messages.append(sent_message)
-                        else:
-                            await sent_messages[-1].edit(content=current_chunk[:split_index])
-                            sent_message = await message.reply(f"[{self.name}] " + current_chunk[split_index:].lstrip())
-                            sent_messages.append(sent_message)
-                        current_chunk = f"[{self.name}] " + current_chunk[split_index:].lstrip()
-                    
-                    # Send or update final chunk with reroll button
-                    if sent_messages:
-                        await sent_messages[-1].edit(
-                            content=current_chunk,
-                            view=RerollView(self, message, response)
-                        )
-                    else:
-                        sent_message = await message.reply(
-                            content=current_chunk,
-                            view=RerollView(self, message, response)
-                        )
-                        sent_messages.append(sent_message)
-
-                    # Add emotion reaction
-                    emotion = analyze_emotion(response)
-                    if emotion:
-                        try:
-                            await message.add_reaction(emotion)
-                        except discord.errors.Forbidden:
-                            logging.warning(f"[{self.name}] Missing permission to add reaction")
-
-                    # Add response to context (skip for DMs)
-                    if self.context_cog and message.guild:
-                        try:
-                            guild_id = str(message.guild.id) if message.guild else None
-                            await self.context_cog.add_message_to_context(
-                                sent_messages[-1].id,
-                                str(message.channel.id),
-                                guild_id,
-                                str(self.bot.user.id),
-                                response,  # Response content without prefix
-                                True,  # is_assistant
-                                self.name,  # persona_name
-                                emotion  # emotion
-                            )
-                        except Exception as e:
-                            logging.error(f"[{self.name}] Failed to add response to context: {str(e)}")
-
-                    # Log interaction (skip for DMs)
-                    if message.guild:
-                        try:
-                            await log_interaction(
-                                user_id=message.author.id,
-                                guild_id=message.guild.id if message.guild else None,
-                                persona_name=self.name,
-                                user_message=modified_content,
-                                assistant_reply=response,
-                                emotion=emotion,
-                                channel_id=message.channel.id
-                            )
-                        except Exception as e:
-                            logging.error(f"[{self.name}] Failed to log interaction: {e}")
+                    response, sent_messages = await self.stream_reply(message, response_stream)
+                    result.lap('stream')
+                    result.text = response
+                    result.message_ids = [sent.id for sent in sent_messages]
+                    result.emotion = analyze_emotion(response)
+
+                    # Reaction, context and logging don't hold up the handler
+                    side_effects.submit(
+                        lambda: self.record_reply(message, modified_content, response, sent_messages[-1].id, result.emotion),
+                        HIGH,
+                        name='record reply'
+                    )
 
                 except Exception as e:
                     logging.error(f"[{self.name}] Error processing response stream: {str(e)}")
+                    result.error = str(e)
                     await message.reply(f"❌ Error processing response: {str(e)}")
+            else:
+                result.error = "no response"
 
         except Exception as e:
             logging.error(f"[{self.name}] Unexpected error handling message: {str(e)}")
+            result.error = str(e)
             await message.reply(f"❌ Unexpected error: {str(e)}")
+        return result
+
+    async def record_reply(self, message, user_content, response, reply_id, emotion=None):
+        """Side effects of a finished reply; runs on the background queue"""
+        if emotion:
+            side_effects.add_reaction(message, emotion, self.name)
+
+        # Add response to context (skip for DMs)
+        if self.context_cog and message.guild:
+            try:
+                await self.context_cog.add_message_to_context(
+                    reply_id,
+                    str(message.channel.id),
+                    str(message.guild.id),
+                    str(self.bot.user.id),
+                    response,  # Response content without prefix
+                    True,  # is_assistant
+                    self.name,  # persona_name
+                    emotion  # emotion
+                )
+            except Exception as e:
+                logging.error(f"[{self.name}] Failed to add response to context: {str(e)}")
+
+        # Log interaction (skip for DMs); queued log entries are written together
+        if message.guild:
+            side_effects.submit_batch('interaction log', {
+                'user_id': message.author.id,
+                'guild_id': message.guild.id,
+                'persona_name': self.name,
+                'user_message': user_content,
+                'assistant_reply': response,
+                'emotion': emotion,
+                'channel_id': message.channel.id
+            }, log_interactions)
+
+    async def stream_reply(self, message, response_stream, live_message=None, editor=None, view=None):
+        """Stream a response to Discord as it is generated.
+
+        Text goes into `live_message` first when one is given (a reroll),
+        otherwise into new replies. Once a response needs more messages than
+        the output strategy allows, the last one becomes a preview and the
+        full text is attached (or paginated) when the stream ends. Returns the
+        full response and the messages that were sent.
+        """
+        response = ""
+        sent_messages = []
+        replacing = live_message is not None
+        parts = 0
+        preview = None  # text of the overflowing message, once posting stops
+        splitter = MessageSplitter(f"[{self.name}] ", output_strategy.part_limit)
+        # Live edits are coalesced and paced per channel by the shared edit scheduler
+        edit_stream = edit_scheduler.open_stream(message.channel.id, editor)
+        try:
+            async for chunk in response_stream:
+                if chunk:
+                    response += chunk
+                    if preview is not None:
+                        continue
+
+                    # Messages that reached Discord's limit are finished before starting the next
+                    for sealed in splitter.feed(chunk):
+                        parts += 1
+                        if output_strategy.overflows(parts + 1):
+                            # Stop posting; this message previews the rest until the stream ends
+                            preview = sealed
+                            sealed = output_strategy.preview(sealed)
+                        if live_message:
+                            await edit_stream.flush(live_message, sealed, wait=True)
+                        else:
+                            live_message = await self.send_reply(message, sealed)
+                            sent_messages.append(live_message)
+                        if preview is not None:
+                            break
+                        live_message = None
+                    if preview is not None:
+                        continue
+
+                    if live_message:
+                        # Only the latest text is sent when the channel bucket allows
+                        edit_stream.update(live_message, splitter.current)
+                    else:
+                        live_message = await self.send_reply(message, splitter.current)
+                        sent_messages.append(live_message)
+
+            if view is None:
+                view = RerollView(self, message, response, self.context_snapshots.get(message.id))
+            else:
+                view.original_response = response
+
+            # Flush the final state with the reroll button as soon as the stream ends
+            content, extra = output_strategy.finish(
+                self.name, preview if preview is not None else splitter.finish(), response, view,
+                overflowed=preview is not None, replacing=replacing
+            )
+            if live_message:
+                await edit_stream.flush(live_message, content, view=view, **extra)
+            else:
+                sent_messages.append(await self.send_reply(message, content, view=view))
+        finally:
+            await edit_stream.close()
+            # Release the HTTP stream early when a reroll cancels this one
+            if hasattr(response_stream, 'aclose'):
+                await response_stream.aclose()
+        return response, sent_messages
 
     async def generate_response(self, message) -> AsyncGenerator[str, None]:
         """Generate a response to a message. Must be implemented by subclasses."""
@@ -421,46 +481,11 @@ class BaseCog(commands.Cog):
     def format_prompt(self, message):
         """Format the system prompt template with message context"""
         try:
-            tz = ZoneInfo("America/Los_Angeles")
-            current_time = datetime.now(tz).strftime("%I:%M %p")
-            
-            return self.raw_prompt.format(
-                MODEL_ID=self.name,
-                USERNAME=message.author.display_name,
-                DISCORD_USER_ID=message.author.id,
-                TIME=current_time,
-                TZ="Pacific Time",
-                SERVER_NAME=message.guild.name if message.guild else "Direct Message",
-                CHANNEL_NAME=message.channel.name if hasattr(message.channel, 'name') else "DM"
-            )
+            return prompt_store.render(self.name, message)
         except Exception as e:
             logging.error(f"[{self.name}] Error formatting prompt: {str(e)}")
             return self.raw_prompt
 
-    @commands.Cog.listener()
-    async def on_message(self, message):
-        """Listen for messages that might trigger this cog"""
-        # Skip if message is from a bot
-        if message.author.bot:
-            return
-
-        # Check if user is banned
-        if await self.is_user_banned(str(message.author.id)):
-            return
-
-        # Check channel activation for non-DM messages
-        if not isinstance(message.channel, discord.DMChannel):
-            if not await self.is_channel_activated(str(message.channel.id), str(message.guild.id)):
-                return
-
-        # Check if message contains any trigger words
-        msg_content = message.content.lower()
-        if any(word in msg_content for word in self.trigger_words):
-            # Only handle if not already processed by this cog
-            if message.id not in self.handled_messages:
-                self.handled_messages.add(message.id)
-                await self.handle_message(message)
-
     async def cog_unload(self):
         """Called when the cog is unloaded."""
         try:
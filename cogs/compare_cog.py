@@ -0,0 +1,116 @@
+import discord
+from discord.ext import commands
+import asyncio
+import copy
+import logging
+import time
+from collections import deque
+from config import ERROR_MESSAGES
+from shared.generation_scheduler import generation_scheduler, INTERACTIVE
+from shared.reply_result import ReplyResult
+
+# Personas one /compare may ask at once
+MAX_PERSONAS = 4
+
+# Recent runs kept for /compare_stats
+RECENT_RUNS = 50
+
+class CompareCog(commands.Cog):
+    """Ask several personas the same question at once"""
+
+    def __init__(self, bot):
+        self.bot = bot
+        # (personas, wall-clock seconds, sequential seconds) per run
+        self.recent_runs = deque(maxlen=RECENT_RUNS)
+
+    def _find_personas(self, names):
+        """Persona cogs for comma or space separated names, and the names that matched none"""
+        found, unknown = [], []
+        for name in names.replace(',', ' ').split():
+            cog = next((c for c in self.bot.cogs.values()
+                        if hasattr(c, 'handle_message') and getattr(c, 'name', '').lower() == name.lower()), None)
+            if cog is None:
+                unknown.append(name)
+            elif cog not in found:
+                found.append(cog)
+        return found, unknown
+
+    async def _generate(self, cog, message) -> ReplyResult:
+        """One persona's reply, admitted by the shared generation scheduler"""
+        ticket = generation_scheduler.admit(message.guild.id if message.guild else None, message.author.id, INTERACTIVE)
+        if ticket is None:
+            result = ReplyResult(cog.name)
+            result.error = ERROR_MESSAGES['busy']
+            return result
+        async with ticket:
+            result = await cog.handle_message(message)
+        if not isinstance(result, ReplyResult):
+            result = ReplyResult(cog.name)
+            result.error = "no result"
+        return result
+
+    async def fan_out(self, message, cogs):
+        """Run every persona on the message concurrently.
+
+        The personas share one assembled history for the message (see
+        BaseCog.build_messages), and each streams into its own reply. Returns
+        the results, the wall-clock time and the time the same generations
+        would have taken one after another.
+        """
+        start = time.perf_counter()
+        results = await asyncio.gather(*(self._generate(cog, message) for cog in cogs), return_exceptions=True)
+        wall = time.perf_counter() - start
+        for i, result in enumerate(results):
+            if isinstance(result, BaseException):
+                logging.error(f"[Compare] {cogs[i].name} failed: {str(result)}")
+                failed = ReplyResult(cogs[i].name)
+                failed.error = str(result)
+                results[i] = failed
+        sequential = sum(result.total for result in results)
+        self.recent_runs.append(([cog.name for cog in cogs], wall, sequential))
+        logging.info(f"[Compare] {len(cogs)} personas in {wall:.2f}s (sequential {sequential:.2f}s)")
+        return results, wall, sequential
+
+    @commands.hybrid_command(name="compare")
+    @discord.app_commands.describe(
+        personas="Personas to ask, separated by commas (e.g. grok,claude3haiku,gpt4o)",
+        question="What to ask them"
+    )
+    async def compare(self, ctx, personas: str, *, question: str):
+        """Ask several personas the same question at once. Use /compare or !compare"""
+        try:
+            cogs, unknown = self._find_personas(personas)
+            if unknown:
+                await ctx.reply(f"❌ Unknown persona(s): {', '.join(unknown)}. Use /list_agents to see them.")
+                return
+            if not 2 <= len(cogs) <= MAX_PERSONAS:
+                await ctx.reply(f"❌ Name between 2 and {MAX_PERSONAS} personas to compare.")
+                return
+            if ctx.interaction:
+                await ctx.defer()
+
+            # The personas answer the question as if it had been sent as a message
+            message = copy.copy(ctx.message)
+            message.content = question
+
+            results, wall, sequential = await self.fan_out(message, cogs)
+            lines = [f"⏱️ {len(cogs)} personas in {wall:.1f}s (one after another: {sequential:.1f}s)"]
+            lines += [f"❌ {result.cog}: {result.error}" for result in results if result.error]
+            await ctx.send("\n".join(lines))
+        except Exception as e:
+            logging.error(f"[Compare] Error running compare: {str(e)}")
+            await ctx.reply("❌ An error occurred while comparing personas.")
+
+    @commands.hybrid_command(name="compare_stats")
+    async def compare_stats(self, ctx):
+        """Time saved by recent /compare runs over asking one after another"""
+        if not self.recent_runs:
+            await ctx.reply("No comparisons have been run yet.")
+            return
+        wall = sum(run[1] for run in self.recent_runs)
+        sequential = sum(run[2] for run in self.recent_runs)
+        await ctx.reply(f"📊 Last {len(self.recent_runs)} comparisons: {wall:.1f}s in total, "
+                        f"{sequential:.1f}s if run one after another")
+
+async def setup(bot):
+    await bot.add_cog(CompareCog(bot))
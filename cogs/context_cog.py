@@ -1,40 +1,53 @@
 import discord
 from discord.ext import commands
-from config import CONTEXT_WINDOWS, DEFAULT_CONTEXT_WINDOW, MAX_CONTEXT_WINDOW, OPENPIPE_API_KEY, OPENPIPE_API_URL
-import sqlite3
+from config import CONTEXT_WINDOWS, DEFAULT_CONTEXT_WINDOW, MAX_CONTEXT_WINDOW, SUMMARY_MODEL
 import json
 import logging
 from datetime import datetime, timedelta
 import asyncio
-from typing import List, Dict, Optional
+from typing import Iterable, List, Dict, Optional
 import textwrap
-from openai import OpenAI
+from shared.context_store import ContextStore
+from shared.persistence import message_writer
+from shared.migrations import migrate
+from shared.access_control import access_control
+from shared.identity_cache import identity_cache
+from shared.persona_webhooks import persona_presenter
+from shared.summarizer import ChannelSummarizer
+from shared.retrieval import HistorySearch, MATCH_M, mix
+from shared.context_policy import ContextPolicy, context_policies
 
 class ContextCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.db_path = 'databases/interaction_logs.db'
+        # Recent messages per channel live in memory and are written to the database behind
+        self.store = ContextStore('databases/interaction_logs.db', writer=message_writer)
         self._setup_database()
-        self.summary_chunk_hours = 24
-        self.last_summary_check = {}
-        self.openai_client = OpenAI(
-            base_url=OPENPIPE_API_URL,
-            api_key=OPENPIPE_API_KEY
-        )
+        # Old history of busy channels is replaced by a rolling summary, written in the background
+        self.summarizer = ChannelSummarizer('databases/interaction_logs.db', self._complete_summary, writer=message_writer)
+        # Older messages relevant to the one being answered, from the full-text index
+        self.search = HistorySearch('databases/interaction_logs.db')
         self.last_messages = {}
-        self.current_stream = {}
-        self.message_cache = {}  # Add message cache
-        self.cache_timeout = 300  # 5 minutes cache timeout
+
+    @property
+    def db_path(self):
+        return self.store.db_path
+
+    @db_path.setter
+    def db_path(self, path):
+        # Another database gets its own store and writer; the shared writer stays on the bot's
+        self.store = ContextStore(path)
+        self.summarizer = ChannelSummarizer(path, self._complete_summary, writer=self.store.writer)
+        if hasattr(self, 'search'):
+            # The search reopens its connection on the new database at its next query
+            self.search.db_path = path
+        else:
+            self.search = HistorySearch(path)
 
     def _setup_database(self):
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                with open('databases/schema.sql', 'r') as f:
-                    schema = f.read()
-                    cursor.executescript(schema)
-                conn.commit()
-                logging.info("Database setup completed successfully")
+            migrate(self.db_path)
+            logging.info("Database setup completed successfully")
         except Exception as e:
             logging.error(f"Failed to set up database: {str(e)}")
 
@@ -75,6 +88,7 @@ class ContextCog(commands.Cog):
 
             channel_id = str(ctx.channel.id)
             CONTEXT_WINDOWS[channel_id] = size
+            context_policies.invalidate(channel_id)
             self._save_context_windows()
             await ctx.send(f"✅ Context window size set to {size} messages")
         except Exception as e:
@@ -89,6 +103,7 @@ class ContextCog(commands.Cog):
             channel_id = str(ctx.channel.id)
             if channel_id in CONTEXT_WINDOWS:
                 del CONTEXT_WINDOWS[channel_id]
+                context_policies.invalidate(channel_id)
                 self._save_context_windows()
             await ctx.send(f"✅ Context window size reset to default ({DEFAULT_CONTEXT_WINDOW} messages)")
         except Exception as e:
@@ -102,108 +117,85 @@ class ContextCog(commands.Cog):
         """Clear conversation history. Use /clearcontext [hours] or !clearcontext [hours]"""
         try:
             channel_id = str(ctx.channel.id)
-            
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                
-                if hours:
-                    cutoff_time = (datetime.now() - timedelta(hours=hours)).isoformat()
-                    cursor.execute('''
-                        DELETE FROM messages 
-                        WHERE channel_id = ? AND timestamp < ?
-                    ''', (channel_id, cutoff_time))
-                    await ctx.send(f"✅ Cleared messages older than {hours} hours from context")
-                else:
-                    cursor.execute('DELETE FROM messages WHERE channel_id = ?', (channel_id,))
-                    await ctx.send("✅ Cleared all messages from context")
-                
-                conn.commit()
-                
-                # Clear cache for this channel
-                cache_keys_to_remove = [k for k in self.message_cache if k.startswith(f"{channel_id}:")]
-                for key in cache_keys_to_remove:
-                    self.message_cache.pop(key, None)
-                
+
+            # Clears the channel's ring and unwritten messages along with the database rows
+            if hours:
+                cutoff_time = (datetime.now() - timedelta(hours=hours)).isoformat()
+                await self.store.clear(channel_id, before=cutoff_time)
+                await self.summarizer.clear(channel_id)
+                await ctx.send(f"✅ Cleared messages older than {hours} hours from context")
+            else:
+                await self.store.clear(channel_id)
+                await self.summarizer.clear(channel_id)
+                await ctx.send("✅ Cleared all messages from context")
+
         except Exception as e:
             logging.error(f"[Context] Error clearing context: {str(e)}")
             await ctx.send("❌ Error clearing context")
 
-    async def get_context_messages(self, channel_id: str, limit: int = None, exclude_message_id: str = None, model_id: str = None) -> List[Dict]:
-        cache_key = f"{channel_id}:{limit}:{exclude_message_id}"
-        
-        # Check cache first
-        if cache_key in self.message_cache:
-            cache_entry = self.message_cache[cache_key]
-            if datetime.now().timestamp() - cache_entry['timestamp'] < self.cache_timeout:
-                messages = cache_entry['messages']
-                # Apply message alternation if needed
-                if model_id and "infermatic" in model_id.lower():
-                    messages = self._ensure_message_alternation(messages)
-                return messages
-        
+    async def get_context_messages(self, channel_id: str, limit: int = None, exclude_message_id: str = None, model_id: str = None, query: str = None, policy: ContextPolicy = None, exclude_ids: Iterable[str] = ()) -> List[Dict]:
+        """Context rows for a channel, oldest first.
+
+        `policy` (by default the channel's, from context_policies) sets how
+        many messages, how far back and which kinds; `limit` can only lower
+        the count. With a `query` (the message being answered) the most
+        recent messages are mixed with the best full-text matches from older
+        history, within a token budget; without one it is the last messages.
+        Rows of `exclude_message_id` and `exclude_ids` (the messages of a
+        merged burst) are left out.
+        """
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                window_size = min(50, limit) if limit is not None else 50
-                
-                query = '''
-                SELECT DISTINCT
-                    m.discord_message_id,
-                    m.user_id,
-                    m.content,
-                    m.is_assistant,
-                    m.persona_name,
-                    m.emotion,
-                    m.timestamp
-                FROM messages m
-                WHERE m.channel_id = ?
-                AND (? IS NULL OR m.discord_message_id != ?)
-                AND m.content IS NOT NULL
-                AND m.content != ''
-                ORDER BY m.timestamp DESC
-                LIMIT ?
-                '''
-                
-                cursor.execute(query, (
-                    channel_id,
-                    exclude_message_id,
-                    exclude_message_id,
-                    window_size
-                ))
-                
-                messages = []
-                seen_contents = set()
-                
-                for row in cursor.fetchall():
-                    content = row[2]
-                    if not content or content.isspace() or content in seen_contents:
-                        continue
-                    seen_contents.add(content)
-                    
-                    messages.append({
-                        'id': row[0],
-                        'user_id': row[1],
-                        'content': content,
-                        'is_assistant': bool(row[3]),
-                        'persona_name': row[4],
-                        'emotion': row[5],
-                        'timestamp': row[6]
-                    })
-                
-                messages.reverse()
-                
-                # Apply message alternation if needed
-                if model_id and "infermatic" in model_id.lower():
-                    messages = self._ensure_message_alternation(messages)
-                
-                # Cache the results
-                self.message_cache[cache_key] = {
-                    'messages': messages,
-                    'timestamp': datetime.now().timestamp()
-                }
-                
-                return messages
-                
+            excluded = {str(message_id) for message_id in exclude_ids}
+            if exclude_message_id is not None:
+                excluded.add(str(exclude_message_id))
+            if policy is None:
+                # Guild settings apply too, so the channel's guild is looked up
+                channel = self.bot.get_channel(int(channel_id)) if str(channel_id).isdigit() else None
+                guild = getattr(channel, 'guild', None)
+                policy = context_policies.resolve(guild.id if guild else None, channel_id)
+            window_size = min(policy.max_messages, limit) if limit is not None else policy.max_messages
+            # Served from the channel's ring; only a channel not in memory is read from the database
+            rows = await self.store.recent(channel_id, window_size, policy=policy, exclude_ids=excluded)
+            # Messages covered by the channel's summary are sent as the summary instead
+            summary = await self.summarizer.latest(channel_id) if self.summarizer.enabled else None
+            if summary:
+                rows = [row for row in rows if row['timestamp'] > summary.end]
+            if query:
+                excluded |= {row['id'] for row in rows}
+                # At most half of a small window goes to older matches
+                matches = await self.search.search(channel_id, query, min(MATCH_M, window_size // 2), excluded, policy)
+                # Older matches are kept even when the summary covers them: they carry the detail
+                rows = list(reversed(mix(rows, matches, window_size)))
+
+            messages = []
+            seen_contents = set()
+
+            for row in rows:
+                content = row['content']
+                if not content or content.isspace() or content in seen_contents:
+                    continue
+                seen_contents.add(content)
+
+                messages.append({
+                    'id': row['id'],
+                    'user_id': row['user_id'],
+                    'content': content,
+                    'is_assistant': row['is_assistant'],
+                    'persona_name': row['persona_name'],
+                    'emotion': row['emotion'],
+                    'timestamp': row['timestamp']
+                })
+
+            messages.reverse()
+            if summary:
+                messages.insert(0, summary.as_context())
+
+            # Apply message alternation if needed
+            if model_id and "infermatic" in model_id.lower():
+                messages = self._ensure_message_alternation(messages)
+
+            return messages
+
         except Exception as e:
             logging.error(f"Failed to get context messages: {str(e)}")
             return []
@@ -241,42 +233,12 @@ class ContextCog(commands.Cog):
         try:
             if not content or content.isspace():
                 return
-
-            if is_assistant:
-                if channel_id not in self.current_stream:
-                    self.current_stream[channel_id] = {'content': '', 'message_id': message_id}
-                
-                if message_id != self.current_stream[channel_id]['message_id']:
-                    # Store the previous complete message before starting a new one
-                    if self.current_stream[channel_id]['content']:
-                        await self._store_message(
-                            self.current_stream[channel_id]['message_id'],
-                            channel_id,
-                            guild_id,
-                            user_id,
-                            self.current_stream[channel_id]['content'],
-                            is_assistant,
-                            persona_name,
-                            emotion
-                        )
-                    # Start a new message stream
-                    self.current_stream[channel_id] = {'content': content, 'message_id': message_id}
-                else:
-                    # Append to existing message stream
-                    self.current_stream[channel_id]['content'] = content
-                    # Store the updated complete message
-                    await self._store_message(
-                        message_id,
-                        channel_id,
-                        guild_id,
-                        user_id,
-                        self.current_stream[channel_id]['content'],
-                        is_assistant,
-                        persona_name,
-                        emotion
-                    )
+            if message_id is None or channel_id is None:
+                # Rows are upserted by Discord message id; without one a write can't be made idempotent
+                logging.warning("[Context] Ignoring a context write without a message or channel id")
                 return
 
+            # Writing a streamed reply again under the same id replaces the earlier, shorter version
             await self._store_message(message_id, channel_id, guild_id, user_id, content, is_assistant, persona_name, emotion)
 
         except Exception as e:
@@ -293,33 +255,28 @@ class ContextCog(commands.Cog):
                 if is_assistant:
                     prefixed_content = f"Assistant: {content}"
                 else:
-                    user = await self.bot.fetch_user(int(user_id))
-                    username = user.display_name
-                    prefixed_content = f"{username}: {content}"
+                    # Names come from the authors seen in on_message; fetch_user is a rate-limited last resort
+                    username = await identity_cache.resolve(self.bot, user_id, guild_id)
+                    prefixed_content = f"{username}: {content}" if username else content
             except:
                 prefixed_content = content
 
-            async with asyncio.Lock():
-                with sqlite3.connect(self.db_path) as conn:
-                    cursor = conn.cursor()
-                    
-                    cursor.execute('''
-                    INSERT OR REPLACE INTO messages 
-                    (discord_message_id, channel_id, guild_id, user_id, content, is_assistant, persona_name, emotion, timestamp)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    ''', (
-                        str(message_id), 
-                        str(channel_id), 
-                        str(guild_id) if guild_id else None, 
-                        str(user_id), 
-                        prefixed_content,
-                        is_assistant, 
-                        persona_name, 
-                        emotion, 
-                        datetime.now().isoformat()
-                    ))
-                    
-                    conn.commit()
+            # Visible to readers at once; written to the database in the next batch
+            self.store.append({
+                'id': str(message_id),
+                'channel_id': str(channel_id),
+                'guild_id': str(guild_id) if guild_id else None,
+                'user_id': str(user_id),
+                'content': prefixed_content,
+                'is_assistant': bool(is_assistant),
+                'persona_name': persona_name,
+                'emotion': emotion,
+                'timestamp': datetime.now().isoformat()
+            })
+            # Summaries are model calls, so only channels the personas talk in get them
+            replied = is_assistant or 'assistant' in self.last_messages.get(channel_id, {})
+            if replied or (guild_id and access_control.is_channel_active(channel_id, guild_id)):
+                self.summarizer.note(str(channel_id), str(guild_id) if guild_id else None)
 
             if channel_id not in self.last_messages:
                 self.last_messages[channel_id] = {}
@@ -328,11 +285,6 @@ class ContextCog(commands.Cog):
                 'timestamp': datetime.now()
             }
 
-            # Clear relevant cache entries
-            cache_keys_to_remove = [k for k in self.message_cache if k.startswith(f"{channel_id}:")]
-            for key in cache_keys_to_remove:
-                self.message_cache.pop(key, None)
-
         except Exception as e:
             logging.error(f"Failed to store message in context: {str(e)}")
 
@@ -340,9 +292,13 @@ class ContextCog(commands.Cog):
     async def on_message(self, message):
         if message.content.startswith('!') or message.content.startswith('/'):
             return
+        # Persona replies, sent by the bot or through its webhooks, are stored by record_reply as assistant turns
+        if (self.bot.user and message.author.id == self.bot.user.id) or persona_presenter.owns(message):
+            return
 
         try:
             guild_id = str(message.guild.id) if message.guild else None
+            identity_cache.remember(message.author, guild_id)
             await self.add_message_to_context(
                 message.id,
                 str(message.channel.id),
@@ -356,6 +312,29 @@ class ContextCog(commands.Cog):
         except Exception as e:
             logging.error(f"Error in on_message: {e}")
 
+    @commands.Cog.listener()
+    async def on_member_update(self, before, after):
+        identity_cache.remember(after, after.guild.id)
+
+    @commands.Cog.listener()
+    async def on_user_update(self, before, after):
+        # A new global name changes the display name in every guild without a nickname
+        identity_cache.forget(after.id)
+        identity_cache.remember(after)
+
+    async def _complete_summary(self, messages: List[Dict]) -> str:
+        """Summary text from the cheap summary model, through the shared API client"""
+        response = await self.bot.api_client.call_openpipe(
+            messages=messages,
+            model=SUMMARY_MODEL,
+            temperature=0.3,
+            stream=False,
+            max_tokens=400,
+            stop=[],
+            model_cog='summarizer'
+        )
+        return response['choices'][0]['message']['content']
+
     async def cog_load(self):
         try:
             await self.bot.tree.sync()
@@ -363,5 +342,13 @@ class ContextCog(commands.Cog):
         except Exception as e:
             logging.error(f"[Context] Failed to sync slash commands: {e}")
 
+    async def cog_unload(self):
+        # Write the messages still waiting in memory; an unfinished summary pass is redone next start
+        await self.summarizer.close()
+        await self.store.close()
+        await self.search.close()
+        logging.info(f"[Context] Display names: {identity_cache.hit_rate:.0%} hit rate, "
+                     f"{identity_cache.fetches_avoided} fetch_user calls avoided, {identity_cache.stats['fetches']} made")
+
 async def setup(bot):
     await bot.add_cog(ContextCog(bot))
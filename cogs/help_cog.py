@@ -1,6 +1,7 @@
 import discord
 from discord.ext import commands
 import logging
+import copy
 import json
 import sqlite3
 import os
@@ -9,7 +10,11 @@ import aiohttp
 import asyncio
 from config.webhook_config import load_webhooks, MAX_RETRIES, WEBHOOK_TIMEOUT, DEBUG_LOGGING
 from config import CONTEXT_WINDOWS, DEFAULT_CONTEXT_WINDOW, MAX_CONTEXT_WINDOW
+from shared.prompt_store import prompt_store
+from shared.reply_result import ReplyResult
 from bot import get_uptime
+from shared.message_splitter import split_message
+from shared.access_control import access_control
 
 class HelpCog(commands.Cog, name="Help"):
     """Help commands and channel management"""
@@ -24,7 +29,6 @@ class HelpCog(commands.Cog, name="Help"):
         self.dynamic_prompts_file = "dynamic_prompts.json"
         self.activated_channels_file = "activated_channels.json"
         self.activated_channels = self.load_activated_channels()
-        self.prompts_file = "prompts/consolidated_prompts.json"
         logging.debug("[Help] Initialized")
 
     def load_activated_channels(self):
@@ -41,27 +45,12 @@ class HelpCog(commands.Cog, name="Help"):
             logging.error(f"[Help] Error loading activated channels: {e}")
             return {}
 
-    def _save_system_prompts(self, prompts):
-        """Save system prompts to file"""
-        try:
-            with open(self.prompts_file, 'w', encoding='utf-8') as f:
-                json.dump({'system_prompts': prompts}, f, indent=2)
-            logging.info("[Help] Saved system prompts")
-        except Exception as e:
-            logging.error(f"[Help] Error saving system prompts: {str(e)}")
-            raise
-
-    def _load_system_prompts(self):
-        """Load system prompts from file"""
-        try:
-            if os.path.exists(self.prompts_file):
-                with open(self.prompts_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    return data.get('system_prompts', {})
-            return {}
-        except Exception as e:
-            logging.error(f"[Help] Error loading system prompts: {str(e)}")
-            return {}
+    def _find_agent(self, agent):
+        """Persona cog whose name matches, case-insensitively"""
+        for c in self.bot.cogs.values():
+            if hasattr(c, 'name') and c.name.lower() == agent.lower():
+                return c
+        return None
 
     @commands.hybrid_command(name="set_system_prompt", with_app_command=True)
     @commands.has_permissions(administrator=True)
@@ -72,28 +61,14 @@ class HelpCog(commands.Cog, name="Help"):
     async def set_system_prompt(self, ctx, agent: str, *, prompt: str):
         """Set a custom system prompt for an AI agent."""
         try:
-            # Load current prompts
-            prompts = self._load_system_prompts()
-            
-            # Find the cog
-            cog = None
-            for c in self.bot.cogs.values():
-                if hasattr(c, 'name') and c.name.lower() == agent.lower():
-                    cog = c
-                    break
-            
+            cog = self._find_agent(agent)
             if not cog:
                 await ctx.send(f"❌ Agent '{agent}' not found")
                 return
             
-            # Update the prompt
-            prompts[agent.lower()] = prompt
-            
-            # Save prompts
-            self._save_system_prompts(prompts)
-            
-            # Update the cog's prompt
-            cog.raw_prompt = prompt
+            # Stored as an override; applies from the next message
+            if not prompt_store.set_override(cog.name, prompt):
+                raise RuntimeError("prompt store write failed")
             
             await ctx.send(f"✅ System prompt updated for {agent}")
             
@@ -107,29 +82,14 @@ class HelpCog(commands.Cog, name="Help"):
     async def reset_system_prompt(self, ctx, agent: str):
         """Reset an AI agent's system prompt to its default value."""
         try:
-            # Load current prompts
-            prompts = self._load_system_prompts()
-            
-            # Find the cog
-            cog = None
-            for c in self.bot.cogs.values():
-                if hasattr(c, 'name') and c.name.lower() == agent.lower():
-                    cog = c
-                    break
-            
+            cog = self._find_agent(agent)
             if not cog:
                 await ctx.send(f"❌ Agent '{agent}' not found")
                 return
             
-            # Remove the custom prompt if it exists
-            if agent.lower() in prompts:
-                del prompts[agent.lower()]
-                
-            # Save prompts
-            self._save_system_prompts(prompts)
-            
-            # Reset the cog's prompt to default
-            cog.raw_prompt = cog.default_prompt
+            # Dropping the override brings back the shipped prompt
+            if not prompt_store.clear_override(cog.name):
+                raise RuntimeError("prompt store write failed")
             
             await ctx.send(f"✅ System prompt reset to default for {agent}")
             
@@ -137,6 +97,51 @@ class HelpCog(commands.Cog, name="Help"):
             logging.error(f"[Help] Error resetting system prompt: {str(e)}")
             await ctx.send("❌ Error resetting system prompt")
 
+    @commands.hybrid_command(name="set_channel_prompt", with_app_command=True)
+    @commands.has_permissions(administrator=True)
+    @discord.app_commands.describe(
+        agent="The AI agent to set the prompt for",
+        prompt="The system prompt to use in this channel"
+    )
+    async def set_channel_prompt(self, ctx, agent: str, *, prompt: str):
+        """Set a system prompt for an AI agent in this channel only."""
+        try:
+            cog = self._find_agent(agent)
+            if not cog:
+                await ctx.send(f"❌ Agent '{agent}' not found")
+                return
+            
+            guild_id = ctx.guild.id if ctx.guild else None
+            if not prompt_store.set_override(cog.name, prompt, guild_id, ctx.channel.id):
+                raise RuntimeError("prompt store write failed")
+            
+            await ctx.send(f"✅ System prompt for {agent} updated in this channel")
+            
+        except Exception as e:
+            logging.error(f"[Help] Error setting channel prompt: {str(e)}")
+            await ctx.send("❌ Error setting channel prompt")
+
+    @commands.hybrid_command(name="reset_channel_prompt", with_app_command=True)
+    @commands.has_permissions(administrator=True)
+    @discord.app_commands.describe(agent="The AI agent to reset the prompt for")
+    async def reset_channel_prompt(self, ctx, agent: str):
+        """Remove an AI agent's system prompt override in this channel."""
+        try:
+            cog = self._find_agent(agent)
+            if not cog:
+                await ctx.send(f"❌ Agent '{agent}' not found")
+                return
+            
+            guild_id = ctx.guild.id if ctx.guild else None
+            if not prompt_store.clear_override(cog.name, guild_id, ctx.channel.id):
+                raise RuntimeError("prompt store write failed")
+            
+            await ctx.send(f"✅ Channel prompt override removed for {agent}")
+            
+        except Exception as e:
+            logging.error(f"[Help] Error resetting channel prompt: {str(e)}")
+            await ctx.send("❌ Error resetting channel prompt")
+
     def get_all_models(self):
         """Get all models and their details from registered cogs"""
         models = []
@@ -253,6 +258,7 @@ All commands support both slash (/) and prefix (!) formats:
 • `/activate` - Make the bot respond to every message in the current channel (Admin only)
 • `/deactivate` - Deactivate the bot's response to every message in the current channel (Admin only)
 • `/hook <message>` - Send a response through configured Discord webhooks
+• `/compare <personas> <question>` - Ask up to 4 personas the same question at once (e.g. `!compare grok,gpt4o Why is the sky blue?`)
 • `/list_activated` - List all activated channels in the current server (Admin only)
 
 **System Prompt Variables:**
@@ -267,7 +273,7 @@ When setting custom system prompts, you can use these variables:
 
 """
             # Send the help message in chunks to avoid exceeding Discord's message length limit
-            for msg in [help_message[i:i + 2000] for i in range(0, len(help_message), 2000)]:
+            for msg in split_message(help_message):
                 await ctx.send(msg)
 
             logging.info(f"[Help] Sent help message to user {ctx.author.name}")
@@ -330,27 +336,21 @@ When setting custom system prompts, you can use these variables:
         if DEBUG_LOGGING:
             logging.info(f"[WebhookCog] Processing hook command: {content}")
 
-        # Create a copy of the message with the content
-        message = discord.Message.__new__(discord.Message)
-        message.__dict__.update(ctx.message.__dict__)
+        # Create a copy of the message with the content (discord.Message uses slots, not __dict__)
+        message = copy.copy(ctx.message)
         message.content = content
 
-        # Find an appropriate LLM cog to handle the message
+        # Find an appropriate LLM cog to handle the message; its result carries the reply text
         response = None
-        used_cog = None
 
         # Try router cog first if available
         router_cog = self.bot.get_cog('RouterCog')
         if router_cog:
             try:
                 # Let router handle the message
-                await router_cog.handle_message(message)
-                # Get the last message sent by the bot in this channel
-                async for msg in ctx.channel.history(limit=10):
-                    if msg.author == self.bot.user and msg.content.startswith('['):
-                        response = msg.content
-                        used_cog = router_cog
-                        break
+                result = await router_cog.handle_message(message)
+                if isinstance(result, ReplyResult) and result.ok:
+                    response = f"[{result.cog}] {result.text}"
             except Exception as e:
                 logging.error(f"[WebhookCog] Error using router: {str(e)}")
 
@@ -362,19 +362,17 @@ When setting custom system prompts, you can use these variables:
                     if any(word in msg_content for word in cog.trigger_words):
                         try:
                             # Let the cog handle the message
-                            await cog.handle_message(message)
-                            # Get the last message sent by the bot in this channel
-                            async for msg in ctx.channel.history(limit=10):
-                                if msg.author == self.bot.user and msg.content.startswith('['):
-                                    response = msg.content
-                                    used_cog = cog
-                                    break
+                            result = await cog.handle_message(message)
+                            if isinstance(result, ReplyResult) and result.ok:
+                                response = f"[{result.cog}] {result.text}"
+                                break
                         except Exception as e:
                             logging.error(f"[WebhookCog] Error with cog {cog.__class__.__name__}: {str(e)}")
 
         if response:
-            # Send to webhooks
-            success = await self.broadcast_to_webhooks(response)
+            # Send to webhooks; broadcasting lives in the webhook cog
+            webhook_cog = self.bot.get_cog('WebhookCog')
+            success = bool(webhook_cog) and await webhook_cog.broadcast_to_webhooks(response)
             
             if success:
                 await ctx.message.add_reaction('✅')
@@ -390,15 +388,8 @@ When setting custom system prompts, you can use these variables:
     async def list_activated_channels(self, ctx):
         """List all activated channels in the current server. Use /list_activated or !list_activated"""
         try:
-            router_cog = self.bot.get_cog('RouterCog')
-            if not router_cog:
-                await ctx.reply("❌ Router cog not found")
-                return
-
-            guild_id = str(ctx.guild.id)
-            
-            if guild_id in router_cog.activated_channels and router_cog.activated_channels[guild_id]:
-                activated_channels = list(router_cog.activated_channels[guild_id].keys())
+            activated_channels = access_control.active_channels(str(ctx.guild.id))
+            if activated_channels:
                 channel_mentions = [f"<#{channel_id}>" for channel_id in activated_channels]
                 
                 await ctx.reply("Activated channels:\n" + "\n".join(channel_mentions))
@@ -16,9 +16,9 @@ class LlamaVisionCog(BaseCog):
             prompt_file="llamavision_prompts",
             supports_vision=True
         )
-        logging.debug(f"[LlamaVision] Initialized with raw_prompt: {self.raw_prompt}")
-        logging.debug(f"[LlamaVision] Using provider: {self.provider}")
-        logging.debug(f"[LlamaVision] Vision support: {self.supports_vision}")
+        logging.debug("[LlamaVision] Initialized with raw_prompt: %s", self.raw_prompt)
+        logging.debug("[LlamaVision] Using provider: %s", self.provider)
+        logging.debug("[LlamaVision] Vision support: %s", self.supports_vision)
 
         # Load temperature settings
         try:
@@ -41,43 +41,17 @@ class LlamaVisionCog(BaseCog):
         try:
             # Format system prompt
             formatted_prompt = self.format_prompt(message)
-            messages = [{"role": "system", "content": formatted_prompt}]
 
-            # Get last 50 messages from database, excluding current message
-            channel_id = str(message.channel.id)
-            history_messages = await self.context_cog.get_context_messages(
-                channel_id, 
-                limit=50,
-                exclude_message_id=str(message.id)
-            )
-            
-            # Format history messages with proper roles
-            for msg in history_messages:
-                role = "assistant" if msg['is_assistant'] else "user"
-                content = msg['content']
-                
-                # Handle system summaries
-                if msg['user_id'] == 'SYSTEM' and content.startswith('[SUMMARY]'):
-                    role = "system"
-                    content = content[9:].strip()  # Remove [SUMMARY] prefix
-                
-                messages.append({
-                    "role": role,
-                    "content": content
-                })
-
-            # Add the current message
-            messages.append({
-                "role": "user",
-                "content": message.content
-            })
+            # Channel history allowed by the context policy and the current message, assembled once
+            # for every persona answering it; a rerolled response gets the same snapshot as the original
+            messages = await self.build_messages(message, formatted_prompt)
 
-            logging.debug(f"[LlamaVision] Sending {len(messages)} messages to API")
-            logging.debug(f"[LlamaVision] Formatted prompt: {formatted_prompt}")
+            logging.debug("[LlamaVision] Sending %s messages to API", len(messages))
+            logging.debug("[LlamaVision] Formatted prompt: %s", formatted_prompt)
 
             # Get temperature for this agent
             temperature = self.get_temperature()
-            logging.debug(f"[LlamaVision] Using temperature: {temperature}")
+            logging.debug("[LlamaVision] Using temperature: %s", temperature)
 
             # Get user_id and guild_id
             user_id = str(message.author.id)
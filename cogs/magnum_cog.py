@@ -16,9 +16,9 @@ class MagnumCog(BaseCog):
             prompt_file="magnum_prompts",
             supports_vision=False
         )
-        logging.debug(f"[Magnum] Initialized with raw_prompt: {self.raw_prompt}")
-        logging.debug(f"[Magnum] Using provider: {self.provider}")
-        logging.debug(f"[Magnum] Vision support: {self.supports_vision}")
+        logging.debug("[Magnum] Initialized with raw_prompt: %s", self.raw_prompt)
+        logging.debug("[Magnum] Using provider: %s", self.provider)
+        logging.debug("[Magnum] Vision support: %s", self.supports_vision)
 
         # Load temperature settings
         try:
@@ -42,44 +42,17 @@ class MagnumCog(BaseCog):
         try:
             # Format system prompt
             formatted_prompt = self.format_prompt(message)
-            messages = [{"role": "system", "content": formatted_prompt}]
 
-            # Get last 50 messages from database, excluding current message
-            channel_id = str(message.channel.id)
-            history_messages = await self.context_cog.get_context_messages(
-                channel_id, 
-                limit=50,
-                exclude_message_id=str(message.id),
-                model_id=self.model  # Pass model ID to enable message alternation
-            )
-            
-            # Format history messages with proper roles
-            for msg in history_messages:
-                role = "assistant" if msg['is_assistant'] else "user"
-                content = msg['content']
-                
-                # Handle system summaries
-                if msg['user_id'] == 'SYSTEM' and content.startswith('[SUMMARY]'):
-                    role = "system"
-                    content = content[9:].strip()  # Remove [SUMMARY] prefix
-                
-                messages.append({
-                    "role": role,
-                    "content": content
-                })
-
-            # Add the current message
-            messages.append({
-                "role": "user",
-                "content": message.content
-            })
+            # Channel history allowed by the context policy and the current message, assembled once
+            # for every persona answering it; a rerolled response gets the same snapshot as the original
+            messages = await self.build_messages(message, formatted_prompt, model_id=self.model)
 
-            logging.debug(f"[Magnum] Sending {len(messages)} messages to API")
-            logging.debug(f"[Magnum] Formatted prompt: {formatted_prompt}")
+            logging.debug("[Magnum] Sending %s messages to API", len(messages))
+            logging.debug("[Magnum] Formatted prompt: %s", formatted_prompt)
 
             # Get temperature for this agent
             temperature = self.get_temperature()
-            logging.debug(f"[Magnum] Using temperature: {temperature}")
+            logging.debug("[Magnum] Using temperature: %s", temperature)
 
             # Get user_id and guild_id
             user_id = str(message.author.id)
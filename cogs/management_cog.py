@@ -3,7 +3,9 @@ from discord.ext import commands
 import logging
 from .base_cog import BaseCog
 import json
-import sqlite3
+from shared.access_control import access_control
+from shared.dedupe import message_dedupe
+from shared.generation_scheduler import generation_scheduler
 
 class ManagementCog(BaseCog):
     def __init__(self, bot):
@@ -17,9 +19,9 @@ class ManagementCog(BaseCog):
             prompt_file="None",
             supports_vision=False
         )
-        logging.debug(f"[Management] Initialized with raw_prompt: {self.raw_prompt}")
-        logging.debug(f"[Management] Using provider: {self.provider}")
-        logging.debug(f"[Management] Vision support: {self.supports_vision}")
+        logging.debug("[Management] Initialized with raw_prompt: %s", self.raw_prompt)
+        logging.debug("[Management] Using provider: %s", self.provider)
+        logging.debug("[Management] Vision support: %s", self.supports_vision)
 
         # Load temperature settings
         try:
@@ -40,50 +42,15 @@ class ManagementCog(BaseCog):
 
     async def ban_user(self, user_id: str) -> bool:
         """Add a user to the banned users table"""
-        try:
-            db = sqlite3.connect('databases/interaction_logs.db')
-            cursor = db.cursor()
-            cursor.execute('INSERT OR REPLACE INTO banned_users (user_id) VALUES (?)', (str(user_id),))
-            db.commit()
-            db.close()
-            return True
-        except Exception as e:
-            logging.error(f"Error banning user: {str(e)}")
-            return False
+        return access_control.ban(user_id)
 
     async def activate_channel(self, channel_id: str, guild_id: str, user_id: str) -> bool:
         """Activate bot responses in a channel"""
-        try:
-            db = sqlite3.connect('databases/interaction_logs.db')
-            cursor = db.cursor()
-            cursor.execute('''
-                INSERT OR REPLACE INTO channel_activations 
-                (channel_id, guild_id, activated_by, is_active) 
-                VALUES (?, ?, ?, TRUE)
-            ''', (str(channel_id), str(guild_id), str(user_id)))
-            db.commit()
-            db.close()
-            return True
-        except Exception as e:
-            logging.error(f"Error activating channel: {str(e)}")
-            return False
+        return access_control.set_channel_active(channel_id, guild_id, user_id, True)
 
     async def deactivate_channel(self, channel_id: str, guild_id: str, user_id: str) -> bool:
         """Deactivate bot responses in a channel"""
-        try:
-            db = sqlite3.connect('databases/interaction_logs.db')
-            cursor = db.cursor()
-            cursor.execute('''
-                INSERT OR REPLACE INTO channel_activations 
-                (channel_id, guild_id, activated_by, is_active) 
-                VALUES (?, ?, ?, FALSE)
-            ''', (str(channel_id), str(guild_id), str(user_id)))
-            db.commit()
-            db.close()
-            return True
-        except Exception as e:
-            logging.error(f"Error deactivating channel: {str(e)}")
-            return False
+        return access_control.set_channel_active(channel_id, guild_id, user_id, False)
 
     @commands.hybrid_command(name="activate", description="Activate bot responses in this channel")
     @commands.has_permissions(administrator=True)
@@ -123,8 +90,58 @@ class ManagementCog(BaseCog):
             logging.error(f"Error in optout command: {str(e)}")
             await ctx.send("❌ An error occurred while processing your request.", ephemeral=True)
 
+    @commands.hybrid_command(name="token_budget", description="Show adaptive max_tokens, time saved and responses cut off")
+    @commands.has_permissions(administrator=True)
+    async def token_budget(self, ctx):
+        """Report the adaptive response budgets learned from the logs table"""
+        try:
+            budget = self.api_client.response_budget
+            rows = budget.report()
+            if not rows:
+                await ctx.send("No response length data has been collected yet.", ephemeral=True)
+                return
+
+            lines = [f"{'key':<32} {'n':>5} {'p50':>5} {'p95':>5} {'cap':>5} {'tok/s':>6} {'saved/req':>9} {'reqs':>5} {'cut':>4}"]
+            truncated = 0
+            for row in rows:
+                key = ':'.join(row['key'])[:32]
+                rate = f"{row['tokens_per_second']:.1f}" if row['tokens_per_second'] else '-'
+                saved = f"{row['seconds_saved']:.1f}s" if row['seconds_saved'] is not None else '-'
+                lines.append(f"{key:<32} {row['samples']:>5} {row['p50']:>5} {row['p95']:>5} {row['max_tokens']:>5} {rate:>6} {saved:>9} {row['requests']:>5} {row['truncated']:>4}")
+                truncated += row['truncated']
+
+            header = f"**Response budgets** (fixed limit {budget.fixed_limit} tokens, responses cut off by a cap so far: {truncated})\n"
+            report = header + "```\n" + "\n".join(lines) + "\n```"
+            if len(report) > 2000:
+                report = report[:1993] + "\n```"
+            await ctx.send(report, ephemeral=True)
+        except Exception as e:
+            logging.error(f"Error in token_budget command: {str(e)}")
+            await ctx.send("❌ An error occurred while processing your request.", ephemeral=True)
+
+    @commands.hybrid_command(name="queue_stats", description="Show generation queue waits and suppressed duplicate messages")
+    @commands.has_permissions(administrator=True)
+    async def queue_stats(self, ctx):
+        """Report the generation scheduler's admissions and queue waits, and the dedupe counts"""
+        try:
+            waits = generation_scheduler.wait_stats()
+            stats = generation_scheduler.stats
+            lines = [
+                f"generations   {stats['admitted']} admitted, {stats['queued']} queued, {stats['shed']} shed as busy",
+                f"queue wait    mean {waits['mean']:.2f}s, p95 {waits['p95']:.2f}s, max {waits['max']:.2f}s "
+                f"over the last {waits['count']}",
+                f"duplicates    {message_dedupe.stats['duplicates'] + message_dedupe.stats['stale']} suppressed "
+                f"of {message_dedupe.stats['accepted']} accepted ({len(message_dedupe)} ids remembered)",
+            ]
+            await ctx.send("**Generation queue**\n```\n" + "\n".join(lines) + "\n```", ephemeral=True)
+        except Exception as e:
+            logging.error(f"Error in queue_stats command: {str(e)}")
+            await ctx.send("❌ An error occurred while processing your request.", ephemeral=True)
+
     @activate.error
     @deactivate.error
+    @token_budget.error
+    @queue_stats.error
     async def admin_command_error(self, ctx, error):
         """Handle errors for admin commands"""
         if isinstance(error, commands.MissingPermissions):
@@ -133,58 +150,22 @@ class ManagementCog(BaseCog):
             logging.error(f"Error in admin command: {str(error)}")
             await ctx.send("❌ An error occurred while processing your request.", ephemeral=True)
 
-    @commands.Cog.listener()
-    async def on_message(self, message):
-        """Handle !optout command"""
-        if message.author.bot:
-            return
-
-        if message.content.lower() == "!optout":
-            ctx = await self.bot.get_context(message)
-            await self.optout(ctx)
-
     async def generate_response(self, message):
         """Generate a response using openrouter"""
         try:
             # Format system prompt
             formatted_prompt = self.format_prompt(message)
-            messages = [{"role": "system", "content": formatted_prompt}]
-
-            # Get last 50 messages from database, excluding current message
-            channel_id = str(message.channel.id)
-            history_messages = await self.context_cog.get_context_messages(
-                channel_id, 
-                limit=50,
-                exclude_message_id=str(message.id)
-            )
-            
-            # Format history messages with proper roles
-            for msg in history_messages:
-                role = "assistant" if msg['is_assistant'] else "user"
-                content = msg['content']
-                
-                # Handle system summaries
-                if msg['user_id'] == 'SYSTEM' and content.startswith('[SUMMARY]'):
-                    role = "system"
-                    content = content[9:].strip()  # Remove [SUMMARY] prefix
-                
-                messages.append({
-                    "role": role,
-                    "content": content
-                })
-
-            # Add the current message
-            messages.append({
-                "role": "user",
-                "content": message.content
-            })
-
-            logging.debug(f"[Management] Sending {len(messages)} messages to API")
-            logging.debug(f"[Management] Formatted prompt: {formatted_prompt}")
+
+            # Channel history allowed by the context policy and the current message, assembled once
+            # for every persona answering it; a rerolled response gets the same snapshot as the original
+            messages = await self.build_messages(message, formatted_prompt)
+
+            logging.debug("[Management] Sending %s messages to API", len(messages))
+            logging.debug("[Management] Formatted prompt: %s", formatted_prompt)
 
             # Get temperature for this agent
             temperature = self.get_temperature()
-            logging.debug(f"[Management] Using temperature: {temperature}")
+            logging.debug("[Management] Using temperature: %s", temperature)
 
             # Get user_id and guild_id
             user_id = str(message.author.id)
@@ -3,10 +3,10 @@ from discord.ext import commands
 import asyncio
 import logging
 import json
-import sqlite3
 from datetime import datetime, timezone, timedelta
 from textblob import TextBlob
 from shared.api import api
+from shared.reply_result import ReplyResult
 from .base_cog import BaseCog
 import xml.etree.ElementTree as ET
 
@@ -27,9 +27,6 @@ class RouterCog(BaseCog):
         self.router_system_prompt = self._load_router_system_prompt()
         self.api_client = api
         
-        # Message tracking to prevent multiple responses
-        self.handled_messages = set()
-
         # Bot names to ignore (in addition to actual bot mentions)
         self.bot_names = {
             'grok', 'claude', 'gpt4', 'gpt-4', 'sydney', 'hermes', 
@@ -87,20 +84,6 @@ class RouterCog(BaseCog):
             logging.error("[Router] System prompt file not found.")
             return ""
 
-    async def is_channel_activated(self, channel_id: str, guild_id: str) -> bool:
-        """Check if a channel is activated for bot interactions"""
-        try:
-            db = sqlite3.connect('databases/interaction_logs.db')
-            cursor = db.cursor()
-            cursor.execute('SELECT is_active FROM channel_activations WHERE channel_id = ? AND guild_id = ?', 
-                         (str(channel_id), str(guild_id)))
-            result = cursor.fetchone()
-            db.close()
-            return bool(result[0]) if result else False
-        except Exception as e:
-            logging.error(f"Error checking channel activation status: {str(e)}")
-            return False
-
     def _get_uptime(self) -> str:
         """Calculate and format the bot's uptime"""
         now = datetime.now(timezone.utc)
@@ -135,6 +118,13 @@ class RouterCog(BaseCog):
                 except ValueError:
                     pass
 
+            # The </modelCog> stop sequence means the closing tag is usually absent
+            if '<modelCog>' in response:
+                start = response.index('<modelCog>') + len('<modelCog>')
+                model_name = response[start:].strip()
+                if model_name:
+                    return model_name
+
             # Fallback to previous extraction method
             clean_response = response.strip().lower()
             
@@ -218,42 +208,42 @@ class RouterCog(BaseCog):
         uptime_str = self._get_uptime()
         await ctx.send(f"🕒 Bot has been running for: {uptime_str}")
 
-    async def handle_message(self, message):
+    async def handle_message(self, message, full_content=None):
         """Legacy method to maintain compatibility with tests"""
-        await self.route_message(message)
-
-    async def route_message(self, message):
-        """Route the message to the appropriate cog based on the model's decision."""
+        return await self.route_message(message, full_content=full_content)
+
+    async def _forward(self, cog, message, result: ReplyResult, full_content=None) -> ReplyResult:
+        """Hand the message to a persona cog, keeping the routing time in its result"""
+        kwargs = {'full_content': full_content} if full_content else {}
+        reply = await cog.handle_message(message, **kwargs)
+        if not isinstance(reply, ReplyResult):
+            reply = ReplyResult(getattr(cog, 'name', None))
+        reply.timings = {**result.timings, **reply.timings}
+        return reply
+
+    async def route_message(self, message, full_content=None) -> ReplyResult:
+        """Route the message to the appropriate cog based on the model's decision.
+
+        `full_content` (the text of a merged burst) is routed on instead of
+        the message's own text. Returns the ReplyResult of the cog that answered.
+        """
+        result = ReplyResult(self.name)
         try:
-            # Check if message has already been handled
-            if message.id in self.handled_messages:
-                logging.info(f"[Router] Message {message.id} already handled, skipping")
-                return
-            
-            # Check if message mentions other bots
-            if self._mentions_other_bot(message):
-                logging.info(f"[Router] Message {message.id} mentions other bot, skipping")
-                return
-            
-            # Mark message as handled
-            self.handled_messages.add(message.id)
-            
-            # Clean up old message IDs (keep last 1000)
-            if len(self.handled_messages) > 1000:
-                self.handled_messages = set(list(self.handled_messages)[-1000:])
+            # Dedupe and the other-bot check are done by the dispatcher before routing
 
             # Analyze message sentiment
-            polarity, subjectivity = self.analyze_sentiment(message.content)
+            content = full_content or message.content
+            polarity, subjectivity = self.analyze_sentiment(content)
             logging.info(f"[Router] Message sentiment - Polarity: {polarity}, Subjectivity: {subjectivity}")
 
             # Format the system prompt with the user message and sentiment
             context = f"Sentiment Analysis - Polarity: {polarity}, Subjectivity: {subjectivity}"
-            formatted_prompt = self.router_system_prompt.replace("{user_message}", message.content).replace("{context}", context)
+            formatted_prompt = self.router_system_prompt.replace("{user_message}", content).replace("{context}", context)
 
             # Prepare messages for the model
             messages = [
                 {"role": "system", "content": formatted_prompt},
-                {"role": "user", "content": message.content}
+                {"role": "user", "content": content}
             ]
 
             # Start typing indicator
@@ -286,70 +276,40 @@ class RouterCog(BaseCog):
                     cog_name = cog_name + "Cog"
                     logging.info(f"[Router] Looking for cog: {cog_name}")
                     cog = self.bot.get_cog(cog_name)
+                    result.lap('route')
                     
                     if cog and hasattr(cog, 'handle_message'):
                         logging.info(f"[Router] Found cog {cog_name}, forwarding message")
                         # Forward the message to the cog
-                        await cog.handle_message(message)
+                        return await self._forward(cog, message, result, full_content)
                     else:
                         logging.error(f"[Router] Cog '{cog_name}' not found or 'handle_message' not implemented")
                         # Default to GPT4O if cog not found
                         fallback_cog = self.bot.get_cog("GPT4OCog")
                         if fallback_cog and hasattr(fallback_cog, 'handle_message'):
                             logging.info("[Router] Falling back to GPT4OCog")
-                            await fallback_cog.handle_message(message)
+                            return await self._forward(fallback_cog, message, result, full_content)
                         else:
+                            result.error = f"no cog named {cog_name}"
                             await message.reply("❌ Unable to route message to the appropriate module.")
 
                 except Exception as e:
                     logging.error(f"[Router] API error: {str(e)}")
+                    result.lap('route')
                     # Attempt to fallback to GPT4O
                     fallback_cog = self.bot.get_cog("GPT4OCog")
                     if fallback_cog and hasattr(fallback_cog, 'handle_message'):
                         logging.info("[Router] Falling back to GPT4OCog due to API error")
-                        await fallback_cog.handle_message(message)
+                        return await self._forward(fallback_cog, message, result, full_content)
                     else:
+                        result.error = str(e)
                         await message.reply("❌ An error occurred while processing your message. Please try again later.")
 
         except Exception as e:
             logging.error(f"[Router] Error routing message: {str(e)}")
+            result.error = str(e)
             await message.reply("❌ An error occurred while processing your message.")
-
-    @commands.Cog.listener()
-    async def on_message(self, message):
-        """Handle incoming messages"""
-        # Ignore messages from bots
-        if message.author.bot:
-            return
-
-        # Check if message has already been handled
-        if message.id in self.handled_messages:
-            return
-
-        # Check if message mentions other bots
-        if self._mentions_other_bot(message):
-            return
-
-        # Always process DMs
-        is_dm = isinstance(message.channel, discord.DMChannel)
-        if is_dm:
-            await self.route_message(message)
-            return
-
-        # Check if message mentions the bot
-        is_mention = self.bot.user in message.mentions
-        if is_mention:
-            await self.route_message(message)
-            return
-
-        # Check if channel is activated for guild messages
-        if message.guild:
-            if await self.is_channel_activated(str(message.channel.id), str(message.guild.id)):
-                # Check for specific keywords that would trigger other cogs
-                for cog in self.bot.cogs.values():
-                    if hasattr(cog, 'trigger_words') and any(word.lower() in message.content.lower() for word in cog.trigger_words):
-                        return  # Let other cogs handle their specific triggers
-                await self.route_message(message)
+        return result
 
     async def cog_load(self):
         """Called when the cog is loaded."""
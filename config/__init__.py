@@ -6,9 +6,22 @@ from .config import (
     OPENAI_API_KEY,
     HELICONE_API_KEY,
     LOG_LEVEL,
+    PERSONA_CLIENTS,
+    PERSONA_PRESENTATION,
+    PERSONA_AVATAR_URL,
     CONTEXT_WINDOWS,
     DEFAULT_CONTEXT_WINDOW,
     MAX_CONTEXT_WINDOW,
+    CONTEXT_MEMORY_MB,
+    GENERATION_CONCURRENCY,
+    GENERATION_QUEUE_LIMIT,
+    BURST_WINDOW,
+    BURST_MAX_HOLD,
+    BURST_SCOPE,
+    OUTPUT_STRATEGY,
+    OUTPUT_MAX_PARTS,
+    SUMMARY_MODEL,
+    SUMMARY_THRESHOLD_TOKENS,
     ERROR_MESSAGES,
     BLOCKED_KEYWORDS
 )
@@ -24,6 +24,17 @@ SYDNEY_TOKEN = os.getenv('SYDNEY_TOKEN')
 UNSLOP_TOKEN = os.getenv('UNSLOP_TOKEN')
 WIZARD_TOKEN = os.getenv('WIZARD_TOKEN')
 
+# Log in a separate gateway client for every persona with a token above.
+# Off by default: personas post through per-channel webhooks instead
+PERSONA_CLIENTS = os.getenv('PERSONA_CLIENTS', 'false').lower() in ('1', 'true', 'yes')
+
+# How persona replies are shown: 'webhook' posts under the persona's name and
+# avatar, 'nickname' replies as the bot and renames it before each reply
+PERSONA_PRESENTATION = os.getenv('PERSONA_PRESENTATION', 'webhook')
+
+# Optional avatar URL template for persona webhooks, e.g. https://example.com/{name}.png
+PERSONA_AVATAR_URL = os.getenv('PERSONA_AVATAR_URL')
+
 # OpenRouter API key
 OPENROUTER_API_KEY = os.getenv('OPENROUTER_API_KEY')
 
@@ -51,12 +62,40 @@ DEFAULT_CONTEXT_WINDOW = 10
 # Maximum context window
 MAX_CONTEXT_WINDOW = 50
 
+# Memory for the per-channel context rings; least recently used channels are
+# dropped from memory (not from the database) beyond this
+CONTEXT_MEMORY_MB = int(os.getenv('CONTEXT_MEMORY_MB', '32'))
+
+# Generations allowed to run at once, and how many may wait before new
+# ambient messages get a busy reply
+GENERATION_CONCURRENCY = int(os.getenv('GENERATION_CONCURRENCY', '8'))
+GENERATION_QUEUE_LIMIT = int(os.getenv('GENERATION_QUEUE_LIMIT', '32'))
+
+# Quick follow-up messages in activated channels are merged into one turn.
+# BURST_WINDOW is the quiet time (seconds) that ends a burst, 0 disables it;
+# BURST_SCOPE is 'user' (merge per author) or 'channel' (merge everyone)
+BURST_WINDOW = float(os.getenv('BURST_WINDOW', '1.5'))
+BURST_MAX_HOLD = float(os.getenv('BURST_MAX_HOLD', '5'))
+BURST_SCOPE = os.getenv('BURST_SCOPE', 'user')
+
+# Responses needing more than OUTPUT_MAX_PARTS messages are delivered as a
+# preview plus 'attachment' (a .md/.txt file) or 'paginate' (an embed with
+# page buttons); 'split' keeps sending 2000-character messages
+OUTPUT_STRATEGY = os.getenv('OUTPUT_STRATEGY', 'attachment')
+OUTPUT_MAX_PARTS = int(os.getenv('OUTPUT_MAX_PARTS', '2'))
+
+# Channel history beyond SUMMARY_THRESHOLD_TOKENS (estimated) is folded into a
+# rolling summary by SUMMARY_MODEL in the background; 0 disables it
+SUMMARY_MODEL = os.getenv('SUMMARY_MODEL', 'openpipe:openrouter/mistralai/ministral-8b')
+SUMMARY_THRESHOLD_TOKENS = int(os.getenv('SUMMARY_THRESHOLD_TOKENS', '3000'))
+
 # Other configuration variables can be added here as needed
 # Error Messages
 ERROR_MESSAGES = {
     'credits_depleted': "⚠️ Credits depleted. Please contact the bot administrator.",
     'invalid_api_key': "🔑 Invalid API key. Please contact the bot administrator.",
     'rate_limit': "⏳ Rate limit exceeded. Please try again later.",
+    'busy': "⏳ I'm busy with a lot of messages right now. Please try again in a moment.",
     'network_error': "🌐 Network error. Please try again later.",
     'unknown_error': "❌ An error occurred. Please try again later.",
     'reporting_error': "📝 Unable to log interaction, but response was successful."
@@ -69,13 +69,19 @@ CREATE TABLE IF NOT EXISTS channel_activations (
     is_active BOOLEAN NOT NULL DEFAULT TRUE
 );
 
+-- System prompt overrides (empty guild_id and channel_id mean persona-wide)
+CREATE TABLE IF NOT EXISTS prompt_overrides (
+    persona TEXT NOT NULL,
+    guild_id TEXT NOT NULL DEFAULT '',
+    channel_id TEXT NOT NULL DEFAULT '',
+    prompt TEXT NOT NULL,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (persona, guild_id, channel_id)
+);
 -- Create indexes for better query performance
-CREATE INDEX IF NOT EXISTS idx_messages_channel ON messages(channel_id);
+-- Indexes on existing tables are changed by migrations in shared/migrations.py, not here
 CREATE INDEX IF NOT EXISTS idx_messages_timestamp ON messages(timestamp);
 CREATE INDEX IF NOT EXISTS idx_messages_user ON messages(user_id);
-CREATE INDEX IF NOT EXISTS idx_messages_persona ON messages(persona_name);
-CREATE INDEX IF NOT EXISTS idx_messages_discord_id ON messages(discord_message_id);  -- Added index for Discord message ID
-CREATE INDEX IF NOT EXISTS idx_summaries_channel ON chat_summaries(channel_id);
 CREATE INDEX IF NOT EXISTS idx_summaries_timestamp ON chat_summaries(end_timestamp);
 CREATE INDEX IF NOT EXISTS idx_logs_requested_at ON logs(requested_at);
 CREATE INDEX IF NOT EXISTS idx_logs_status_code ON logs(status_code);
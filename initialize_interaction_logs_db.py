@@ -1,17 +1,8 @@
-import sqlite3
+from shared.migrations import migrate
 
 def initialize_db():
-    with open('databases/schema.sql', 'r') as f:
-        schema_sql = f.read()
-
-    conn = sqlite3.connect('databases/interaction_logs.db')
-    cursor = conn.cursor()
-
-    cursor.executescript(schema_sql)
-
-    conn.commit()
-    conn.close()
-    print('Database initialized successfully.')
+    version = migrate('databases/interaction_logs.db')
+    print(f'Database initialized successfully (schema version {version}).')
 
 if __name__ == '__main__':
     initialize_db()
@@ -0,0 +1,108 @@
+import time
+import sqlite3
+import logging
+from typing import Dict, List, Set, Tuple
+
+# Wait between load attempts while the database is unavailable
+RELOAD_RETRY_SECONDS = 30.0
+
+
+class AccessControl:
+    """In-memory copy of banned_users and channel_activations.
+
+    Loaded once at startup; ManagementCog writes through it so the cache and
+    the database never disagree. Message gating is then two O(1) lookups
+    instead of two SQLite connections per cog per message.
+
+    While the tables can't be read (load is retried at most every
+    RELOAD_RETRY_SECONDS), the sets stay empty: ban checks fail open (no
+    one is banned) and activation checks fail closed (no channel is
+    active), as the per-message queries did before.
+    """
+
+    def __init__(self, db_path: str = 'databases/interaction_logs.db'):
+        self.db_path = db_path
+        self.banned: Set[str] = set()
+        self.channels: Dict[str, Tuple[str, bool]] = {}  # channel_id -> (guild_id, is_active)
+        self.loaded = False
+        self._retry_at = 0.0  # throttles reloads while the tables are unavailable
+
+    def load(self) -> bool:
+        """(Re)load both tables from the database"""
+        try:
+            db = sqlite3.connect(self.db_path)
+            try:
+                cursor = db.cursor()
+                cursor.execute('SELECT user_id FROM banned_users')
+                banned = {str(row[0]) for row in cursor.fetchall()}
+                cursor.execute('SELECT channel_id, guild_id, is_active FROM channel_activations')
+                channels = {str(row[0]): (str(row[1]), bool(row[2])) for row in cursor.fetchall()}
+            finally:
+                db.close()
+            self.banned = banned
+            self.channels = channels
+            self.loaded = True
+            logging.info(f"[AccessControl] Loaded {len(banned)} banned users and {len(channels)} channel activations")
+            return True
+        except Exception as e:
+            logging.error(f"[AccessControl] Error loading access control tables: {str(e)}")
+            self._retry_at = time.monotonic() + RELOAD_RETRY_SECONDS
+            return False
+
+    def _ensure_loaded(self):
+        if not self.loaded and time.monotonic() >= self._retry_at:
+            self.load()
+
+    def is_banned(self, user_id) -> bool:
+        self._ensure_loaded()
+        return str(user_id) in self.banned
+
+    def is_channel_active(self, channel_id, guild_id) -> bool:
+        self._ensure_loaded()
+        entry = self.channels.get(str(channel_id))
+        return entry is not None and entry[1] and entry[0] == str(guild_id)
+
+    def active_channels(self, guild_id) -> List[str]:
+        self._ensure_loaded()
+        return [channel_id for channel_id, (guild, active) in self.channels.items()
+                if active and guild == str(guild_id)]
+
+    def ban(self, user_id) -> bool:
+        """Write a ban to the database, then to the cache"""
+        try:
+            db = sqlite3.connect(self.db_path)
+            try:
+                db.execute('INSERT OR REPLACE INTO banned_users (user_id) VALUES (?)', (str(user_id),))
+                db.commit()
+            finally:
+                db.close()
+        except Exception as e:
+            logging.error(f"Error banning user: {str(e)}")
+            return False
+        self._ensure_loaded()
+        self.banned.add(str(user_id))
+        return True
+
+    def set_channel_active(self, channel_id, guild_id, user_id, active: bool) -> bool:
+        """Write a channel activation change to the database, then to the cache"""
+        try:
+            db = sqlite3.connect(self.db_path)
+            try:
+                db.execute('''
+                    INSERT OR REPLACE INTO channel_activations
+                    (channel_id, guild_id, activated_by, is_active)
+                    VALUES (?, ?, ?, ?)
+                ''', (str(channel_id), str(guild_id), str(user_id), bool(active)))
+                db.commit()
+            finally:
+                db.close()
+        except Exception as e:
+            logging.error(f"Error {'activating' if active else 'deactivating'} channel: {str(e)}")
+            return False
+        self._ensure_loaded()
+        self.channels[str(channel_id)] = (str(guild_id), bool(active))
+        return True
+
+
+# Shared cache for all cogs
+access_control = AccessControl()
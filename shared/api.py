@@ -19,20 +19,14 @@ from config import (
 from openpipe import OpenAI as OpenPipeAI
 from openai import AsyncOpenAI
 from concurrent.futures import ThreadPoolExecutor
+from shared.response_budget import ResponseBudget
+from shared.migrations import migrate
+from shared.context_assembler import AssembledMessages
 
-# Create required directories before configuring logging
-os.makedirs('logs', exist_ok=True)
+# Create required directories
 os.makedirs('databases', exist_ok=True)
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('logs/api.log'),
-        logging.StreamHandler()
-    ]
-)
+# Logging is configured once by the entry point (see shared/logging_setup.py)
 logger = logging.getLogger(__name__)
 
 class DatabasePool:
@@ -82,6 +76,9 @@ class API:
             self.last_request_time = 0
             self.min_request_interval = 0.1  # 100ms between requests
 
+            # Adaptive max_tokens / stop sequences learned from the logs table
+            self.response_budget = ResponseBudget('databases/interaction_logs.db')
+
             # Initialize database schema
             self._init_db()
             
@@ -130,31 +127,18 @@ class API:
                 }
             )
 
+            # Load response length distributions without blocking the event loop
+            await asyncio.get_running_loop().run_in_executor(None, self.response_budget.refresh)
+
     def _init_db(self):
         """Initialize database schema"""
         try:
             # Create the database directory if it doesn't exist
             os.makedirs('databases', exist_ok=True)
             
-            with open('databases/schema.sql', 'r') as schema_file:
-                schema_sql = schema_file.read()
-            
-            # Apply schema synchronously
-            conn = sqlite3.connect('databases/interaction_logs.db')
-            cursor = conn.cursor()
-            
-            # Split and execute each statement separately
-            statements = [stmt.strip() for stmt in schema_sql.split(';') if stmt.strip()]
-            for statement in statements:
-                try:
-                    cursor.execute(statement)
-                    conn.commit()  # Commit after each statement
-                except sqlite3.OperationalError as e:
-                    if "already exists" not in str(e):  # Ignore "table already exists" errors
-                        raise
-            
-            conn.close()
-            logger.info("[API] Successfully initialized database schema")
+            # Apply schema.sql and any pending migrations synchronously
+            version = migrate('databases/interaction_logs.db')
+            logger.info(f"[API] Successfully initialized database schema (version {version})")
         except Exception as e:
             logger.error(f"[API] Failed to initialize database schema: {str(e)}")
             raise
@@ -274,10 +258,11 @@ class API:
         
         return 'application/octet-stream'
 
-    async def _stream_response(self, response_stream, requested_at: int, payload: Dict, provider: str, user_id: str, guild_id: str, prompt_file: str, model_cog: str) -> AsyncGenerator[str, None]:
+    async def _stream_response(self, response_stream, requested_at: int, payload: Dict, provider: str, user_id: str, guild_id: str, prompt_file: str, model_cog: str, budget_key: tuple = None) -> AsyncGenerator[str, None]:
         """Handle streaming response with improved chunk handling"""
         full_response = ""
         citations = None  # Will be populated from the root response object
+        finish_reason = None
         try:
             # Get citations from the root response object if available
             if hasattr(response_stream, 'citations'):
@@ -295,6 +280,7 @@ class API:
                     if not chunk or not chunk.choices:
                         continue
 
+                    finish_reason = getattr(chunk.choices[0], 'finish_reason', None) or finish_reason
                     delta = chunk.choices[0].delta
                     if hasattr(delta, 'content') and delta.content:
                         full_response += delta.content
@@ -323,6 +309,7 @@ class API:
                     if not chunk or not chunk.choices:
                         continue
 
+                    finish_reason = getattr(chunk.choices[0], 'finish_reason', None) or finish_reason
                     delta = chunk.choices[0].delta
                     if hasattr(delta, 'content') and delta.content:
                         full_response += delta.content
@@ -345,6 +332,10 @@ class API:
                     yield citation_text
                     full_response += citation_text
 
+            # Text already streamed can't be taken back; a cut-off answer raises the cap for later ones
+            if self.response_budget.record_finish(budget_key, payload['max_tokens'], finish_reason):
+                logger.warning(f"[API] Streamed response for {model_cog or prompt_file} was cut off at max_tokens={payload['max_tokens']}")
+
             # Log completion with full accumulated response
             received_at = int(time.time() * 1000)
             try:
@@ -365,23 +356,6 @@ class API:
                     user_id=user_id,
                     guild_id=guild_id
                 )
-                
-                # Now that streaming is complete, attempt to notify context_cog with the full response
-                try:
-                    if self.bot and hasattr(self.bot, 'get_cog'):
-                        context_cog = self.bot.get_cog('ContextCog')
-                        if context_cog:
-                            await context_cog.add_message_to_context(
-                                message_id=None,  # You'll need to pass the correct message ID
-                                channel_id=None,  # You'll need to pass the correct channel ID
-                                guild_id=guild_id,
-                                user_id=user_id,
-                                content=full_response,
-                                is_assistant=True
-                            )
-                except Exception as e:
-                    logger.warning(f"[API] Failed to notify context_cog: {str(e)}")
-                    # Continue execution even if context notification fails
             except Exception as e:
                 logger.error(f"[API] Failed to report streaming interaction: {str(e)}")
 
@@ -391,28 +365,48 @@ class API:
             yield error_msg
             full_response += error_msg
 
-    async def call_openpipe(self, messages: List[Dict[str, Union[str, List[Dict[str, Any]]]]], model: str, temperature: float = None, stream: bool = False, max_tokens: int = None, provider: str = None, user_id: str = None, guild_id: str = None, prompt_file: str = None, model_cog: str = None, tools: List[Dict] = None, tool_choice: Union[str, Dict] = None) -> Union[Dict, AsyncGenerator[str, None]]:
-        """Call OpenPipe API with fallback support"""
+    async def call_openpipe(self, messages: List[Dict[str, Union[str, List[Dict[str, Any]]]]], model: str, temperature: float = None, stream: bool = False, max_tokens: int = None, provider: str = None, user_id: str = None, guild_id: str = None, prompt_file: str = None, model_cog: str = None, tools: List[Dict] = None, tool_choice: Union[str, Dict] = None, stop: List[str] = None) -> Union[Dict, AsyncGenerator[str, None]]:
+        """Call OpenPipe API with fallback support.
+
+        When max_tokens or stop are not given they are chosen by the response
+        budget from observed response lengths for this cog/prompt/guild.
+        """
         if self.session is None:
             await self.setup()
 
         try:
             await self._enforce_rate_limit()
             
-            logger.debug(f"[API] Making OpenPipe request to model: {model}")
-            logger.debug(f"[API] Stream mode: {stream}")
+            logger.debug("[API] Making OpenPipe request to model: %s", model)
+            logger.debug("[API] Stream mode: %s", stream)
             
-            validated_messages = await self._validate_message_roles(messages)
+            # Messages from the ContextAssembler were built in this shape and are sent as they are
+            if isinstance(messages, AssembledMessages):
+                validated_messages = list(messages)
+            else:
+                validated_messages = await self._validate_message_roles(messages)
+
+            budget_key = None  # set when max_tokens is an adaptive cap
+            if max_tokens is None or stop is None:
+                budget = self.response_budget.suggest(model_cog=model_cog, prompt_file=prompt_file, guild_id=guild_id)
+                if max_tokens is None:
+                    max_tokens = budget['max_tokens']
+                    budget_key = budget.get('key')
+                if stop is None:
+                    stop = budget['stop']
             
             # Prepare request payload
             payload = {
                 "model": model,
                 "messages": validated_messages,
                 "temperature": temperature if temperature is not None else 0.7,
-                "max_tokens": max_tokens if max_tokens is not None else 1000,
+                "max_tokens": max_tokens,
                 "stream": stream
             }
 
+            if stop:
+                payload["stop"] = stop
+
             # Add tools if provided
             if tools:
                 payload["tools"] = tools
@@ -440,7 +434,7 @@ class API:
                 response = await self.openpipe_client.chat.completions.create(**payload)
                 
                 # Debugging: Log the type of response_stream
-                logger.debug(f"[API] Type of response_stream: {type(response)}")
+                logger.debug("[API] Type of response_stream: %s", type(response))
                 
                 if stream:
                     # Handle streaming response
@@ -449,18 +443,18 @@ class API:
                         async def response_generator():
                             async for chunk in response.chunks:
                                 yield chunk
-                        return self._stream_response(response_generator(), requested_at, payload, provider, user_id, guild_id, prompt_file, model_cog)
+                        return self._stream_response(response_generator(), requested_at, payload, provider, user_id, guild_id, prompt_file, model_cog, budget_key)
                     elif hasattr(response, 'chunks') and hasattr(response.chunks, '__iter__'):
                         # Convert synchronous iterable to async generator
                         async def response_generator():
                             for chunk in response.chunks:
                                 yield chunk
-                        return self._stream_response(response_generator(), requested_at, payload, provider, user_id, guild_id, prompt_file, model_cog)
+                        return self._stream_response(response_generator(), requested_at, payload, provider, user_id, guild_id, prompt_file, model_cog, budget_key)
                     else:
                         # Non-streaming fallback
                         async def response_generator():
                             yield response
-                        return self._stream_response(response_generator(), requested_at, payload, provider, user_id, guild_id, prompt_file, model_cog)
+                        return self._stream_response(response_generator(), requested_at, payload, provider, user_id, guild_id, prompt_file, model_cog, budget_key)
                 else:
                     received_at = int(time.time() * 1000)
                     
@@ -469,6 +463,16 @@ class API:
                         logger.error(f"[API] {error_msg}")
                         raise ValueError(error_msg)
                     
+                    # An answer cut off by the adaptive cap is asked for again once under the fixed limit
+                    if self.response_budget.record_finish(budget_key, max_tokens, getattr(response.choices[0], 'finish_reason', None)):
+                        logger.warning(f"[API] Response for {model_cog or prompt_file} was cut off at max_tokens={max_tokens}; retrying")
+                        return await self.call_openpipe(
+                            messages=messages, model=model, temperature=temperature, stream=False,
+                            max_tokens=self.response_budget.fixed_limit, provider=provider, user_id=user_id,
+                            guild_id=guild_id, prompt_file=prompt_file, model_cog=model_cog, tools=tools,
+                            tool_choice=tool_choice, stop=stop
+                        )
+
                     content = response.choices[0].message.content
                     citations = getattr(response, 'citations', None)
                     
@@ -577,7 +581,7 @@ class API:
 
                 cursor.execute(sql, values)
                 conn.commit()
-                logger.debug(f"[API] Logged interaction with status code {status_code}")
+                logger.debug("[API] Logged interaction with status code %s", status_code)
 
         except Exception as e:
             logger.error(f"[API] Failed to report interaction: {str(e)}")
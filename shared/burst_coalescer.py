@@ -0,0 +1,152 @@
+import time
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, Optional
+
+from config import BURST_WINDOW, BURST_MAX_HOLD, BURST_SCOPE
+from shared.dispatcher import Route
+
+# Bounds for the adaptive quiet window, as multiples of the configured window
+MIN_STRETCH = 0.5
+MAX_STRETCH = 2.0
+
+# A burst this long is answered without waiting for the window
+MAX_MESSAGES = 8
+
+# Weight of the newest gap in a channel's typing-cadence average
+GAP_SMOOTHING = 0.3
+
+
+def llm_calls(route) -> int:
+    """LLM calls one message costs on its own: routed messages pay the router call too"""
+    return 2 if route.reason == Route.ROUTER else 1
+
+
+class _Burst:
+    __slots__ = ('entries', 'first_at', 'last_at', 'task', 'handler')
+
+    def __init__(self, now: float, handler: Callable[[object, object], Awaitable]):
+        self.entries = []  # (message, route) in arrival order
+        self.first_at = now
+        self.last_at = now
+        self.task: Optional[asyncio.Task] = None
+        self.handler = handler
+
+
+class BurstCoalescer:
+    """Merges quick runs of messages in a channel into a single turn.
+
+    A message is held until its channel has been quiet for the window, and
+    every message that arrives in the meantime joins it. The burst is then
+    routed and generated once, replying to the latest message with the text
+    of all of them; the messages themselves are left as they are. The window
+    follows each channel's own typing cadence (twice the average gap between
+    burst messages, between half and twice the configured window), and no
+    burst is held longer than `max_hold`. With scope 'user' each author's
+    burst is separate; with 'channel' everyone's is merged. A burst's route
+    is its last trigger route, if any, else the router. close() answers the
+    bursts still held when the bot shuts down.
+    """
+
+    def __init__(self, window: float = BURST_WINDOW, max_hold: float = BURST_MAX_HOLD, scope: str = BURST_SCOPE):
+        self.window = window
+        self.max_hold = max_hold
+        self.scope = scope
+        self._bursts: Dict[tuple, _Burst] = {}
+        self._gaps: Dict[int, float] = {}  # channel id -> average gap between burst messages
+        self.stats = {'bursts': 0, 'merged': 0, 'llm_calls_saved': 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.window > 0
+
+    def _key(self, message) -> tuple:
+        if self.scope == 'channel':
+            return (message.channel.id,)
+        return (message.channel.id, message.author.id)
+
+    def window_for(self, channel_id) -> float:
+        """Quiet time that ends a burst in this channel"""
+        gap = self._gaps.get(channel_id)
+        if gap is None:
+            return self.window
+        return min(self.window * MAX_STRETCH, max(self.window * MIN_STRETCH, gap * 2))
+
+    def add(self, message, route, handler: Callable[[object, object], Awaitable]):
+        """Hold a message; `handler(route, message)` runs once for its whole burst"""
+        now = time.monotonic()
+        key = self._key(message)
+        burst = self._bursts.get(key)
+        if burst is None:
+            burst = self._bursts[key] = _Burst(now, handler)
+            burst.task = asyncio.create_task(self._hold(key, burst, handler))
+        else:
+            channel_id = message.channel.id
+            gap = now - burst.last_at
+            average = self._gaps.get(channel_id)
+            self._gaps[channel_id] = gap if average is None else average + GAP_SMOOTHING * (gap - average)
+            burst.last_at = now
+        burst.entries.append((message, route))
+        if len(burst.entries) >= MAX_MESSAGES:
+            del self._bursts[key]
+            burst.task.cancel()
+            burst.task = asyncio.create_task(self._flush(key, burst, handler))
+
+    async def _hold(self, key, burst: _Burst, handler):
+        channel_id = key[0]
+        while True:
+            deadline = min(burst.last_at + self.window_for(channel_id), burst.first_at + self.max_hold)
+            delay = deadline - time.monotonic()
+            if delay <= 0:
+                break
+            await asyncio.sleep(delay)
+        await self._flush(key, burst, handler)
+
+    async def _flush(self, key, burst: _Burst, handler):
+        if self._bursts.get(key) is burst:
+            del self._bursts[key]
+        message, route = self.merge(burst.entries)
+        self.stats['bursts'] += 1
+        if len(burst.entries) > 1:
+            saved = sum(llm_calls(r) for _, r in burst.entries) - llm_calls(route)
+            self.stats['merged'] += len(burst.entries) - 1
+            self.stats['llm_calls_saved'] += saved
+            logging.info(f"[BurstCoalescer] Merged {len(burst.entries)} messages in channel {key[0]}, saving {saved} LLM calls")
+        try:
+            await handler(route, message)
+        except Exception as e:
+            logging.error(f"[BurstCoalescer] Error handling burst in channel {key[0]}: {str(e)}")
+
+    def merge(self, entries):
+        """The latest message and the burst's route, carrying the text and ids of the whole burst"""
+        message, route = entries[-1]
+        for _, candidate in reversed(entries):
+            if candidate.reason == Route.TRIGGER:
+                route = candidate
+                break
+        if len(entries) > 1:
+            authors = {m.author.id for m, _ in entries}
+            if len(authors) > 1:
+                lines = [f"{m.author.display_name}: {m.content}" for m, _ in entries]
+            else:
+                lines = [m.content for m, _ in entries]
+            route = Route(route.cog, route.reason, route.trigger, route.priority,
+                          content="\n".join(line for line in lines if line),
+                          burst_ids=frozenset(str(m.id) for m, _ in entries))
+        return message, route
+
+    async def close(self):
+        """Answer every burst still held without waiting out its window"""
+        held = list(self._bursts.items())
+        for _, burst in held:
+            burst.task.cancel()
+        await asyncio.gather(*(burst.task for _, burst in held), return_exceptions=True)
+        await asyncio.gather(*(self._flush(key, burst, burst.handler) for key, burst in held))
+
+    def pending(self) -> int:
+        """Messages currently held"""
+        return sum(len(burst.entries) for burst in self._bursts.values())
+
+
+# Shared by the dispatcher for activated-channel traffic
+burst_coalescer = BurstCoalescer()
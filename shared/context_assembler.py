@@ -0,0 +1,138 @@
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import FrozenSet, Optional, Tuple
+
+from shared.context_policy import ContextPolicy, context_policies
+from shared.summarizer import SUMMARY_PREFIX
+
+# Seconds an assembled context is reused for the same Discord message
+PAYLOAD_TTL = 30.0
+
+# Assembled contexts kept; the oldest go first beyond this
+PAYLOAD_CAPACITY = 256
+
+
+class FrozenMessage(dict):
+    """A chat message dict that can't be changed, so one copy can be shared by every request"""
+
+    def _frozen(self, *args, **kwargs):
+        raise TypeError("assembled messages are shared and can't be modified")
+
+    __setitem__ = __delitem__ = clear = pop = popitem = setdefault = update = _frozen
+
+    def __reduce__(self):
+        # Copies and pickles are rebuilt through the constructor, which doesn't go through __setitem__
+        return (type(self), (dict(self),))
+
+
+class AssembledMessages(tuple):
+    """Chat messages already in the shape API.call_openpipe sends, so it skips validating them"""
+
+    def with_system(self, prompt: str) -> 'AssembledMessages':
+        """These messages after a system prompt; the messages themselves are shared, not copied"""
+        return AssembledMessages((FrozenMessage(role="system", content=prompt or ""),) + tuple(self))
+
+
+def to_message(row: dict) -> FrozenMessage:
+    """The chat message for a context row: assistant or user, or system for a channel summary"""
+    content = row.get('content') or ""
+    if row.get('user_id') == 'SYSTEM' and content.startswith(SUMMARY_PREFIX):
+        return FrozenMessage(role="system", content=content[len(SUMMARY_PREFIX):].strip())
+    return FrozenMessage(role="assistant" if row.get('is_assistant') else "user", content=content)
+
+
+class ContextAssembler:
+    """The history and current message of a Discord message, built once.
+
+    Every persona answering a message (the router's pick, /compare, a
+    reroll) needs the same history: the same context rows, mapped to the
+    same roles, followed by the message itself. The first caller fetches
+    it from the ContextCog and builds it; callers for the same message
+    within PAYLOAD_TTL get that same AssembledMessages, including callers
+    arriving while the fetch is still running. Personas whose context
+    policies differ get one build per policy. A message answered for a
+    merged burst (see merge()) is sent with the burst's text, and none of
+    the burst's messages are sent as history.
+    """
+
+    def __init__(self, ttl: float = PAYLOAD_TTL, capacity: int = PAYLOAD_CAPACITY):
+        self.ttl = ttl
+        self.capacity = capacity
+        self._payloads: OrderedDict = OrderedDict()  # key -> (future of AssembledMessages, created at)
+        self._bursts: OrderedDict = OrderedDict()  # (channel id, message id) -> (merged text, burst message ids)
+        self.stats = {'assembled': 0, 'reused': 0, 'failures': 0}
+
+    def _evict(self, now: float):
+        while self._payloads:
+            key, (_, created) = next(iter(self._payloads.items()))
+            if len(self._payloads) <= self.capacity and now - created <= self.ttl:
+                break
+            del self._payloads[key]
+
+    def merge(self, message, content: str, message_ids):
+        """Answer `message` with the merged text of its burst, leaving out the burst's messages"""
+        key = (str(message.channel.id), str(message.id))
+        self._bursts[key] = (content, frozenset(str(i) for i in message_ids))
+        self._bursts.move_to_end(key)
+        while len(self._bursts) > self.capacity:
+            self._bursts.popitem(last=False)
+
+    def _turn(self, message) -> Tuple[str, FrozenSet[str]]:
+        # The text to answer and the ids of the messages it is made of
+        burst = self._bursts.get((str(message.channel.id), str(message.id)))
+        if burst is not None:
+            return burst
+        return message.content or "", frozenset((str(message.id),))
+
+    async def assemble(self, context_cog, message, limit: Optional[int] = None, model_id: Optional[str] = None,
+                       persona: Optional[str] = None, now: Optional[float] = None) -> AssembledMessages:
+        """History before `message` allowed by the persona's context policy, followed by the message itself"""
+        now = time.monotonic() if now is None else now
+        self._evict(now)
+        guild = getattr(message, 'guild', None)
+        policy = context_policies.resolve(guild.id if guild else None, message.channel.id, persona)
+        content, exclude_ids = self._turn(message)
+        # The content is part of the key so an edited message is assembled again
+        key = (str(message.channel.id), str(message.id), content, exclude_ids, policy, limit, model_id)
+        entry = self._payloads.get(key)
+        if entry is None:
+            build = asyncio.ensure_future(self._build(context_cog, message, content, exclude_ids, policy, limit, model_id))
+            build.add_done_callback(lambda done: self._forget_failed(key, done))
+            self._payloads[key] = (build, now)
+        else:
+            build = entry[0]
+            self.stats['reused'] += 1
+        # Shielded so a cancelled reroll doesn't cancel the build for the others
+        return await asyncio.shield(build)
+
+    def _forget_failed(self, key, build: asyncio.Future):
+        # A failed build is retried by the next caller; the exception is retrieved here
+        # so one that no caller awaited isn't reported as unhandled
+        if build.cancelled() or build.exception() is not None:
+            if self._payloads.get(key, (None,))[0] is build:
+                del self._payloads[key]
+
+    async def _build(self, context_cog, message, content: str, exclude_ids: FrozenSet[str], policy: ContextPolicy,
+                     limit, model_id) -> AssembledMessages:
+        rows = []
+        if context_cog:
+            # The message's text also selects relevant older history
+            kwargs = {'limit': limit, 'exclude_message_id': str(message.id), 'query': content, 'policy': policy}
+            if len(exclude_ids) > 1:
+                kwargs['exclude_ids'] = exclude_ids
+            if model_id:
+                kwargs['model_id'] = model_id
+            try:
+                rows = await context_cog.get_context_messages(str(message.channel.id), **kwargs)
+            except Exception as e:
+                self.stats['failures'] += 1
+                logging.error(f"[ContextAssembler] Failed to fetch history for message {message.id}: {str(e)}")
+                raise
+        self.stats['assembled'] += 1
+        return AssembledMessages([to_message(row) for row in rows]
+                                 + [FrozenMessage(role="user", content=content)])
+
+
+context_assembler = ContextAssembler()
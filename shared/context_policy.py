@@ -0,0 +1,159 @@
+import os
+import json
+import time
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, NamedTuple, Optional
+
+from config import CONTEXT_WINDOWS, DEFAULT_CONTEXT_WINDOW, MAX_CONTEXT_WINDOW
+
+# Seconds between checks of the settings file for changes
+SETTINGS_CHECK_INTERVAL = 5.0
+
+# Keys of context_settings.json, at the top level or in a guild, channel or persona section
+_KEYS = {
+    'max_history_messages': 'max_messages',
+    'context_window_minutes': 'window_minutes',
+    'include_user_messages': 'include_user',
+    'include_bot_messages': 'include_bot',
+    'include_system_messages': 'include_system',
+}
+
+
+class ContextPolicy(NamedTuple):
+    """The history a persona is given in a channel.
+
+    Immutable and hashable, so assembled contexts can be shared by the
+    personas that resolve to the same policy.
+    """
+    max_messages: int = DEFAULT_CONTEXT_WINDOW
+    window_minutes: int = 0  # 0 for no time limit
+    include_user: bool = True
+    include_bot: bool = True
+    include_system: bool = False
+
+    def since(self, now: Optional[datetime] = None) -> Optional[str]:
+        """Timestamp (ISO format, like the stored rows) of the oldest message allowed, or None"""
+        if not self.window_minutes:
+            return None
+        return ((now or datetime.now()) - timedelta(minutes=self.window_minutes)).isoformat()
+
+    def allows(self, row: dict) -> bool:
+        """Whether the kind of message in `row` may be sent"""
+        if row['user_id'] == 'SYSTEM':
+            return self.include_system
+        return self.include_bot if row['is_assistant'] else self.include_user
+
+    def sql(self, table: str = '') -> str:
+        """allows() as an `AND ...` condition on the messages table"""
+        if self.include_user and self.include_bot and self.include_system:
+            return ''
+        prefix = f'{table}.' if table else ''
+        kinds = []
+        if self.include_system:
+            kinds.append(f"{prefix}user_id = 'SYSTEM'")
+        if self.include_bot:
+            kinds.append(f"({prefix}user_id != 'SYSTEM' AND {prefix}is_assistant)")
+        if self.include_user:
+            kinds.append(f"({prefix}user_id != 'SYSTEM' AND NOT {prefix}is_assistant)")
+        return f" AND ({' OR '.join(kinds) or '0'})"
+
+
+class ContextPolicies:
+    """Resolves the ContextPolicy of each (guild, channel, persona).
+
+    Settings come from context_settings.json: its top-level keys apply
+    everywhere, and optional "guilds", "channels" and "personas" sections
+    override them by id or lowercase persona name. A channel's /setcontext
+    size (CONTEXT_WINDOWS) sets its message count, and a persona's
+    max_history_messages caps it. Resolved policies are cached; the cache is
+    dropped when the settings file changes (checked every
+    SETTINGS_CHECK_INTERVAL) and by invalidate(), which /setcontext calls.
+    """
+
+    def __init__(self, settings_file: str = 'context_settings.json', windows: Dict[str, int] = CONTEXT_WINDOWS):
+        self.settings_file = settings_file
+        self.windows = windows
+        self._settings: dict = {}
+        self._mtime = None
+        self._checked = None
+        self._policies: Dict[tuple, ContextPolicy] = {}
+        self.stats = {'hits': 0, 'resolved': 0, 'reloads': 0}
+
+    def invalidate(self, channel_id: Optional[str] = None):
+        """Forget resolved policies, of one channel or all"""
+        if channel_id is None:
+            self._policies.clear()
+            return
+        for key in [key for key in self._policies if key[1] == str(channel_id)]:
+            del self._policies[key]
+
+    def _check_settings(self, now: float):
+        if self._checked is not None and now - self._checked < SETTINGS_CHECK_INTERVAL:
+            return
+        self._checked = now
+        try:
+            mtime = os.path.getmtime(self.settings_file)
+        except OSError:
+            mtime = None
+        if mtime == self._mtime:
+            return
+        self._mtime = mtime
+        settings = {}
+        if mtime is not None:
+            try:
+                with open(self.settings_file, 'r') as f:
+                    settings = json.load(f)
+            except Exception as e:
+                logging.error(f"[ContextPolicies] Failed to load {self.settings_file}: {str(e)}")
+                return
+        self._settings = settings if isinstance(settings, dict) else {}
+        self._policies.clear()
+        self.stats['reloads'] += 1
+
+    def _section(self, name: str, key) -> dict:
+        section = self._settings.get(name)
+        if not isinstance(section, dict) or key is None:
+            return {}
+        values = section.get(str(key))
+        return values if isinstance(values, dict) else {}
+
+    def resolve(self, guild_id=None, channel_id=None, persona: Optional[str] = None,
+                now: Optional[float] = None) -> ContextPolicy:
+        """The policy for a persona answering in a channel"""
+        self._check_settings(time.monotonic() if now is None else now)
+        key = (str(guild_id) if guild_id else None, str(channel_id), persona.lower() if persona else None)
+        policy = self._policies.get(key)
+        if policy is not None:
+            self.stats['hits'] += 1
+            return policy
+
+        values = ContextPolicy()._asdict()
+        for layer in (self._settings, self._section('guilds', key[0]), self._section('channels', key[1])):
+            for setting, field in _KEYS.items():
+                if setting in layer:
+                    values[field] = layer[setting]
+        window = self.windows.get(key[1])
+        if isinstance(window, int):
+            values['max_messages'] = window
+        try:
+            for setting, field in _KEYS.items():
+                value = self._section('personas', key[2]).get(setting)
+                if value is not None:
+                    values[field] = min(int(values[field]), int(value)) if field == 'max_messages' else value
+            policy = ContextPolicy(
+                max_messages=max(1, min(int(values['max_messages']), MAX_CONTEXT_WINDOW)),
+                window_minutes=max(0, int(values['window_minutes'] or 0)),
+                include_user=bool(values['include_user']),
+                include_bot=bool(values['include_bot']),
+                include_system=bool(values['include_system']),
+            )
+        except (TypeError, ValueError) as e:
+            logging.error(f"[ContextPolicies] Invalid context settings for channel {key[1]}: {str(e)}")
+            policy = ContextPolicy()
+        self._policies[key] = policy
+        self.stats['resolved'] += 1
+        return policy
+
+
+context_policies = ContextPolicies()
@@ -0,0 +1,187 @@
+import asyncio
+import logging
+from collections import OrderedDict, deque
+from typing import Dict, Iterable, List, Optional
+
+import aiosqlite
+
+from config import CONTEXT_MEMORY_MB
+from shared.context_policy import ContextPolicy
+from shared.persistence import MessageWriter, MESSAGE_COLUMNS, FLUSH_DELAY, row_from_db
+
+# Rows kept per channel; the largest context window plus room for an excluded message
+RING_CAPACITY = 64
+
+# Rough per-row cost beyond the text, for the memory budget
+ROW_OVERHEAD = 200
+
+
+def _row_size(row: dict) -> int:
+    return len(row['content']) + ROW_OVERHEAD
+
+
+class ChannelRing:
+    """Most recent context rows of one channel, oldest first"""
+
+    __slots__ = ('rows', 'size')
+
+    def __init__(self, capacity: int):
+        self.rows = deque(maxlen=capacity)
+        self.size = 0
+
+    def put(self, row: dict) -> int:
+        """Add or replace a row by message id and move it to the end; returns the size change"""
+        before = self.size
+        # Streamed updates replace the latest rows, so search from the end
+        for i in range(len(self.rows) - 1, -1, -1):
+            if self.rows[i]['id'] == row['id']:
+                self.size -= _row_size(self.rows[i])
+                del self.rows[i]
+                break
+        if len(self.rows) == self.rows.maxlen:
+            self.size -= _row_size(self.rows[0])
+        self.rows.append(row)
+        self.size += _row_size(row)
+        return self.size - before
+
+
+class ContextStore:
+    """Write-behind conversation context, one ring buffer per channel.
+
+    Reads for a channel in memory never touch SQLite. A channel that is not
+    in memory is loaded from the messages table on its first read (one
+    query, shared by concurrent readers), and the least recently used
+    channels are dropped once the rings exceed the memory budget. Writes go
+    into the ring at once and to SQLite through the MessageWriter, which
+    commits them in batches; flush() writes what is left, e.g. on shutdown.
+    """
+
+    def __init__(self, db_path: str, capacity: int = RING_CAPACITY,
+                 memory_budget: int = CONTEXT_MEMORY_MB * 1024 * 1024, flush_delay: float = FLUSH_DELAY,
+                 writer: Optional[MessageWriter] = None):
+        self.db_path = db_path
+        self.capacity = capacity
+        self.memory_budget = memory_budget
+        self.writer = writer or MessageWriter(db_path, flush_delay)
+        self.memory = 0
+        self._rings: OrderedDict = OrderedDict()  # channel id -> ChannelRing, least recently used first
+        self._loading: Dict[str, asyncio.Future] = {}
+        self._early: Dict[str, list] = {}  # rows written while their channel loads
+        self.stats = {'hits': 0, 'loads': 0, 'evictions': 0, 'writes': 0}
+
+    async def recent(self, channel_id: str, limit: int, exclude_id: Optional[str] = None,
+                     policy: Optional[ContextPolicy] = None, exclude_ids: Iterable[str] = ()) -> List[dict]:
+        """Up to `limit` non-empty rows of a channel, newest first, of those `policy` allows.
+
+        Rows with id `exclude_id` or one of `exclude_ids` are left out.
+        """
+        ring = await self._ring(channel_id)
+        since = policy.since() if policy else None
+        excluded = set(exclude_ids)
+        if exclude_id is not None:
+            excluded.add(exclude_id)
+        rows = []
+        for row in reversed(ring.rows):
+            if row['id'] in excluded or not row['content']:
+                continue
+            if policy and ((since and row['timestamp'] < since) or not policy.allows(row)):
+                continue
+            rows.append(row)
+            if len(rows) >= limit:
+                break
+        return rows
+
+    def append(self, row: dict):
+        """Record a row (or a newer version of it) and schedule its write"""
+        channel_id = row['channel_id']
+        self.writer.upsert(row)
+        self.stats['writes'] += 1
+        ring = self._rings.get(channel_id)
+        if ring is not None:
+            self._rings.move_to_end(channel_id)  # an active channel is a hot one
+            self.memory += ring.put(row)
+            self._evict()
+        elif channel_id in self._early:
+            self._early[channel_id].append(row)
+
+    async def _ring(self, channel_id: str) -> ChannelRing:
+        ring = self._rings.get(channel_id)
+        if ring is not None:
+            self._rings.move_to_end(channel_id)
+            self.stats['hits'] += 1
+            return ring
+        loading = self._loading.get(channel_id)
+        if loading is None:
+            loading = self._loading[channel_id] = asyncio.ensure_future(self._load(channel_id))
+            loading.add_done_callback(lambda _: self._loading.pop(channel_id, None))
+        return await asyncio.shield(loading)
+
+    async def _load(self, channel_id: str) -> ChannelRing:
+        # Rows not yet committed may be missing from the query; they are laid over it
+        carried = self.writer.rows(channel_id)
+        self._early[channel_id] = []
+        ring = ChannelRing(self.capacity)
+        try:
+            async with aiosqlite.connect(self.db_path) as conn:
+                # Interaction log rows have no Discord message id and are not context
+                cursor = await conn.execute(f'''
+                    SELECT {MESSAGE_COLUMNS} FROM messages
+                    WHERE channel_id = ? AND discord_message_id IS NOT NULL
+                    ORDER BY timestamp DESC
+                    LIMIT ?
+                ''', (channel_id, self.capacity))
+                fetched = await cursor.fetchall()
+            for values in reversed(fetched):
+                ring.put(row_from_db(values))
+            self.stats['loads'] += 1
+        except Exception as e:
+            logging.error(f"[ContextStore] Failed to load channel {channel_id}: {str(e)}")
+        for row in carried + self._early.pop(channel_id, []):
+            ring.put(row)
+        self._rings[channel_id] = ring
+        self.memory += ring.size
+        self._evict()
+        return ring
+
+    def _evict(self):
+        """Drop least recently used channels while over the memory budget, keeping the newest"""
+        while self.memory > self.memory_budget and len(self._rings) > 1:
+            _, ring = self._rings.popitem(last=False)
+            self.memory -= ring.size
+            self.stats['evictions'] += 1
+
+    async def flush(self):
+        """Commit every pending write"""
+        await self.writer.flush()
+
+    async def clear(self, channel_id: str, before: Optional[str] = None):
+        """Delete a channel's context, or only rows with a timestamp before `before` (ISO format)"""
+        def cleared(row):
+            return row['channel_id'] == channel_id and (before is None or row['timestamp'] < before)
+
+        self.writer.discard(cleared)
+        ring = self._rings.pop(channel_id, None)
+        if ring is not None:
+            self.memory -= ring.size
+            if before is not None:
+                kept = ChannelRing(self.capacity)
+                for row in ring.rows:
+                    if not cleared(row):
+                        kept.put(row)
+                self._rings[channel_id] = kept
+                self.memory += kept.size
+
+        async def delete(conn):
+            if before is None:
+                await conn.execute('DELETE FROM messages WHERE channel_id = ?', (channel_id,))
+            else:
+                await conn.execute('DELETE FROM messages WHERE channel_id = ? AND timestamp < ?', (channel_id, before))
+
+        # The delete is queued behind earlier writes; flushing now makes it take effect at once
+        done = self.writer.execute(delete)
+        await self.writer.flush()
+        await done
+
+    async def close(self):
+        """Stop the delayed write, flush what is pending and close the writer's connection"""
+        await self.writer.close()
@@ -0,0 +1,79 @@
+import time
+import logging
+from collections import deque
+from typing import Optional
+
+# Message IDs are remembered this long; older messages are rejected by their snowflake timestamp
+DEDUPE_TTL = 600.0
+
+# Hard cap on remembered IDs, so memory stays fixed under bursts
+DEDUPE_CAPACITY = 10000
+
+# Discord epoch (2015-01-01) in milliseconds
+DISCORD_EPOCH_MS = 1420070400000
+
+
+def snowflake_time(snowflake: int) -> Optional[float]:
+    """Unix time encoded in a Discord snowflake, or None for IDs that aren't snowflakes"""
+    try:
+        millis = int(snowflake) >> 22
+    except (TypeError, ValueError):
+        return None
+    if millis <= 0:
+        return None
+    return (millis + DISCORD_EPOCH_MS) / 1000
+
+
+class MessageDedupe:
+    """Recently seen message IDs in a time-ordered ring with a hash index.
+
+    Inserts and lookups are O(1). Entries leave the ring after `ttl` seconds
+    or when `capacity` is reached, so memory is bounded. A message whose
+    snowflake timestamp is older than the TTL counts as a duplicate even after
+    its entry has gone: whatever handled it then has already replied.
+    """
+
+    def __init__(self, ttl: float = DEDUPE_TTL, capacity: int = DEDUPE_CAPACITY):
+        self.ttl = ttl
+        self.capacity = capacity
+        self._ring = deque()  # (seen_at, message_id), oldest first
+        self._index = set()
+        self.stats = {'accepted': 0, 'duplicates': 0, 'stale': 0, 'expired': 0, 'evicted': 0}
+
+    def __len__(self):
+        return len(self._ring)
+
+    def __contains__(self, message_id):
+        return message_id in self._index
+
+    def _expire(self, now: float):
+        cutoff = now - self.ttl
+        ring = self._ring
+        while ring and ring[0][0] <= cutoff:
+            self._index.discard(ring.popleft()[1])
+            self.stats['expired'] += 1
+
+    def check(self, message_id, now: Optional[float] = None) -> bool:
+        """Record a message ID; False if it was already seen or is older than the TTL"""
+        now = time.time() if now is None else now
+        self._expire(now)
+        if message_id in self._index:
+            self.stats['duplicates'] += 1
+            return False
+        created = snowflake_time(message_id)
+        if created is not None and now - created > self.ttl:
+            self.stats['stale'] += 1
+            logging.debug("[Dedupe] Ignoring message %s older than %ss", message_id, self.ttl)
+            return False
+
+        if len(self._ring) >= self.capacity:
+            self._index.discard(self._ring.popleft()[1])
+            self.stats['evicted'] += 1
+        self._ring.append((now, message_id))
+        self._index.add(message_id)
+        self.stats['accepted'] += 1
+        return True
+
+
+# Shared by the dispatcher and the per-persona clients
+message_dedupe = MessageDedupe()
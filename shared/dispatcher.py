@@ -0,0 +1,138 @@
+import logging
+from typing import FrozenSet, Optional
+
+import discord
+
+from config import ERROR_MESSAGES
+from shared.access_control import access_control
+from shared.context_assembler import context_assembler
+from shared.dedupe import MessageDedupe
+from shared.generation_scheduler import GenerationScheduler, INTERACTIVE, AMBIENT
+from shared.trigger_index import TriggerIndex
+
+
+class Route:
+    """Routing decision for one message"""
+
+    TRIGGER = 'trigger'  # a persona's trigger word matched
+    ROUTER = 'router'  # the router model picks the persona
+
+    def __init__(self, cog, reason: str, trigger: Optional[str] = None, priority: int = AMBIENT,
+                 content: Optional[str] = None, burst_ids: FrozenSet[str] = frozenset()):
+        self.cog = cog
+        self.reason = reason
+        self.trigger = trigger
+        self.priority = priority  # generation scheduler class
+        # Set for a merged burst: the text of all its messages and their ids
+        self.content = content
+        self.burst_ids = burst_ids
+
+    def __repr__(self):
+        return f"Route({getattr(self.cog, 'name', self.cog)!r}, {self.reason!r}, trigger={self.trigger!r})"
+
+
+class MessageDispatcher:
+    """Single entry point for incoming messages.
+
+    Gating (bots, duplicates, bans, channel activation), trigger resolution and
+    the routing decision happen once per message here, and exactly one handler
+    is awaited, instead of every loaded cog running its own on_message.
+    """
+
+    def __init__(self, bot, dedupe: Optional[MessageDedupe] = None, scheduler: Optional[GenerationScheduler] = None,
+                 coalescer=None):
+        self.bot = bot
+        self.dedupe = dedupe if dedupe is not None else MessageDedupe()
+        self.scheduler = scheduler if scheduler is not None else GenerationScheduler()
+        # Optional BurstCoalescer; ambient channel messages wait in it to be merged
+        self.coalescer = coalescer
+        self._index: Optional[TriggerIndex] = None
+        self.stats = {'dispatched': 0, 'dropped': 0}
+
+    def invalidate(self):
+        """Drop the trigger index; called when cogs are added or removed"""
+        self._index = None
+
+    @property
+    def trigger_index(self) -> TriggerIndex:
+        """Index over the loaded cogs, rebuilt on first use after a change"""
+        if self._index is None:
+            self._index = TriggerIndex(self.bot.cogs.values())
+        return self._index
+
+    def find_trigger(self, content: str) -> Optional[Route]:
+        """Cog chosen by the trigger words in the message, if any"""
+        match = self.trigger_index.best(content)
+        if match is None:
+            return None
+        return Route(match.cog, Route.TRIGGER, match.word)
+
+    def resolve(self, message) -> Optional[Route]:
+        """Decide which handler, if any, gets the message"""
+        route = self._route(message)
+        # Only handled messages are recorded, so a persona client mentioned in
+        # the same message can still answer it when the bot itself doesn't
+        if route is not None and not self.dedupe.check(message.id):
+            return None
+        return route
+
+    def _route(self, message) -> Optional[Route]:
+        if message.author.bot:
+            return None
+        if access_control.is_banned(message.author.id):
+            return None
+
+        router = self.bot.get_cog('RouterCog')
+        mentioned = self.bot.user in message.mentions
+        is_dm = isinstance(message.channel, discord.DMChannel) or message.guild is None
+
+        # DMs and mentions are served before ambient channel traffic
+        priority = INTERACTIVE if is_dm or mentioned else AMBIENT
+
+        if not is_dm and not access_control.is_channel_active(message.channel.id, message.guild.id):
+            # Outside activated channels only a direct mention gets a reply
+            if mentioned and router and not router._mentions_other_bot(message):
+                return Route(router, Route.ROUTER, priority=priority)
+            return None
+
+        route = self.find_trigger(message.content)
+        if route:
+            route.priority = priority
+            return route
+        if router and not router._mentions_other_bot(message):
+            return Route(router, Route.ROUTER, priority=priority)
+        return None
+
+    async def dispatch(self, message) -> Optional[Route]:
+        route = self.resolve(message)
+        if route is None:
+            self.stats['dropped'] += 1
+            return None
+        self.stats['dispatched'] += 1
+        logging.debug("[Dispatcher] Message %s -> %r", message.id, route)
+        if self.coalescer is not None and self.coalescer.enabled and route.priority == AMBIENT and message.guild:
+            self.coalescer.add(message, route, self._run)
+            return route
+        await self._run(route, message)
+        return route
+
+    async def _run(self, route: Route, message):
+        """Admit one generation and await its handler"""
+        try:
+            ticket = self.scheduler.admit(message.guild.id if message.guild else None, message.author.id, route.priority)
+            if ticket is None:
+                # Too many generations waiting; answer now instead of queueing
+                await message.reply(ERROR_MESSAGES['busy'])
+                return
+            async with ticket:
+                kwargs = {}
+                if route.content is not None:
+                    # Every persona answering the burst gets its text, and none of its messages as history
+                    context_assembler.merge(message, route.content, route.burst_ids)
+                    kwargs['full_content'] = route.content
+                if route.reason == Route.ROUTER:
+                    await route.cog.route_message(message, **kwargs)
+                else:
+                    await route.cog.handle_message(message, **kwargs)
+        except Exception as e:
+            logging.error(f"[Dispatcher] Error handling message {message.id}: {str(e)}")
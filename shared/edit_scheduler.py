@@ -0,0 +1,197 @@
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import Awaitable, Callable, Dict, Optional
+
+import discord
+
+logger = logging.getLogger(__name__)
+
+# Discord allows roughly 5 message edits per 5 seconds per channel
+EDIT_LIMIT = 5
+EDIT_WINDOW = 5.0
+
+
+class ChannelBucket:
+    """Local model of Discord's per-channel edit rate-limit bucket"""
+
+    def __init__(self, limit: int = EDIT_LIMIT, per: float = EDIT_WINDOW):
+        self.limit = limit
+        self.per = per
+        self.sent = deque()  # monotonic timestamps of recent edits
+        self.streams = 0  # streams currently sharing this bucket
+        self.retry_until = 0.0  # set when Discord answers with a 429
+
+    def prune(self, now: float):
+        while self.sent and now - self.sent[0] >= self.per:
+            self.sent.popleft()
+
+    def earliest_slot(self, now: float) -> float:
+        """Earliest time another edit fits inside the bucket"""
+        self.prune(now)
+        earliest = self.retry_until
+        if len(self.sent) >= self.limit:
+            earliest = max(earliest, self.sent[0] + self.per)
+        return earliest
+
+    def record(self, now: float):
+        self.sent.append(now)
+
+
+class EditStream:
+    """Coalesces the live edits of one streaming response.
+
+    update() only records the latest text for a message; a background task
+    sends it when the channel bucket and this stream's fair share allow.
+    flush() sends a state right away: the final state skips the bucket,
+    while states sent mid-stream (wait=True) take the next slot in it.
+    """
+
+    def __init__(self, scheduler: 'EditScheduler', channel_id, bucket: ChannelBucket,
+                 editor: Optional[Callable[..., Awaitable]] = None):
+        self.scheduler = scheduler
+        self.channel_id = channel_id
+        self.bucket = bucket
+        self.editor = editor or self._default_editor
+        self._pending: Dict[int, tuple] = {}
+        self._last_sent: Dict[int, str] = {}
+        self._last_edit = 0.0
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.closed = False
+
+    @staticmethod
+    async def _default_editor(message, content, view=None, **extra):
+        if view is not None:
+            extra['view'] = view
+        await message.edit(content=content, **extra)
+
+    def update(self, message, content: str):
+        """Replace the pending text for a message; never awaits Discord"""
+        if message.id in self._pending:
+            self.scheduler.stats['coalesced'] += 1
+        self._pending[message.id] = (message, content)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def flush(self, message, content: str, view=None, wait: bool = False, **extra):
+        """Send the given state for a message, dropping pending text.
+
+        With `wait` the edit waits for a free slot in the channel bucket, so
+        messages sealed mid-stream count against Discord's limit like the
+        live edits; without it (the final state) it is sent immediately.
+        `extra` (attachments, embed) is passed on to the editor.
+        """
+        self._pending.pop(message.id, None)
+        while wait:
+            now = time.monotonic()
+            delay = self.bucket.earliest_slot(now) - now
+            if delay <= 0:
+                break
+            await asyncio.sleep(delay)
+        await self._send(message, content, view, force=view is not None or bool(extra), **extra)
+
+    async def _run(self):
+        try:
+            while self._pending and not self.closed:
+                delay = self.scheduler.delay_for(self.bucket, self._last_edit)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                if not self._pending or self.closed:
+                    break
+                message_id = next(iter(self._pending))
+                message, content = self._pending.pop(message_id)
+                await self._send(message, content)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.error(f"[EditScheduler] Edit loop failed: {str(e)}")
+
+    async def _send(self, message, content: str, view=None, force: bool = False, **extra):
+        async with self._lock:
+            if not force and self._last_sent.get(message.id) == content:
+                return
+            now = time.monotonic()
+            self.bucket.record(now)
+            self._last_edit = now
+            try:
+                await self.editor(message, content, view, **extra)
+                self._last_sent[message.id] = content
+                self.scheduler.stats['edits'] += 1
+            except discord.HTTPException as e:
+                if e.status == 429:
+                    retry_after = getattr(e, 'retry_after', None) or self.bucket.per / self.bucket.limit
+                    self.bucket.retry_until = time.monotonic() + retry_after
+                    self.scheduler.stats['rate_limited'] += 1
+                    # Keep the text so the next slot retries it unless newer text arrived
+                    self._pending.setdefault(message.id, (message, content))
+                else:
+                    raise
+
+    async def close(self):
+        """Stop the edit loop and release this stream's share of the bucket"""
+        self.closed = True
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._pending.clear()
+        self.scheduler._release(self)
+
+
+class EditScheduler:
+    """Per-channel edit scheduling shared by every streaming response.
+
+    The edit interval of each stream is its fair share of the channel bucket,
+    so two streams in one channel edit half as often as a single stream.
+    """
+
+    def __init__(self, limit: int = EDIT_LIMIT, per: float = EDIT_WINDOW, min_interval: float = 0.5):
+        self.limit = limit
+        self.per = per
+        self.min_interval = min_interval
+        self.buckets: Dict[str, ChannelBucket] = {}
+        self.stats = {'edits': 0, 'coalesced': 0, 'rate_limited': 0}
+
+    def open_stream(self, channel_id, editor: Optional[Callable[..., Awaitable]] = None) -> EditStream:
+        key = str(channel_id)
+        self._sweep(key)
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = ChannelBucket(self.limit, self.per)
+            self.buckets[key] = bucket
+        bucket.streams += 1
+        return EditStream(self, key, bucket, editor)
+
+    def _release(self, stream: EditStream):
+        bucket = stream.bucket
+        bucket.streams = max(0, bucket.streams - 1)
+        if bucket.streams == 0:
+            bucket.prune(time.monotonic())
+            if not bucket.sent and self.buckets.get(stream.channel_id) is bucket:
+                del self.buckets[stream.channel_id]
+
+    def _sweep(self, keep: str):
+        """Drop idle buckets whose edits have all left the window"""
+        now = time.monotonic()
+        for key, bucket in list(self.buckets.items()):
+            if key != keep and bucket.streams == 0:
+                bucket.prune(now)
+                if not bucket.sent and bucket.retry_until <= now:
+                    del self.buckets[key]
+
+    def interval_for(self, bucket: ChannelBucket) -> float:
+        """Fair-share spacing between edits of one stream"""
+        return max(self.min_interval, bucket.per / bucket.limit * max(1, bucket.streams))
+
+    def delay_for(self, bucket: ChannelBucket, last_edit: float) -> float:
+        now = time.monotonic()
+        earliest = max(last_edit + self.interval_for(bucket), bucket.earliest_slot(now))
+        return max(0.0, earliest - now)
+
+
+# Shared scheduler for all cogs
+edit_scheduler = EditScheduler()
@@ -0,0 +1,143 @@
+import time
+import asyncio
+import logging
+from collections import OrderedDict, deque
+from typing import Optional
+
+from config import GENERATION_CONCURRENCY, GENERATION_QUEUE_LIMIT
+
+# Priority classes; lower is served first
+INTERACTIVE = 0  # DMs and direct mentions
+AMBIENT = 1  # trigger words and routed chatter in activated channels
+
+# Recent queue waits kept for the wait-time metric
+WAIT_SAMPLES = 500
+
+
+class GenerationTicket:
+    """One admitted generation; `async with` waits for a slot and frees it after"""
+
+    __slots__ = ('scheduler', 'priority', 'guild_key', 'user_key', 'future', 'created_at')
+
+    def __init__(self, scheduler: 'GenerationScheduler', priority: int, guild_key: str, user_key: str):
+        self.scheduler = scheduler
+        self.priority = priority
+        self.guild_key = guild_key
+        self.user_key = user_key
+        self.future: Optional[asyncio.Future] = None
+        self.created_at = time.monotonic()
+
+    async def __aenter__(self):
+        await self.scheduler._acquire(self)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.scheduler._release()
+
+
+class GenerationScheduler:
+    """Admission control between routing and generation.
+
+    At most `max_concurrent` generations run at once. Waiting generations are
+    served by priority class, and within a class round-robin across guilds
+    and then across users in a guild, so one busy channel or user can't starve
+    the rest. When `max_queue` generations are already waiting, ambient
+    traffic is refused (interactive traffic gets twice the room) and the
+    caller answers with a busy message instead.
+    """
+
+    def __init__(self, max_concurrent: int = GENERATION_CONCURRENCY, max_queue: int = GENERATION_QUEUE_LIMIT):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.active = 0
+        self.waiting = 0
+        # priority -> guild -> user -> waiting tickets, each level in round-robin order
+        self._queues = {INTERACTIVE: OrderedDict(), AMBIENT: OrderedDict()}
+        self._waits = deque(maxlen=WAIT_SAMPLES)
+        self.stats = {'admitted': 0, 'queued': 0, 'shed': 0}
+
+    def admit(self, guild_id, user_id, priority: int = AMBIENT) -> Optional[GenerationTicket]:
+        """Ticket for a new generation, or None when the queue is too deep"""
+        limit = self.max_queue if priority == AMBIENT else self.max_queue * 2
+        if self.active >= self.max_concurrent and self.waiting >= limit:
+            self.stats['shed'] += 1
+            logging.warning(f"[GenerationScheduler] Shedding generation for user {user_id}: {self.waiting} waiting")
+            return None
+        self.stats['admitted'] += 1
+        return GenerationTicket(self, priority, str(guild_id or 'dm'), str(user_id))
+
+    async def _acquire(self, ticket: GenerationTicket):
+        if self.active < self.max_concurrent and not self.waiting:
+            self.active += 1
+            self._waits.append(0.0)
+            return
+
+        ticket.future = asyncio.get_running_loop().create_future()
+        guilds = self._queues[ticket.priority]
+        guilds.setdefault(ticket.guild_key, OrderedDict()).setdefault(ticket.user_key, deque()).append(ticket)
+        self.waiting += 1
+        self.stats['queued'] += 1
+        try:
+            await ticket.future
+        except asyncio.CancelledError:
+            if ticket.future.done() and not ticket.future.cancelled():
+                self._release()  # the slot was handed over just as we were cancelled
+            else:
+                self._remove(ticket)
+            raise
+        self._waits.append(time.monotonic() - ticket.created_at)
+
+    def _release(self):
+        self.active -= 1
+        while self.active < self.max_concurrent and self.waiting:
+            ticket = self._next()
+            self.waiting -= 1
+            self.active += 1
+            ticket.future.set_result(None)
+
+    def _next(self) -> Optional[GenerationTicket]:
+        for priority in (INTERACTIVE, AMBIENT):
+            guilds = self._queues[priority]
+            if not guilds:
+                continue
+            guild_key, users = next(iter(guilds.items()))
+            user_key, tickets = next(iter(users.items()))
+            ticket = tickets.popleft()
+            if tickets:
+                users.move_to_end(user_key)
+            else:
+                del users[user_key]
+            if users:
+                guilds.move_to_end(guild_key)
+            else:
+                del guilds[guild_key]
+            return ticket
+        return None
+
+    def _remove(self, ticket: GenerationTicket):
+        guilds = self._queues[ticket.priority]
+        users = guilds.get(ticket.guild_key)
+        tickets = users.get(ticket.user_key) if users else None
+        if tickets and ticket in tickets:
+            tickets.remove(ticket)
+            self.waiting -= 1
+            if not tickets:
+                del users[ticket.user_key]
+            if not users:
+                del guilds[ticket.guild_key]
+
+    def wait_stats(self) -> dict:
+        """Queue-wait time over the recent generations, in seconds"""
+        waits = sorted(self._waits)
+        if not waits:
+            return {'count': 0, 'mean': 0.0, 'p95': 0.0, 'max': 0.0}
+        return {
+            'count': len(waits),
+            'mean': sum(waits) / len(waits),
+            'p95': waits[min(len(waits) - 1, int(len(waits) * 0.95))],
+            'max': waits[-1],
+        }
+
+
+# Shared by the dispatcher for every generation
+generation_scheduler = GenerationScheduler()
@@ -0,0 +1,102 @@
+import time
+import logging
+from collections import OrderedDict
+from typing import Optional
+
+# Display names remembered; the least recently used go first beyond this
+IDENTITY_CAPACITY = 10000
+
+# Seconds a name is trusted without seeing the user again
+IDENTITY_TTL = 3600.0
+
+# Minimum seconds between fetch_user calls when a name is nowhere in memory
+FETCH_INTERVAL = 1.0
+
+
+class IdentityCache:
+    """Display names by (guild id, user id), filled from gateway objects.
+
+    Every message author and member update the bot receives carries the
+    name already, so remember() is called with those and get() answers from
+    memory. resolve() falls back to discord.py's own user cache and only
+    then to a REST fetch_user, at most one per FETCH_INTERVAL; when the
+    budget is spent it returns None and the caller does without the name.
+    """
+
+    def __init__(self, capacity: int = IDENTITY_CAPACITY, ttl: float = IDENTITY_TTL,
+                 fetch_interval: float = FETCH_INTERVAL):
+        self.capacity = capacity
+        self.ttl = ttl
+        self.fetch_interval = fetch_interval
+        self._names: OrderedDict = OrderedDict()  # (guild id, user id) -> (name, stored at)
+        self._last_fetch = 0.0
+        self.stats = {'hits': 0, 'misses': 0, 'gateway': 0, 'fetches': 0, 'rate_limited': 0}
+
+    def __len__(self):
+        return len(self._names)
+
+    def remember(self, user, guild_id=None, now: Optional[float] = None):
+        """Store the display name of a discord.User or Member"""
+        name = getattr(user, 'display_name', None)
+        if not name:
+            return
+        key = (str(guild_id) if guild_id else None, str(user.id))
+        self._names[key] = (name, time.monotonic() if now is None else now)
+        self._names.move_to_end(key)
+        while len(self._names) > self.capacity:
+            self._names.popitem(last=False)
+
+    def forget(self, user_id):
+        """Drop every name stored for a user, e.g. after they change it"""
+        user_id = str(user_id)
+        for key in [key for key in self._names if key[1] == user_id]:
+            del self._names[key]
+
+    def get(self, user_id, guild_id=None, now: Optional[float] = None) -> Optional[str]:
+        key = (str(guild_id) if guild_id else None, str(user_id))
+        entry = self._names.get(key)
+        now = time.monotonic() if now is None else now
+        if entry is None or now - entry[1] > self.ttl:
+            if entry is not None:
+                del self._names[key]
+            self.stats['misses'] += 1
+            return None
+        self._names.move_to_end(key)
+        self.stats['hits'] += 1
+        return entry[0]
+
+    async def resolve(self, bot, user_id, guild_id=None) -> Optional[str]:
+        """A user's display name from memory, the gateway cache or, rate limited, the REST API"""
+        name = self.get(user_id, guild_id)
+        if name is not None:
+            return name
+        user = bot.get_user(int(user_id))
+        if user is not None:
+            self.stats['gateway'] += 1
+        else:
+            now = time.monotonic()
+            if now - self._last_fetch < self.fetch_interval:
+                self.stats['rate_limited'] += 1
+                return None
+            self._last_fetch = now
+            self.stats['fetches'] += 1
+            try:
+                user = await bot.fetch_user(int(user_id))
+            except Exception as e:
+                logging.error(f"[IdentityCache] Failed to fetch user {user_id}: {str(e)}")
+                return None
+        self.remember(user, guild_id)
+        return user.display_name
+
+    @property
+    def fetches_avoided(self) -> int:
+        """REST calls saved over fetching the user for every stored message"""
+        return self.stats['hits'] + self.stats['gateway'] + self.stats['rate_limited']
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.stats['hits'] + self.stats['misses']
+        return self.stats['hits'] / lookups if lookups else 0.0
+
+
+identity_cache = IdentityCache()
@@ -0,0 +1,82 @@
+import os
+import sys
+import queue
+import atexit
+import logging
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Optional, Union
+
+DEFAULT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Rotate log files at 10 MB, keeping five old files (same as run_combined.py)
+MAX_LOG_BYTES = 10 * 1024 * 1024
+LOG_BACKUP_COUNT = 5
+
+_listener: Optional[QueueListener] = None
+_queue_handler: Optional[QueueHandler] = None
+
+
+class LocalQueueHandler(QueueHandler):
+    """QueueHandler for an in-process listener.
+
+    The stock prepare() runs the full Formatter (timestamps, tracebacks) on the
+    calling thread so records can be pickled; records here never leave the
+    process, so only the message arguments are merged before enqueueing.
+    """
+
+    def prepare(self, record):
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+def configure_logging(log_file: str, level: Union[int, str] = logging.INFO,
+                      fmt: str = DEFAULT_FORMAT) -> QueueListener:
+    """Configure the root logger once for the whole process.
+
+    Records are put on an in-memory queue by a QueueHandler; a QueueListener
+    thread formats them and does the file and stream I/O, so logging from the
+    event loop never blocks on disk. Later calls return the existing listener.
+    """
+    global _listener, _queue_handler
+    if _listener is not None:
+        return _listener
+
+    log_dir = os.path.dirname(log_file)
+    if log_dir:
+        os.makedirs(log_dir, exist_ok=True)
+
+    formatter = logging.Formatter(fmt)
+    file_handler = RotatingFileHandler(
+        log_file,
+        maxBytes=MAX_LOG_BYTES,
+        backupCount=LOG_BACKUP_COUNT,
+        encoding='utf-8'
+    )
+    file_handler.setFormatter(formatter)
+    stream_handler = logging.StreamHandler(sys.stderr)
+    stream_handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    _queue_handler = LocalQueueHandler(log_queue)
+    root.addHandler(_queue_handler)
+    root.setLevel(level)
+
+    _listener = QueueListener(log_queue, file_handler, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+    return _listener
+
+
+def shutdown_logging():
+    """Flush queued records and stop the listener thread"""
+    global _listener, _queue_handler
+    if _queue_handler is not None:
+        logging.getLogger().removeHandler(_queue_handler)
+        _queue_handler = None
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
@@ -0,0 +1,194 @@
+import unicodedata
+from typing import List, Optional
+
+# Discord's message length limit
+MESSAGE_LIMIT = 2000
+
+FENCE = '```'
+FENCE_CLOSE = '\n' + FENCE
+
+# Characters that must stay attached to the character before them
+_ZWJ = '\u200d'
+
+
+def _is_joiner(ch: str) -> bool:
+    code = ord(ch)
+    return (
+        ch == _ZWJ
+        or unicodedata.combining(ch) != 0
+        or 0xFE00 <= code <= 0xFE0F  # variation selectors
+        or 0x1F3FB <= code <= 0x1F3FF  # skin tone modifiers
+        or 0xDC00 <= code <= 0xDFFF  # low surrogate half
+        or 0xE0020 <= code <= 0xE007F  # tag characters (flag sequences)
+    )
+
+
+class MessageSplitter:
+    """Incremental splitter for streamed responses.
+
+    feed() takes text deltas and returns the messages that became final;
+    `current` is the text of the message still being written. Every message
+    starts with the prefix and fits the limit. Splits prefer a blank line,
+    then a line break, then a space, and fall back to a hard cut that does not
+    separate combining marks or emoji sequences. A code block cut across
+    messages is closed with ``` and reopened with its language tag.
+
+    Each split seals at least half a message, so the text is scanned a
+    bounded number of times and the total work is O(n).
+    """
+
+    def __init__(self, prefix: str = '', limit: int = MESSAGE_LIMIT):
+        if len(prefix) + 64 > limit:
+            raise ValueError("prefix leaves no room for message content")
+        self.prefix = prefix
+        self.limit = limit
+        self._header = prefix
+        self._budget = self._budget_for(prefix)
+        self._body = ''
+        self._start = 0  # start of the open message's text in _body
+        self._scanned = 0  # start of the first line not yet checked for a fence
+        self._fence: Optional[str] = None  # language of the open code block ('' if none given)
+        self._fence_at_start: Optional[str] = None
+        self._toggles = []  # (index of the fence line's end, fence state after it)
+        self._toggle_pos = 0  # first toggle at or after _start
+        self._skip_space = False  # drop leading whitespace of the open message
+
+    @property
+    def current(self) -> str:
+        """Text of the message currently being written"""
+        text = self._header + self._body[self._start:]
+        if self._fence is not None:
+            text += FENCE_CLOSE
+        return text
+
+    def feed(self, delta: str) -> List[str]:
+        """Append a delta and return any messages that are now complete"""
+        if not delta:
+            return []
+        self._body += delta
+        if self._skip_space:
+            self._skip_leading_space()
+        if '\n' in delta:
+            self._scan()
+        if len(self._body) - self._start <= self._budget:
+            return []
+        sealed = []
+        while len(self._body) - self._start > self._budget:
+            sealed.append(self._seal())
+        self._compact()
+        return sealed
+
+    def finish(self) -> str:
+        """Final text of the last message, closing an unterminated code block"""
+        self._scan(final=True)
+        body = self._body[self._start:]
+        if self._fence is None:
+            return self._header + body.rstrip()
+        return self._header + body + FENCE_CLOSE
+
+    def _budget_for(self, header: str) -> int:
+        # Room for the body, keeping space for a closing fence
+        return self.limit - len(header) - len(FENCE_CLOSE)
+
+    def _scan(self, final: bool = False):
+        """Track code fences over the lines completed since the last scan"""
+        body = self._body
+        if body.find('`', self._scanned) == -1:
+            # No fence can start in the unscanned text; skip to its last line
+            if final:
+                self._scanned = len(body)
+            else:
+                self._scanned = body.rfind('\n', self._scanned) + 1 or self._scanned
+            return
+        while True:
+            newline = body.find('\n', self._scanned)
+            if newline == -1:
+                if final and self._scanned < len(body):
+                    self._check_fence(body[self._scanned:], len(body))
+                    self._scanned = len(body)
+                return
+            self._check_fence(body[self._scanned:newline], newline)
+            self._scanned = newline + 1
+
+    def _check_fence(self, line: str, end: int):
+        stripped = line.strip()
+        if not stripped.startswith(FENCE):
+            return
+        if self._fence is None:
+            info = stripped[len(FENCE):].split()
+            self._fence = info[0] if info else ''
+        elif stripped.strip('`') == '':
+            self._fence = None
+        else:
+            return
+        self._toggles.append((end, self._fence))
+
+    def _fence_at(self, index: int) -> Optional[str]:
+        state = self._fence_at_start
+        toggles = self._toggles
+        pos = self._toggle_pos
+        while pos < len(toggles) and toggles[pos][0] <= index:
+            state = toggles[pos][1]
+            pos += 1
+        return state
+
+    def _cut(self, budget: int):
+        """Return (end of sealed text, start of remaining text)"""
+        body = self._body
+        low = self._start + budget // 2
+        high = self._start + budget
+        for sep in ('\n\n', '\n', ' '):
+            index = body.rfind(sep, low, high + 1)
+            if index != -1:
+                return index, index + len(sep)
+        index = high
+        while index > low and (_is_joiner(body[index]) or body[index - 1] == _ZWJ):
+            index -= 1
+        return index, index
+
+    def _seal(self) -> str:
+        end, start = self._cut(self._budget)
+        fence = self._fence_at(end)
+        head = self._body[self._start:end]
+        if fence is None:
+            message = self._header + head.rstrip()
+        else:
+            message = self._header + head + FENCE_CLOSE
+
+        self._header = self.prefix if fence is None else f"{self.prefix}{FENCE}{fence}\n"
+        self._budget = self._budget_for(self._header)
+        self._fence_at_start = fence
+        self._start = start
+        # Leading whitespace of the next message is dropped outside code blocks
+        self._skip_space = fence is None
+        if self._skip_space:
+            self._skip_leading_space()
+        while self._toggle_pos < len(self._toggles) and self._toggles[self._toggle_pos][0] < self._start:
+            self._toggle_pos += 1
+        return message
+
+    def _skip_leading_space(self):
+        body = self._body
+        start = self._start
+        while start < len(body) and body[start].isspace():
+            start += 1
+        self._start = start
+        # Whitespace may continue in the next delta
+        self._skip_space = start == len(body)
+
+    def _compact(self):
+        """Drop sealed text so _body only holds the open message"""
+        offset = self._start
+        self._body = self._body[offset:]
+        self._start = 0
+        self._scanned = max(0, self._scanned - offset)
+        self._toggles = [(end - offset, fence) for end, fence in self._toggles[self._toggle_pos:]]
+        self._toggle_pos = 0
+
+
+def split_message(text: str, prefix: str = '', limit: int = MESSAGE_LIMIT) -> List[str]:
+    """Split a complete text into Discord-sized messages"""
+    splitter = MessageSplitter(prefix, limit)
+    messages = splitter.feed(text)
+    messages.append(splitter.finish())
+    return messages
@@ -0,0 +1,99 @@
+import logging
+import sqlite3
+import threading
+from typing import List, Tuple
+
+SCHEMA_PATH = 'databases/schema.sql'
+
+# Versioned changes to tables and indexes that already exist in deployed
+# databases. schema.sql creates whatever is missing on a new database, and
+# the migrations below then run once each, in order. Append new ones with
+# the next version number; never edit one that has shipped.
+MIGRATIONS: List[Tuple[int, str, List[str]]] = [
+    (1, "composite indexes for channel history and persona stats", [
+        # Context loads, history reads and clears filter on channel and order or cut by time
+        'CREATE INDEX IF NOT EXISTS idx_messages_channel_time ON messages(channel_id, timestamp DESC)',
+        # The dashboard's most active persona count is answered from the index alone
+        'CREATE INDEX IF NOT EXISTS idx_messages_persona_assistant ON messages(persona_name, is_assistant)',
+        'CREATE INDEX IF NOT EXISTS idx_summaries_channel_end ON chat_summaries(channel_id, end_timestamp)',
+        # Prefixes of the indexes above, and a copy of the UNIQUE constraint's own index
+        'DROP INDEX IF EXISTS idx_messages_channel',
+        'DROP INDEX IF EXISTS idx_messages_persona',
+        'DROP INDEX IF EXISTS idx_messages_discord_id',
+        'DROP INDEX IF EXISTS idx_summaries_channel',
+    ]),
+    (2, "full-text index over context messages", [
+        # External content: the index stores terms only and reads text from messages by id.
+        # Interaction log rows (no Discord message id) repeat context rows and are left out.
+        # No stemming: Discord chat is not all English, and query words must equal indexed terms
+        # so their document counts can be looked up in messages_fts_vocab
+        "CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5("
+        "content, content='messages', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+        "CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts_vocab USING fts5vocab(messages_fts, row)",
+        "CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages "
+        "WHEN new.discord_message_id IS NOT NULL BEGIN "
+        "INSERT INTO messages_fts (rowid, content) VALUES (new.id, new.content); END",
+        "CREATE TRIGGER IF NOT EXISTS messages_fts_delete AFTER DELETE ON messages "
+        "WHEN old.discord_message_id IS NOT NULL BEGIN "
+        "INSERT INTO messages_fts (messages_fts, rowid, content) VALUES ('delete', old.id, old.content); END",
+        "CREATE TRIGGER IF NOT EXISTS messages_fts_update AFTER UPDATE OF content ON messages "
+        "WHEN old.discord_message_id IS NOT NULL BEGIN "
+        "INSERT INTO messages_fts (messages_fts, rowid, content) VALUES ('delete', old.id, old.content); "
+        "INSERT INTO messages_fts (rowid, content) VALUES (new.id, new.content); END",
+        "INSERT INTO messages_fts (rowid, content) SELECT id, content FROM messages WHERE discord_message_id IS NOT NULL",
+    ]),
+]
+
+_migrated = {}  # database path -> schema version reached in this process
+_lock = threading.Lock()
+
+
+def schema_version(conn: sqlite3.Connection) -> int:
+    """Highest migration applied to the database, 0 for none"""
+    conn.execute('CREATE TABLE IF NOT EXISTS schema_version ('
+                 'version INTEGER PRIMARY KEY, description TEXT NOT NULL, '
+                 'applied_at DATETIME DEFAULT CURRENT_TIMESTAMP)')
+    return conn.execute('SELECT COALESCE(MAX(version), 0) FROM schema_version').fetchone()[0]
+
+
+def migrate(db_path: str, schema_path: str = SCHEMA_PATH) -> int:
+    """Bring a database up to date and return its schema version.
+
+    Safe to call from every entry point (bot, API, web dashboard): the work
+    happens once per database per process, and each migration is applied
+    in its own transaction together with its schema_version row, so a
+    second process or a crash halfway through never applies one twice.
+    """
+    with _lock:
+        if db_path in _migrated:
+            return _migrated[db_path]
+        with open(schema_path, 'r') as f:
+            schema_sql = f.read()
+        conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+        try:
+            conn.executescript(schema_sql)
+            version = schema_version(conn)
+            for number, description, statements in MIGRATIONS:
+                if number <= version:
+                    continue
+                # Take the write lock before re-checking, so concurrent starts apply it once
+                conn.execute('BEGIN IMMEDIATE')
+                try:
+                    if schema_version(conn) >= number:
+                        conn.execute('COMMIT')
+                        continue
+                    for statement in statements:
+                        conn.execute(statement)
+                    conn.execute('INSERT INTO schema_version (version, description) VALUES (?, ?)',
+                                 (number, description))
+                    conn.execute('COMMIT')
+                except Exception:
+                    conn.execute('ROLLBACK')
+                    raise
+                logging.info(f"[Migrations] Applied migration {number}: {description}")
+                version = number
+        finally:
+            conn.close()
+        if db_path != ':memory:':  # every connection to it is a new database
+            _migrated[db_path] = version
+        return version
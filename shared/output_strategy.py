@@ -0,0 +1,121 @@
+import io
+import logging
+from typing import List
+
+import discord
+
+from config import OUTPUT_STRATEGY, OUTPUT_MAX_PARTS
+from shared.message_splitter import MESSAGE_LIMIT, split_message
+
+# How responses longer than `max_parts` messages are delivered
+SPLIT = 'split'  # keep sending messages
+ATTACHMENT = 'attachment'  # preview message plus the full text as a file
+PAGINATE = 'paginate'  # preview message turned into an embed with page buttons
+
+# Discord's limit for an embed description
+EMBED_LIMIT = 4096
+
+# Footers of the overflowing message, while streaming and once finished
+WRITING_NOTE = "\n\n⏳ *Long response, the full text follows when it's done…*"
+ATTACHED_NOTE = "\n\n📎 *Full response attached.*"
+
+
+def looks_like_markdown(text: str) -> bool:
+    if '```' in text or '**' in text:
+        return True
+    return any(line.lstrip().startswith(('#', '- ', '* ', '> ', '|')) for line in text.splitlines())
+
+
+def response_file(text: str, name: str) -> discord.File:
+    """The full response as a .md file, or .txt when it has no markdown"""
+    extension = 'md' if looks_like_markdown(text) else 'txt'
+    return discord.File(io.BytesIO(text.encode('utf-8')), filename=f"{name.lower()}_response.{extension}")
+
+
+def page_embed(name: str, pages: List[str], index: int) -> discord.Embed:
+    embed = discord.Embed(description=pages[index])
+    embed.set_footer(text=f"{name} · page {index + 1}/{len(pages)}")
+    return embed
+
+
+class PageButton(discord.ui.Button):
+    """◀ / ▶ button that flips the embed of the message it is attached to"""
+
+    def __init__(self, step: int):
+        super().__init__(label='◀' if step < 0 else '▶', style=discord.ButtonStyle.secondary, row=1)
+        self.step = step
+
+    async def callback(self, interaction: discord.Interaction):
+        view = self.view
+        try:
+            view.page = (view.page + self.step) % len(view.pages)
+            await interaction.response.edit_message(embed=page_embed(view.persona, view.pages, view.page), view=view)
+        except Exception as e:
+            logging.error(f"[OutputStrategy] Error turning page: {str(e)}")
+
+
+def set_pages(view: discord.ui.View, persona: str, pages: List[str]):
+    """Attach page buttons for `pages` to a view, replacing any from an earlier response"""
+    for item in [child for child in view.children if isinstance(child, PageButton)]:
+        view.remove_item(item)
+    view.persona = persona
+    view.pages = pages
+    view.page = 0
+    if len(pages) > 1:
+        view.add_item(PageButton(-1))
+        view.add_item(PageButton(1))
+
+
+class OutputStrategy:
+    """Decides how a streamed response is delivered once it gets long.
+
+    Up to `max_parts` messages a response is sent as split messages. Past
+    that, with ATTACHMENT or PAGINATE, nothing more is posted while the model
+    writes: the last message becomes a preview, and when the stream ends it
+    is edited once, either with the full text attached as a file or into an
+    embed with page buttons. This costs one more edit, instead of one send
+    (plus live edits) for every 2000 characters.
+    """
+
+    def __init__(self, mode: str = OUTPUT_STRATEGY, max_parts: int = OUTPUT_MAX_PARTS):
+        if mode not in (SPLIT, ATTACHMENT, PAGINATE):
+            logging.error(f"[OutputStrategy] Unknown output strategy '{mode}', using '{SPLIT}'")
+            mode = SPLIT
+        self.mode = mode
+        self.max_parts = max(1, max_parts)
+        self.stats = {SPLIT: 0, ATTACHMENT: 0, PAGINATE: 0}
+
+    @property
+    def part_limit(self) -> int:
+        """Message length the splitter should use, leaving room for the preview footer"""
+        if self.mode == SPLIT:
+            return MESSAGE_LIMIT
+        return MESSAGE_LIMIT - max(len(WRITING_NOTE), len(ATTACHED_NOTE))
+
+    def overflows(self, parts: int) -> bool:
+        """Whether a response that needs `parts` messages so far should stop posting more"""
+        return self.mode != SPLIT and parts > self.max_parts
+
+    def preview(self, text: str) -> str:
+        """The last posted message while the rest of an overflowing response is written"""
+        return text + WRITING_NOTE
+
+    def finish(self, persona: str, preview: str, response: str, view, overflowed: bool, replacing: bool):
+        """Final content and extra edit arguments for the message carrying the view.
+
+        `replacing` is set when the message already showed an earlier response
+        (a reroll), so its old attachment or embed is cleared.
+        """
+        if view is not None and hasattr(view, 'children'):
+            set_pages(view, persona, split_message(response, '', EMBED_LIMIT) if overflowed and self.mode == PAGINATE else [])
+        if not overflowed:
+            self.stats[SPLIT] += 1
+            return preview, ({'attachments': [], 'embed': None} if replacing else {})
+        self.stats[self.mode] += 1
+        if self.mode == PAGINATE:
+            return None, {'attachments': [], 'embed': page_embed(persona, view.pages, 0)}
+        return preview + ATTACHED_NOTE, {'attachments': [response_file(response, persona)], 'embed': None}
+
+
+# Used by every persona's stream_reply
+output_strategy = OutputStrategy()
@@ -0,0 +1,175 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import aiosqlite
+
+# Seconds work waits after the first write so bursts and streamed updates share a commit
+FLUSH_DELAY = 1.0
+
+MESSAGE_COLUMNS = ('discord_message_id, channel_id, guild_id, user_id, content, '
+                   'is_assistant, persona_name, emotion, timestamp')
+
+_UPSERT = f'''
+    INSERT INTO messages ({MESSAGE_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(discord_message_id) DO UPDATE SET
+        user_id = excluded.user_id,
+        content = excluded.content,
+        is_assistant = excluded.is_assistant,
+        persona_name = excluded.persona_name,
+        emotion = excluded.emotion
+'''
+
+
+def row_from_db(values) -> dict:
+    """A context row from the MESSAGE_COLUMNS of a messages row"""
+    return {
+        'id': values[0],
+        'channel_id': values[1],
+        'guild_id': values[2],
+        'user_id': values[3],
+        'content': values[4],
+        'is_assistant': bool(values[5]),
+        'persona_name': values[6],
+        'emotion': values[7],
+        'timestamp': values[8],
+    }
+
+
+class MessageWriter:
+    """The single writer of the messages table.
+
+    One task owns one connection and commits batches, so writers never
+    contend for SQLite's lock or pay a connect and commit each. Rows are
+    upserted by Discord message id: writing the same message again (a
+    streamed reply growing, an edit) replaces the pending copy, and only
+    the latest one is written. Other writes are submitted as functions of
+    the connection with execute(); they run in submission order, each in
+    its own savepoint, before the batch's upserts. Until a row is committed,
+    rows() returns it, so readers see their own writes.
+    """
+
+    def __init__(self, db_path: str, flush_delay: float = FLUSH_DELAY):
+        self.db_path = db_path
+        self.flush_delay = flush_delay
+        self._pending: Dict[str, dict] = {}  # message id -> latest row not yet committed
+        self._ops: List[tuple] = []  # (function, future) in submission order
+        self._conn: Optional[aiosqlite.Connection] = None
+        self._conn_path = None
+        self._task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+        self.stats = {'upserts': 0, 'merged': 0, 'operations': 0, 'rows_written': 0, 'batches': 0, 'failures': 0}
+
+    def upsert(self, row: dict):
+        """Queue the latest version of a message row; keyed by row['id'], the Discord message id"""
+        if row['id'] in self._pending:
+            self.stats['merged'] += 1
+        self._pending[row['id']] = row
+        self.stats['upserts'] += 1
+        self._schedule()
+
+    def discard(self, matches: Callable[[dict], bool]):
+        """Drop pending rows that are about to be deleted anyway"""
+        for message_id in [key for key, row in self._pending.items() if matches(row)]:
+            del self._pending[message_id]
+
+    def rows(self, channel_id: str) -> List[dict]:
+        """Rows of a channel written but not yet committed, in write order"""
+        return [row for row in self._pending.values() if row['channel_id'] == channel_id]
+
+    def execute(self, operation: Callable[[aiosqlite.Connection], Awaitable]) -> asyncio.Future:
+        """Run `await operation(conn)` in the next batch; the future resolves after its commit"""
+        future = asyncio.get_running_loop().create_future()
+        self._ops.append((operation, future))
+        self.stats['operations'] += 1
+        self._schedule()
+        return future
+
+    def _schedule(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._write_later())
+
+    async def _write_later(self):
+        await asyncio.sleep(self.flush_delay)
+        await self.flush()
+
+    async def _connect(self) -> aiosqlite.Connection:
+        if self._conn is not None and self._conn_path != self.db_path:
+            await self._conn.close()
+            self._conn = None
+        if self._conn is None:
+            # Transactions are begun and committed explicitly below
+            self._conn = await aiosqlite.connect(self.db_path, isolation_level=None)
+            self._conn_path = self.db_path
+        return self._conn
+
+    async def flush(self):
+        """Commit everything queued so far in one transaction"""
+        async with self._lock:
+            ops, self._ops = self._ops, []
+            rows = list(self._pending.values())
+            self._pending.clear()
+            if not ops and not rows:
+                return
+            done = []
+            try:
+                conn = await self._connect()
+                await conn.execute('BEGIN IMMEDIATE')
+                for operation, future in ops:
+                    await conn.execute('SAVEPOINT operation')
+                    try:
+                        done.append((future, await operation(conn), None))
+                        await conn.execute('RELEASE operation')
+                    except Exception as e:
+                        # Only this operation is undone; its caller gets the error
+                        await conn.execute('ROLLBACK TO operation')
+                        await conn.execute('RELEASE operation')
+                        done.append((future, None, e))
+                        self.stats['failures'] += 1
+                if rows:
+                    await conn.executemany(_UPSERT, [
+                        (row['id'], row['channel_id'], row['guild_id'], row['user_id'], row['content'],
+                         row['is_assistant'], row['persona_name'], row['emotion'], row['timestamp'])
+                        for row in rows
+                    ])
+                await conn.execute('COMMIT')
+            except BaseException as e:
+                if self._conn is not None and self._conn.in_transaction:
+                    await self._conn.execute('ROLLBACK')
+                # Keep the rows for the next flush unless a newer version arrived meanwhile
+                for row in rows:
+                    self._pending.setdefault(row['id'], row)
+                if isinstance(e, asyncio.CancelledError):
+                    self._ops[:0] = ops
+                    raise
+                logging.error(f"[MessageWriter] Failed to write {len(rows)} rows and {len(ops)} operations: {str(e)}")
+                self.stats['failures'] += 1
+                for _, future in ops:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+            self.stats['rows_written'] += len(rows)
+            self.stats['batches'] += 1
+            for future, result, error in done:
+                if future.done():
+                    continue
+                if error is None:
+                    future.set_result(result)
+                else:
+                    future.set_exception(error)
+
+    async def close(self):
+        """Stop the delayed write, commit what is queued and close the connection"""
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        await self.flush()
+        if self._conn is not None:
+            await self._conn.close()
+            self._conn = None
+
+
+message_writer = MessageWriter('databases/interaction_logs.db')
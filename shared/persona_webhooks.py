@@ -0,0 +1,126 @@
+import time
+import asyncio
+import logging
+from typing import Dict, Optional
+
+import discord
+
+from config import PERSONA_PRESENTATION
+
+# Name of the webhook the bot creates in each channel a persona speaks in
+WEBHOOK_NAME = "SplinterTree Personas"
+
+# Seconds before a channel without a usable webhook is tried again
+RETRY_SECONDS = 300.0
+
+
+class PersonaPresenter:
+    """Posts persona replies through one bot-owned webhook per channel.
+
+    Webhook messages carry their own username and avatar, so every persona can
+    speak under its own identity over the bot's single gateway connection,
+    without renaming the bot before each reply or logging in a separate client
+    per persona. Channels where a webhook can't be used (DMs, missing Manage
+    Webhooks permission) fall back to a normal reply from the bot.
+    """
+
+    def __init__(self, name: str = WEBHOOK_NAME, enabled: bool = True):
+        self.name = name
+        self.enabled = enabled
+        self._webhooks: Dict[int, discord.Webhook] = {}
+        self._unavailable: Dict[int, float] = {}  # channel id -> monotonic time of the failed lookup
+        self._locks: Dict[int, asyncio.Lock] = {}
+        self.stats = {'webhook': 0, 'fallback': 0}
+
+    @staticmethod
+    def _target(channel):
+        """Channel that owns the webhook; threads post through their parent"""
+        if isinstance(channel, discord.Thread):
+            channel = channel.parent
+        return channel if isinstance(channel, discord.TextChannel) else None
+
+    def forget(self, channel_id):
+        """Drop the cached webhook for a channel, e.g. after it was deleted"""
+        self._webhooks.pop(channel_id, None)
+        self._unavailable.pop(channel_id, None)
+
+    def owns(self, message) -> bool:
+        """Whether a message was posted through one of the persona webhooks"""
+        webhook_id = getattr(message, 'webhook_id', None)
+        return webhook_id is not None and any(hook.id == webhook_id for hook in self._webhooks.values())
+
+    async def webhook_for(self, channel) -> Optional[discord.Webhook]:
+        """Cached persona webhook for a channel, found or created on first use"""
+        if not self.enabled:
+            return None
+        target = self._target(channel)
+        if target is None:
+            return None
+        webhook = self._webhooks.get(target.id)
+        if webhook is not None:
+            return webhook
+        failed_at = self._unavailable.get(target.id)
+        if failed_at is not None and time.monotonic() - failed_at < RETRY_SECONDS:
+            return None
+
+        lock = self._locks.setdefault(target.id, asyncio.Lock())
+        async with lock:
+            if target.id in self._webhooks:
+                return self._webhooks[target.id]
+            webhook = None
+            try:
+                me = target.guild.me
+                if target.permissions_for(me).manage_webhooks:
+                    for hook in await target.webhooks():
+                        if hook.name == self.name and hook.token and hook.user and hook.user.id == me.id:
+                            webhook = hook
+                            break
+                    else:
+                        webhook = await target.create_webhook(name=self.name, reason="Persona replies")
+            except discord.HTTPException as e:
+                logging.warning(f"[PersonaPresenter] No webhook for channel {target.id}: {str(e)}")
+
+            if webhook is None:
+                self._unavailable[target.id] = time.monotonic()
+            else:
+                self._webhooks[target.id] = webhook
+                self._unavailable.pop(target.id, None)
+            return webhook
+
+    async def send(self, message, content: str, username: str, avatar_url: Optional[str] = None, view=None):
+        """Post content as the persona in the message's channel.
+
+        Returns the sent message; its `edit()` goes through the same webhook,
+        so it can be handed to the edit scheduler like a regular reply.
+        """
+        webhook = await self.webhook_for(message.channel)
+        if webhook is not None:
+            kwargs = {
+                'username': username[:80],
+                'wait': True,
+                'allowed_mentions': discord.AllowedMentions(everyone=False, roles=False),
+            }
+            if avatar_url:
+                kwargs['avatar_url'] = avatar_url
+            if view is not None:
+                kwargs['view'] = view
+            if isinstance(message.channel, discord.Thread):
+                kwargs['thread'] = message.channel
+            try:
+                sent = await webhook.send(content, **kwargs)
+                self.stats['webhook'] += 1
+                return sent
+            except discord.NotFound:
+                # Webhook was deleted; the next message looks it up again
+                self.forget(webhook.channel_id)
+            except discord.HTTPException as e:
+                logging.error(f"[PersonaPresenter] Webhook send failed in channel {message.channel.id}: {str(e)}")
+
+        self.stats['fallback'] += 1
+        if view is not None:
+            return await message.reply(content=content, view=view)
+        return await message.reply(content)
+
+
+# Shared by all persona cogs
+persona_presenter = PersonaPresenter(enabled=PERSONA_PRESENTATION == 'webhook')
@@ -0,0 +1,207 @@
+import time
+import json
+import string
+import sqlite3
+import logging
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+# Placeholders that change with every message; everything else is fixed per channel
+DYNAMIC_FIELDS = ('USERNAME', 'DISCORD_USER_ID', 'TIME')
+
+# Compiled templates kept for (persona, guild, channel, names, version)
+RENDER_CACHE_SIZE = 2048
+
+TIMEZONE = ZoneInfo("America/Los_Angeles")
+TIMEZONE_NAME = "Pacific Time"
+
+
+def compile_template(template: str, static: Dict[str, str]) -> str:
+    """Bake the static placeholders of a system prompt into it.
+
+    The result is a format string with only the per-message fields left, so
+    rendering is one `str.format_map`. Raises KeyError/ValueError for
+    templates `str.format` couldn't render either.
+    """
+    parts = []
+    for literal, field, spec, conversion in string.Formatter().parse(template):
+        if literal:
+            parts.append(literal.replace('{', '{{').replace('}', '}}'))
+        if field is None:
+            continue
+        if field in DYNAMIC_FIELDS:
+            parts.append('{' + field + ('!' + conversion if conversion else '') + (':' + spec if spec else '') + '}')
+            continue
+        value = static[field]
+        if conversion == 'r':
+            value = repr(value)
+        elif conversion == 'a':
+            value = ascii(value)
+        parts.append(format(value, spec).replace('{', '{{').replace('}', '}}'))
+    return ''.join(parts)
+
+
+class PromptStore:
+    """System prompts for every persona, with server and channel overrides.
+
+    Shipped prompts come from prompts/consolidated_prompts.json, read once;
+    overrides live in the prompt_overrides table and are written through, so
+    a change applies on the next message without a restart. Every change bumps
+    `version`, which is part of the render cache key.
+    """
+
+    def __init__(self, db_path: str = 'databases/interaction_logs.db',
+                 prompts_file: str = 'prompts/consolidated_prompts.json'):
+        self.db_path = db_path
+        self.prompts_file = prompts_file
+        self.version = 0
+        self.shipped: Optional[Dict[str, str]] = None  # prompts_file contents, read on first use
+        self.base: Dict[str, str] = {}  # persona -> prompt when nothing is overridden
+        self.overrides: Dict[Tuple[str, str, str], str] = {}  # (persona, guild_id, channel_id) -> prompt
+        self.loaded = False
+        self._retry_at = 0.0
+        self._compiled: OrderedDict = OrderedDict()
+        self._clock_minute = None
+        self._clock_text = ''
+
+    @staticmethod
+    def _key(persona, guild_id=None, channel_id=None) -> Tuple[str, str, str]:
+        return (persona.lower(), str(guild_id) if guild_id else '', str(channel_id) if channel_id else '')
+
+    def _load_shipped(self) -> Dict[str, str]:
+        if self.shipped is None:
+            try:
+                with open(self.prompts_file, 'r', encoding='utf-8') as f:
+                    self.shipped = json.load(f).get('system_prompts', {})
+            except Exception as e:
+                logging.warning(f"[PromptStore] Failed to load {self.prompts_file}: {str(e)}")
+                self.shipped = {}
+        return self.shipped
+
+    def load(self) -> bool:
+        """(Re)load the overrides table"""
+        try:
+            db = sqlite3.connect(self.db_path)
+            try:
+                rows = db.execute('SELECT persona, guild_id, channel_id, prompt FROM prompt_overrides').fetchall()
+            finally:
+                db.close()
+            self.overrides = {(persona, guild_id, channel_id): prompt for persona, guild_id, channel_id, prompt in rows}
+            self.loaded = True
+            self.version += 1
+            logging.info(f"[PromptStore] Loaded {len(rows)} prompt overrides")
+            return True
+        except Exception as e:
+            logging.error(f"[PromptStore] Error loading prompt overrides: {str(e)}")
+            self._retry_at = time.monotonic() + 30.0
+            return False
+
+    def _ensure_loaded(self):
+        if not self.loaded and time.monotonic() >= self._retry_at:
+            self.load()
+
+    def register(self, persona: str, prompt_key: str, fallback: str):
+        """Set a persona's base prompt from the shipped prompts, keyed like BaseCog always did"""
+        self.base[persona.lower()] = self._load_shipped().get(prompt_key.lower(), fallback)
+        self.version += 1
+
+    def template(self, persona: str, guild_id=None, channel_id=None) -> str:
+        """Most specific prompt for a persona: channel, then server, then persona override, then base"""
+        self._ensure_loaded()
+        persona, guild_id, channel_id = self._key(persona, guild_id, channel_id)
+        overrides = self.overrides
+        if overrides:
+            for key in ((persona, guild_id, channel_id), (persona, guild_id, ''), (persona, '', '')):
+                if key in overrides:
+                    return overrides[key]
+        return self.base.get(persona, '')
+
+    def set_override(self, persona: str, prompt: str, guild_id=None, channel_id=None) -> bool:
+        """Write an override to the database, then to memory"""
+        key = self._key(persona, guild_id, channel_id)
+        try:
+            db = sqlite3.connect(self.db_path)
+            try:
+                db.execute('''
+                    INSERT OR REPLACE INTO prompt_overrides (persona, guild_id, channel_id, prompt, updated_at)
+                    VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+                ''', key + (prompt,))
+                db.commit()
+            finally:
+                db.close()
+        except Exception as e:
+            logging.error(f"[PromptStore] Error saving prompt override: {str(e)}")
+            return False
+        self._ensure_loaded()
+        self.overrides[key] = prompt
+        self.version += 1
+        return True
+
+    def clear_override(self, persona: str, guild_id=None, channel_id=None) -> bool:
+        """Remove an override; the next less specific prompt applies again"""
+        key = self._key(persona, guild_id, channel_id)
+        try:
+            db = sqlite3.connect(self.db_path)
+            try:
+                db.execute('DELETE FROM prompt_overrides WHERE persona = ? AND guild_id = ? AND channel_id = ?', key)
+                db.commit()
+            finally:
+                db.close()
+        except Exception as e:
+            logging.error(f"[PromptStore] Error removing prompt override: {str(e)}")
+            return False
+        self._ensure_loaded()
+        self.overrides.pop(key, None)
+        self.version += 1
+        return True
+
+    def current_time(self) -> str:
+        """Clock shown in prompts; only formatted again when the minute changes"""
+        minute = int(time.time() // 60)
+        if minute != self._clock_minute:
+            self._clock_text = datetime.now(TIMEZONE).strftime("%I:%M %p")
+            self._clock_minute = minute
+        return self._clock_text
+
+    def compiled(self, persona: str, model_id: str, guild_id, channel_id, server_name: str, channel_name: str) -> str:
+        """Format string for one persona in one channel, with static fields already rendered"""
+        key = (persona.lower(), guild_id, channel_id, server_name, channel_name, self.version)
+        fmt = self._compiled.get(key)
+        if fmt is not None:
+            self._compiled.move_to_end(key)
+            return fmt
+        template = self.template(persona, guild_id, channel_id)
+        fmt = compile_template(template, {
+            'MODEL_ID': model_id,
+            'TZ': TIMEZONE_NAME,
+            'SERVER_NAME': server_name,
+            'CHANNEL_NAME': channel_name,
+        })
+        self._compiled[key] = fmt
+        if len(self._compiled) > RENDER_CACHE_SIZE:
+            self._compiled.popitem(last=False)
+        return fmt
+
+    def render(self, persona: str, message) -> str:
+        """System prompt for a persona replying to a message"""
+        guild = message.guild
+        channel = message.channel
+        fmt = self.compiled(
+            persona,
+            persona,
+            str(guild.id) if guild else None,
+            str(channel.id),
+            guild.name if guild else "Direct Message",
+            channel.name if hasattr(channel, 'name') else "DM"
+        )
+        return fmt.format_map({
+            'USERNAME': message.author.display_name,
+            'DISCORD_USER_ID': message.author.id,
+            'TIME': self.current_time(),
+        })
+
+
+# Shared by all persona cogs and the prompt commands
+prompt_store = PromptStore()
@@ -0,0 +1,41 @@
+import time
+from typing import Dict, List, Optional
+
+
+class ReplyResult:
+    """Outcome of one handled message, returned by handle_message and route_message.
+
+    Callers that need the generated text (the hook command, tests) read it
+    from here instead of scraping the channel history. `timings` holds the
+    seconds spent in each stage, in order: 'route' when the router picked the
+    persona, 'request' until the model's stream opened, and 'stream' until
+    the final message was sent.
+    """
+
+    __slots__ = ('cog', 'text', 'message_ids', 'emotion', 'error', 'timings', '_lap')
+
+    def __init__(self, cog: Optional[str] = None):
+        self.cog = cog  # name of the persona that answered
+        self.text = ""  # full response, without the [Name] prefix
+        self.message_ids: List[int] = []
+        self.emotion: Optional[str] = None
+        self.error: Optional[str] = None
+        self.timings: Dict[str, float] = {}
+        self._lap = time.perf_counter()
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and bool(self.text)
+
+    @property
+    def total(self) -> float:
+        return sum(self.timings.values())
+
+    def lap(self, stage: str):
+        """Record the time since the previous lap as `stage`"""
+        now = time.perf_counter()
+        self.timings[stage] = now - self._lap
+        self._lap = now
+
+    def __repr__(self):
+        return f"ReplyResult(cog={self.cog!r}, ok={self.ok}, messages={len(self.message_ids)}, total={self.total:.2f}s)"
@@ -0,0 +1,244 @@
+import os
+import json
+import math
+import time
+import asyncio
+import logging
+import sqlite3
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Limit used before adaptive budgets existed; kept as the ceiling and as the
+# baseline for the savings report
+FIXED_MAX_TOKENS = 1000
+
+# Rough characters-per-token ratio used to turn logged text into token counts
+CHARS_PER_TOKEN = 4
+
+# Factor a key's cap is raised by after a response was cut off by it
+TRUNCATION_BACKOFF = 2.0
+
+# Stop sequences for cogs whose output format is known ahead of time.
+# Keys are lowercased model_cog names or prompt_file names.
+STOP_SEQUENCES = {
+    'router': ['</modelCog>'],
+}
+
+
+class LengthStats:
+    """Response length distribution for a single budget key"""
+
+    def __init__(self, lengths: List[int], tokens_per_second: Optional[float]):
+        self.lengths = sorted(lengths)
+        self.tokens_per_second = tokens_per_second
+
+    @property
+    def samples(self) -> int:
+        return len(self.lengths)
+
+    def percentile(self, pct: float) -> int:
+        """Nearest-rank percentile of the observed token lengths"""
+        if not self.lengths:
+            return 0
+        rank = max(1, math.ceil(pct * len(self.lengths)))
+        return self.lengths[min(rank, len(self.lengths)) - 1]
+
+
+class ResponseBudget:
+    """Chooses max_tokens and stop sequences per request from the logs table.
+
+    Lengths are grouped per (model_cog, guild), per model_cog and per
+    prompt_file. A request uses the most specific group that has enough
+    samples and falls back to FIXED_MAX_TOKENS otherwise. The cap cuts off
+    the longest responses by design, so every response that stops at an
+    adaptive cap (finish_reason 'length') is counted, and raises that key's
+    cap by TRUNCATION_BACKOFF for later requests.
+    """
+
+    def __init__(self, db_path: str = 'databases/interaction_logs.db',
+                 fixed_limit: int = FIXED_MAX_TOKENS, min_samples: int = 20,
+                 percentile: float = 0.95, headroom: float = 1.25,
+                 floor: int = 32, window: int = 5000, refresh_interval: int = 600):
+        self.db_path = db_path
+        self.fixed_limit = fixed_limit
+        self.min_samples = min_samples
+        self.percentile = percentile
+        self.headroom = headroom
+        self.floor = floor
+        self.window = window
+        self.refresh_interval = refresh_interval
+        self.stats: Dict[Tuple[str, ...], LengthStats] = {}
+        self.last_refresh = 0.0
+        self._refresh_task = None
+        # Per-key counters of requests served with an adaptive budget
+        self.applied: Dict[Tuple[str, ...], Dict[str, float]] = {}
+        # Per-key minimum cap, raised after truncations; kept across refreshes since
+        # the logged lengths of cut-off responses understate what was needed
+        self.raised: Dict[Tuple[str, ...], int] = {}
+
+    def _load_rows(self):
+        if not os.path.exists(self.db_path):
+            return []
+        conn = sqlite3.connect(self.db_path)
+        try:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT tags, response, requested_at, received_at, guild_id
+                FROM logs
+                WHERE status_code = 200
+                ORDER BY id DESC
+                LIMIT ?
+            ''', (self.window,))
+            return cursor.fetchall()
+        finally:
+            conn.close()
+
+    def refresh(self):
+        """Rebuild the length distributions from the most recent log rows"""
+        try:
+            rows = self._load_rows()
+        except Exception as e:
+            logger.error(f"[ResponseBudget] Failed to load logs: {str(e)}")
+            return
+
+        lengths: Dict[Tuple[str, ...], List[int]] = {}
+        rates: Dict[Tuple[str, ...], List[float]] = {}
+
+        for tags_str, response_str, requested_at, received_at, guild_id in rows:
+            try:
+                tags = json.loads(tags_str) if tags_str else {}
+                response = json.loads(response_str) if response_str else {}
+                content = response['choices'][0]['message']['content'] or ''
+            except (ValueError, KeyError, IndexError, TypeError):
+                continue
+
+            tokens = max(1, len(content) // CHARS_PER_TOKEN)
+            elapsed = (received_at - requested_at) / 1000 if received_at is not None and requested_at is not None else 0
+            model_cog = (tags.get('model_cog') or '').lower()
+            prompt_file = (tags.get('prompt_file') or '').lower()
+            guild = str(guild_id or tags.get('guild_id') or '')
+
+            keys = []
+            if model_cog:
+                keys.append(('cog', model_cog))
+                if guild:
+                    keys.append(('guild', model_cog, guild))
+            if prompt_file:
+                keys.append(('prompt_file', prompt_file))
+                if guild and not model_cog:
+                    keys.append(('guild', prompt_file, guild))
+
+            for key in keys:
+                lengths.setdefault(key, []).append(tokens)
+                if elapsed > 0:
+                    rates.setdefault(key, []).append(tokens / elapsed)
+
+        stats = {}
+        for key, values in lengths.items():
+            key_rates = sorted(rates.get(key, []))
+            median_rate = key_rates[len(key_rates) // 2] if key_rates else None
+            stats[key] = LengthStats(values, median_rate)
+
+        self.stats = stats
+        self.last_refresh = time.time()
+        logger.info(f"[ResponseBudget] Loaded length distributions for {len(stats)} keys from {len(rows)} log rows")
+
+    def _schedule_refresh(self):
+        """Refresh in a worker thread once the distributions are stale"""
+        if time.time() - self.last_refresh < self.refresh_interval:
+            return
+        if self._refresh_task and not self._refresh_task.done():
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self.last_refresh = time.time()
+        self._refresh_task = loop.run_in_executor(None, self.refresh)
+
+    def _candidate_keys(self, model_cog: Optional[str], prompt_file: Optional[str], guild_id: Optional[str]):
+        model_cog = (model_cog or '').lower()
+        prompt_file = (prompt_file or '').lower()
+        guild = str(guild_id) if guild_id else ''
+        name = model_cog or prompt_file
+        keys = []
+        if name and guild:
+            keys.append(('guild', name, guild))
+        if model_cog:
+            keys.append(('cog', model_cog))
+        if prompt_file:
+            keys.append(('prompt_file', prompt_file))
+        return keys
+
+    def stop_sequences(self, model_cog: Optional[str] = None, prompt_file: Optional[str] = None) -> Optional[List[str]]:
+        for name in (model_cog, prompt_file):
+            if name and name.lower() in STOP_SEQUENCES:
+                return list(STOP_SEQUENCES[name.lower()])
+        return None
+
+    def cap_for(self, stats: LengthStats, key: Optional[Tuple[str, ...]] = None) -> int:
+        cap = max(math.ceil(stats.percentile(self.percentile) * self.headroom), self.raised.get(key, 0))
+        return max(self.floor, min(self.fixed_limit, cap))
+
+    def record_finish(self, key: Optional[Tuple[str, ...]], max_tokens: int, finish_reason: Optional[str]) -> bool:
+        """Note how a request with budget `key` ended; True if its adaptive cap cut the response off"""
+        if key is None or finish_reason != 'length' or max_tokens >= self.fixed_limit:
+            return False
+        counters = self.applied.setdefault(key, {'requests': 0, 'tokens_released': 0, 'truncated': 0})
+        counters['truncated'] += 1
+        self.raised[key] = min(self.fixed_limit, max(self.raised.get(key, 0), math.ceil(max_tokens * TRUNCATION_BACKOFF)))
+        logger.info(f"[ResponseBudget] Response for {':'.join(key)} cut off at {max_tokens} tokens; cap raised to {self.raised[key]}")
+        return True
+
+    def suggest(self, model_cog: Optional[str] = None, prompt_file: Optional[str] = None,
+                guild_id: Optional[str] = None) -> Dict:
+        """Return {'max_tokens', 'stop', 'key'} for a request"""
+        self._schedule_refresh()
+
+        result = {
+            'max_tokens': self.fixed_limit,
+            'stop': self.stop_sequences(model_cog, prompt_file),
+            'key': None
+        }
+        for key in self._candidate_keys(model_cog, prompt_file, guild_id):
+            stats = self.stats.get(key)
+            if stats and stats.samples >= self.min_samples:
+                result['max_tokens'] = self.cap_for(stats, key)
+                result['key'] = key
+                break
+
+        if result['key'] is not None:
+            counters = self.applied.setdefault(result['key'], {'requests': 0, 'tokens_released': 0, 'truncated': 0})
+            counters['requests'] += 1
+            counters['tokens_released'] += self.fixed_limit - result['max_tokens']
+
+        return result
+
+    def report(self) -> List[Dict]:
+        """Summarize each budget key against the fixed limit.
+
+        ``seconds_saved`` is the worst-case generation time no longer reserved
+        per request, using the key's median observed throughput; it is an
+        upper bound, not time measured. ``truncated`` counts the responses
+        the adaptive cap cut off.
+        """
+        rows = []
+        for key, stats in sorted(self.stats.items()):
+            cap = self.cap_for(stats, key) if stats.samples >= self.min_samples else self.fixed_limit
+            seconds_saved = None
+            if stats.tokens_per_second:
+                seconds_saved = (self.fixed_limit - cap) / stats.tokens_per_second
+            applied = self.applied.get(key, {'requests': 0, 'tokens_released': 0, 'truncated': 0})
+            rows.append({
+                'key': key,
+                'samples': stats.samples,
+                'p50': stats.percentile(0.5),
+                'p95': stats.percentile(0.95),
+                'max_tokens': cap,
+                'tokens_per_second': stats.tokens_per_second,
+                'seconds_saved': seconds_saved,
+                'requests': applied['requests'],
+                'truncated': applied['truncated'],
+            })
+        return rows
@@ -0,0 +1,199 @@
+import re
+import time
+import asyncio
+import logging
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import aiosqlite
+
+from shared.context_policy import ContextPolicy
+from shared.persistence import MESSAGE_COLUMNS, row_from_db
+from shared.response_budget import CHARS_PER_TOKEN
+
+# Most recent messages always kept in the context, when the budget allows
+RECENT_K = 20
+
+# Best full-text matches from older history mixed into the context
+MATCH_M = 8
+
+# Estimated tokens of history sent with a message that has a query
+HISTORY_TOKEN_BUDGET = 3000
+
+# Terms of the current message used for the search, longest first
+MAX_TERMS = 12
+
+# Terms found in more than this share of stored messages are left out of the
+# search: their posting lists cost the most to rank and tell the least.
+# Short lists are cheap whatever their share, so small channels keep every term.
+COMMON_TERM_SHARE = 0.02
+COMMON_TERM_MIN_DOCS = 1000
+
+# Seconds a term's document count is reused before it is looked up again
+TERM_COUNT_TTL = 3600
+
+_WORD = re.compile(r"\w{3,}", re.UNICODE)
+
+STOPWORDS = frozenset("""
+about after again also and any are because been before being between both but can could did does doing
+down during each few for from further had has have having her here hers herself him himself his how into
+its itself just like more most myself nor not now off once only other our ours out over own same she
+should some such than that the their theirs them then there these they this those through too under
+until very was were what when where which while who whom why will with would you your yours yourself
+""".split())
+
+
+def query_terms(text: str) -> List[str]:
+    """The significant words of `text`, longest first"""
+    terms = []
+    for word in _WORD.findall(text.lower()):
+        if word not in STOPWORDS and not word.isdigit() and word not in terms:
+            terms.append(word)
+    terms.sort(key=len, reverse=True)
+    return terms[:MAX_TERMS]
+
+
+def match_query(text: str) -> Optional[str]:
+    """An FTS5 query matching any significant word of `text`, or None if it has none"""
+    return _match(query_terms(text))
+
+
+def _match(terms: List[str]) -> Optional[str]:
+    # Quoted, so words like NEAR or AND are searched for rather than parsed
+    return " OR ".join(f'"{term}"' for term in terms) or None
+
+
+def row_tokens(row: dict) -> int:
+    return len(row['content']) // CHARS_PER_TOKEN + 1
+
+
+def mix(recent: List[dict], matches: List[dict], window: int, budget: int = HISTORY_TOKEN_BUDGET,
+        recent_k: int = RECENT_K) -> List[dict]:
+    """Context rows under a token budget, oldest first.
+
+    `recent` is newest first and `matches` best first. The newest `recent_k`
+    rows come first (fewer if the window can't also hold the matches), then
+    the matches, then older recent rows, until the budget or `window` rows
+    are used up.
+    """
+    head = min(recent_k, max(window - len(matches), 0))
+    chosen, seen, used = [], set(), 0
+    for row in recent[:head] + matches + recent[head:]:
+        if len(chosen) >= window:
+            break
+        if row['id'] in seen:
+            continue
+        cost = row_tokens(row)
+        if used + cost > budget:
+            continue
+        chosen.append(row)
+        seen.add(row['id'])
+        used += cost
+    chosen.sort(key=lambda row: row['timestamp'])
+    return chosen
+
+
+class HistorySearch:
+    """BM25 search over a channel's stored messages, through the messages_fts index.
+
+    Words as common as "the" in this server's chat are dropped from the
+    query: ranking them means walking a posting list of most of the table.
+    Their document counts come from messages_fts_vocab and are cached, since
+    a common word stays common, as is the table size they are compared with.
+    Searches share one connection, opened on the first search and reopened
+    if db_path changes; close() closes it.
+    """
+
+    def __init__(self, db_path: str, common_share: float = COMMON_TERM_SHARE):
+        self.db_path = db_path
+        self.common_share = common_share
+        self._term_counts: Dict[str, Tuple[int, float]] = {}  # term -> (documents, looked up at)
+        self._total: Optional[Tuple[int, float]] = None  # (largest message id, looked up at)
+        self._conn: Optional[aiosqlite.Connection] = None
+        self._conn_path = db_path
+        self._lock = asyncio.Lock()
+        self.stats = {'queries': 0, 'matches': 0, 'common_terms': 0, 'failures': 0, 'seconds': 0.0}
+
+    async def _connect(self) -> aiosqlite.Connection:
+        async with self._lock:
+            if self._conn_path != self.db_path:
+                await self.close()
+                # Counts from another database mean nothing here
+                self._term_counts.clear()
+                self._total = None
+            if self._conn is None:
+                self._conn = await aiosqlite.connect(self.db_path)
+                self._conn_path = self.db_path
+            return self._conn
+
+    async def close(self):
+        """Close the search connection; the next search opens a new one"""
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            await conn.close()
+
+    async def _significant(self, conn: aiosqlite.Connection, terms: List[str]) -> List[str]:
+        now = time.monotonic()
+        stale = [term for term in terms
+                 if term not in self._term_counts or now - self._term_counts[term][1] > TERM_COUNT_TTL]
+        if stale:
+            if len(self._term_counts) > 50000:
+                self._term_counts.clear()
+            cursor = await conn.execute(
+                f"SELECT term, doc FROM messages_fts_vocab WHERE term IN ({', '.join('?' * len(stale))})", stale)
+            found = dict(await cursor.fetchall())
+            for term in stale:
+                self._term_counts[term] = (found.get(term, 0), now)
+        if self._total is None or now - self._total[1] > TERM_COUNT_TTL:
+            # The largest rowid stands in for the row count, which would need a scan
+            cursor = await conn.execute("SELECT MAX(id) FROM messages")
+            self._total = ((await cursor.fetchone())[0] or 0, now)
+        total = self._total[0]
+        cutoff = max(total * self.common_share, COMMON_TERM_MIN_DOCS)
+        kept = [term for term in terms if self._term_counts[term][0] <= cutoff]
+        self.stats['common_terms'] += len(terms) - len(kept)
+        return kept
+
+    async def search(self, channel_id: str, text: str, limit: int = MATCH_M,
+                     exclude_ids: Iterable[str] = (), policy: Optional[ContextPolicy] = None) -> List[dict]:
+        """Up to `limit` of the channel's messages best matching `text`, best first.
+
+        Only the kinds of message `policy` includes are searched; its time
+        window is not applied, since matches are how older history comes in.
+        """
+        terms = query_terms(text)
+        if not terms or limit <= 0:
+            return []
+        exclude_ids = set(exclude_ids)
+        columns = ', '.join(f'm.{column.strip()}' for column in MESSAGE_COLUMNS.split(','))
+        start = time.perf_counter()
+        try:
+            conn = await self._connect()
+            query = _match(await self._significant(conn, terms))
+            if query is None:
+                return []
+            cursor = await conn.execute(f'''
+                SELECT {columns} FROM messages_fts
+                JOIN messages m ON m.id = messages_fts.rowid
+                WHERE messages_fts MATCH ? AND m.channel_id = ?{policy.sql('m') if policy else ''}
+                ORDER BY bm25(messages_fts)
+                LIMIT ?
+            ''', (query, channel_id, limit + len(exclude_ids)))
+            fetched = await cursor.fetchall()
+        except Exception as e:
+            self.stats['failures'] += 1
+            # A broken connection is replaced on the next search
+            await self.close()
+            logging.error(f"[HistorySearch] Search failed in channel {channel_id}: {str(e)}")
+            return []
+        finally:
+            self.stats['queries'] += 1
+            self.stats['seconds'] += time.perf_counter() - start
+        rows = []
+        for values in fetched:
+            if values[0] in exclude_ids or not values[4]:
+                continue
+            rows.append(row_from_db(values))
+            if len(rows) >= limit:
+                break
+        self.stats['matches'] += len(rows)
+        return rows
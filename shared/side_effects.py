@@ -0,0 +1,147 @@
+import asyncio
+import itertools
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import discord
+
+# Priorities; lower runs first
+HIGH = 0  # context writes the next reply depends on
+NORMAL = 1  # visible but cosmetic: reactions
+LOW = 2  # bookkeeping: nicknames, interaction logs
+
+# Jobs running at once
+WORKERS = 4
+
+# Queue depth above which new LOW priority work is dropped
+MAX_PENDING = 1000
+
+
+class SideEffectQueue:
+    """Prioritized background work for everything that follows a reply.
+
+    Reactions, nickname edits, context writes and interaction logs run on a
+    small worker pool instead of inside `handle_message`, so a handler returns
+    as soon as the reply is out. Jobs submitted with the same key while one is
+    still queued are merged (the latest wins), interaction logs are written in
+    batches, and nickname edits are skipped when the guild already shows that
+    nickname. `drain()` finishes queued work on shutdown.
+    """
+
+    def __init__(self, workers: int = WORKERS, max_pending: int = MAX_PENDING):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._seq = itertools.count()
+        self._jobs: Dict[Any, Callable[[], Awaitable]] = {}  # merge key -> latest job still queued
+        self._batches: Dict[str, list] = {}  # batch kind -> items waiting for the queued flush
+        self._nicknames: Dict[int, str] = {}  # guild id -> nickname last set
+        self.closed = False
+        self.stats = {'queued': 0, 'done': 0, 'failed': 0, 'merged': 0, 'dropped': 0, 'nick_skipped': 0}
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def _ensure_workers(self):
+        if self._queue is None:
+            self._queue = asyncio.PriorityQueue()
+        self._tasks = [task for task in self._tasks if not task.done()]
+        while len(self._tasks) < self.workers:
+            self._tasks.append(asyncio.create_task(self._worker()))
+
+    def submit(self, job: Callable[[], Awaitable], priority: int = NORMAL, key=None, name: str = 'job') -> bool:
+        """Queue `job()` to run in the background; False if it was refused"""
+        if self.closed:
+            return False
+        if key is not None and key in self._jobs:
+            self._jobs[key] = job
+            self.stats['merged'] += 1
+            return True
+        if priority >= LOW and self.pending >= self.max_pending:
+            self.stats['dropped'] += 1
+            logging.warning(f"[SideEffects] Queue full, dropping {name}")
+            return False
+        self._ensure_workers()
+        if key is not None:
+            self._jobs[key] = job
+        self._queue.put_nowait((priority, next(self._seq), key, job, name))
+        self.stats['queued'] += 1
+        return True
+
+    def submit_batch(self, kind: str, item, flush: Callable[[list], Awaitable], priority: int = LOW) -> bool:
+        """Add an item to the next `flush(items)` of its kind, queueing the flush if none is waiting"""
+        batch = self._batches.get(kind)
+        if batch is not None:
+            batch.append(item)
+            self.stats['merged'] += 1
+            return True
+        self._batches[kind] = [item]
+
+        def run():
+            return flush(self._batches.pop(kind, []))
+
+        if not self.submit(run, priority, name=kind):
+            self._batches.pop(kind, None)
+            return False
+        return True
+
+    async def _worker(self):
+        while True:
+            _, _, key, job, name = await self._queue.get()
+            try:
+                if key is not None:
+                    job = self._jobs.pop(key, job)
+                await job()
+                self.stats['done'] += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.stats['failed'] += 1
+                logging.error(f"[SideEffects] {name} failed: {str(e)}")
+            finally:
+                self._queue.task_done()
+
+    async def drain(self, timeout: float = 10.0):
+        """Run what is queued, then stop the workers"""
+        self.closed = True
+        if self._queue is not None and self._tasks:
+            try:
+                await asyncio.wait_for(self._queue.join(), timeout)
+            except asyncio.TimeoutError:
+                logging.warning(f"[SideEffects] Abandoning {self.pending} queued jobs at shutdown")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def set_nickname(self, guild, nick: str) -> bool:
+        """Queue a nickname edit unless the guild already shows it"""
+        if self._nicknames.get(guild.id) == nick:
+            self.stats['nick_skipped'] += 1
+            return False
+        self._nicknames[guild.id] = nick
+
+        async def edit():
+            try:
+                await guild.me.edit(nick=nick)
+            except Exception:
+                self._nicknames.pop(guild.id, None)
+                raise
+
+        return self.submit(edit, LOW, key=('nickname', guild.id), name='nickname')
+
+    def add_reaction(self, message, emoji: str, persona: str = 'SideEffects') -> bool:
+        """Queue a reaction; the same reaction on the same message is queued once"""
+        async def react():
+            try:
+                await message.add_reaction(emoji)
+            except discord.errors.Forbidden:
+                logging.warning(f"[{persona}] Missing permission to add reaction")
+
+        return self.submit(react, NORMAL, key=('reaction', message.id, emoji), name='reaction')
+
+
+# Shared by all cogs; drained in SplinterTreeBot.close
+side_effects = SideEffectQueue()
@@ -0,0 +1,232 @@
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import aiosqlite
+
+from config import SUMMARY_THRESHOLD_TOKENS
+from shared.generation_scheduler import generation_scheduler, AMBIENT
+from shared.persistence import MessageWriter
+from shared.response_budget import CHARS_PER_TOKEN
+
+# Newest messages of a channel that are always kept verbatim
+KEEP_RECENT = 20
+
+# Most messages folded into the summary by one model call; a longer backlog takes several passes
+MAX_SPAN = 200
+
+# Seconds before a channel's history is checked again after a check
+CHECK_INTERVAL = 120.0
+
+# Minimum seconds between two summary calls, across all channels
+CALL_INTERVAL = 10.0
+
+SUMMARY_PREFIX = '[SUMMARY]'
+
+SUMMARY_INSTRUCTIONS = (
+    "You maintain the running summary of a Discord channel for AI personas joining the conversation. "
+    "Rewrite the summary so far to also cover the new messages. Keep who said what, facts, decisions, "
+    "preferences and open questions; drop greetings and filler. Write plain prose of at most 250 words."
+)
+
+
+class Summary:
+    """A channel's rolling summary, covering its messages up to and including `end`"""
+
+    __slots__ = ('channel_id', 'start', 'end', 'text')
+
+    def __init__(self, channel_id: str, start: str, end: str, text: str):
+        self.channel_id = channel_id
+        self.start = start
+        self.end = end
+        self.text = text
+
+    def as_context(self) -> dict:
+        """The summary as a context message, which the model cogs send as a system message"""
+        return {
+            'id': f"summary_{self.channel_id}",
+            'user_id': 'SYSTEM',
+            'content': f"{SUMMARY_PREFIX} {self.text}",
+            'is_assistant': False,
+            'persona_name': None,
+            'emotion': None,
+            'timestamp': self.end,
+        }
+
+
+def estimate_tokens(rows: List[dict]) -> int:
+    return sum(len(row['content']) for row in rows) // CHARS_PER_TOKEN
+
+
+class ChannelSummarizer:
+    """Folds the oldest messages of busy channels into chat_summaries, in the background.
+
+    note() is called for every message stored in an activated channel or
+    one a persona has replied in, and queues the channel for a check at
+    most every CHECK_INTERVAL seconds. A check reads the messages
+    after the latest summary's end; when they exceed the token threshold,
+    all but the newest KEEP_RECENT are summarized together with the previous
+    summary into a new row. Context assembly then sends that summary in
+    place of every message up to its end. The summary row is the only
+    progress marker, so a crash at any point loses at most the pass in
+    flight, and the next check redoes it. Calls are spaced CALL_INTERVAL
+    apart and go through the generation scheduler as ambient work, so they
+    are shed first when the bot is busy.
+    """
+
+    def __init__(self, db_path: str, complete: Callable[[List[dict]], Awaitable[str]],
+                 writer: Optional[MessageWriter] = None, threshold: int = SUMMARY_THRESHOLD_TOKENS,
+                 keep_recent: int = KEEP_RECENT, check_interval: float = CHECK_INTERVAL,
+                 call_interval: float = CALL_INTERVAL):
+        self.db_path = db_path
+        self.complete = complete
+        self.writer = writer or MessageWriter(db_path)
+        self.threshold = threshold
+        self.keep_recent = keep_recent
+        self.check_interval = check_interval
+        self.call_interval = call_interval
+        self._latest: Dict[str, Optional[Summary]] = {}  # channel id -> newest summary, once read
+        self._checked: Dict[str, float] = {}  # channel id -> time of the last check
+        self._queue = deque()
+        self._queued = set()
+        self._last_call = float('-inf')
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {'checks': 0, 'summaries': 0, 'summarized_messages': 0, 'skipped_busy': 0, 'failures': 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.threshold > 0
+
+    async def latest(self, channel_id: str) -> Optional[Summary]:
+        """The channel's newest summary, read from the database once and then kept in memory"""
+        if channel_id in self._latest:
+            return self._latest[channel_id]
+        summary = None
+        try:
+            async with aiosqlite.connect(self.db_path) as conn:
+                cursor = await conn.execute('''
+                    SELECT start_timestamp, end_timestamp, summary FROM chat_summaries
+                    WHERE channel_id = ? ORDER BY end_timestamp DESC LIMIT 1
+                ''', (channel_id,))
+                found = await cursor.fetchone()
+            if found:
+                summary = Summary(channel_id, found[0], found[1], found[2])
+        except Exception as e:
+            logging.error(f"[Summarizer] Failed to read the summary of channel {channel_id}: {str(e)}")
+            return None
+        # A pass may have finished while this read was waiting
+        return self._latest.setdefault(channel_id, summary)
+
+    def note(self, channel_id: str, guild_id: Optional[str] = None, now: Optional[float] = None):
+        """A message was stored in the channel; queue a check unless one ran recently"""
+        if not self.enabled or channel_id in self._queued:
+            return
+        now = time.monotonic() if now is None else now
+        if now - self._checked.get(channel_id, float('-inf')) < self.check_interval:
+            return
+        self._checked[channel_id] = now
+        self._queue.append((channel_id, guild_id))
+        self._queued.add(channel_id)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._work())
+
+    async def _work(self):
+        while self._queue:
+            channel_id, guild_id = self._queue.popleft()
+            self._queued.discard(channel_id)
+            try:
+                if await self.summarize(channel_id, guild_id):
+                    # There may be more backlog than one pass takes
+                    self._queue.append((channel_id, guild_id))
+                    self._queued.add(channel_id)
+            except Exception as e:
+                self.stats['failures'] += 1
+                logging.error(f"[Summarizer] Failed to summarize channel {channel_id}: {str(e)}")
+
+    async def _unsummarized(self, channel_id: str, after: Optional[str]) -> List[dict]:
+        async with aiosqlite.connect(self.db_path) as conn:
+            cursor = await conn.execute('''
+                SELECT content, is_assistant, persona_name, timestamp FROM messages
+                WHERE channel_id = ? AND discord_message_id IS NOT NULL AND (? IS NULL OR timestamp > ?)
+                ORDER BY timestamp ASC
+                LIMIT ?
+            ''', (channel_id, after, after, MAX_SPAN + self.keep_recent))
+            return [
+                {'content': row[0], 'is_assistant': bool(row[1]), 'persona_name': row[2], 'timestamp': row[3]}
+                for row in await cursor.fetchall()
+            ]
+
+    async def summarize(self, channel_id: str, guild_id: Optional[str] = None) -> bool:
+        """Run one pass over a channel; True if it wrote a summary and more backlog may remain"""
+        self.stats['checks'] += 1
+        previous = await self.latest(channel_id)
+        rows = await self._unsummarized(channel_id, previous.end if previous else None)
+        full = len(rows) == MAX_SPAN + self.keep_recent
+        if len(rows) <= self.keep_recent or (not full and estimate_tokens(rows) < self.threshold):
+            return False
+        span = rows[:-self.keep_recent]
+
+        wait = self._last_call + self.call_interval - time.monotonic()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        ticket = generation_scheduler.admit(guild_id, 'summarizer', AMBIENT)
+        if ticket is None:
+            self.stats['skipped_busy'] += 1
+            return False
+        async with ticket:
+            self._last_call = time.monotonic()
+            text = await self.complete(self._prompt(previous, span))
+        if not text or not text.strip():
+            self.stats['failures'] += 1
+            return False
+
+        summary = Summary(channel_id, previous.start if previous else span[0]['timestamp'],
+                          span[-1]['timestamp'], text.strip())
+
+        async def insert(conn):
+            await conn.execute(
+                'INSERT INTO chat_summaries (channel_id, start_timestamp, end_timestamp, summary) VALUES (?, ?, ?, ?)',
+                (channel_id, summary.start, summary.end, summary.text)
+            )
+
+        await self.writer.execute(insert)
+        self._latest[channel_id] = summary
+        self.stats['summaries'] += 1
+        self.stats['summarized_messages'] += len(span)
+        logging.info(f"[Summarizer] Summarized {len(span)} messages of channel {channel_id} up to {summary.end}")
+        return full
+
+    @staticmethod
+    def _prompt(previous: Optional[Summary], span: List[dict]) -> List[dict]:
+        lines = []
+        for row in span:
+            content = row['content']
+            if row['is_assistant'] and row['persona_name']:
+                # Replies are stored as "Assistant: ..."; name the persona instead
+                content = f"{row['persona_name']}: {content.removeprefix('Assistant: ')}"
+            lines.append(content)
+        so_far = previous.text if previous else "(none yet)"
+        return [
+            {'role': 'system', 'content': SUMMARY_INSTRUCTIONS},
+            {'role': 'user', 'content': f"Summary so far:\n{so_far}\n\nNew messages:\n" + "\n".join(lines)},
+        ]
+
+    async def clear(self, channel_id: str):
+        """Delete a channel's summaries after its history was cleared; they describe what was removed"""
+        async def delete(conn):
+            await conn.execute('DELETE FROM chat_summaries WHERE channel_id = ?', (channel_id,))
+
+        done = self.writer.execute(delete)
+        await self.writer.flush()
+        await done
+        self._latest[channel_id] = None
+
+    async def close(self):
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
@@ -0,0 +1,106 @@
+import re
+import logging
+from typing import Dict, Iterable, List, Optional
+
+
+def _trie_regex(words) -> str:
+    """Alternation with shared prefixes factored out, e.g. 'qwen(?:2\\.5)?'.
+
+    Python's regex engine tries alternatives one by one at every position; a
+    trie keeps that to one branch per distinct next character.
+    """
+    trie: Dict = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[''] = {}  # end of word
+
+    def render(node) -> str:
+        ends = '' in node
+        branches = [re.escape(ch) + render(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ''
+        if ends:
+            # Optional, greedy: the longer trigger is tried first at a position
+            return '(?:' + '|'.join(branches) + ')?'
+        return branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+
+    return render(trie)
+
+
+class TriggerMatch:
+    """One trigger word found in a message"""
+
+    __slots__ = ('cog', 'word', 'start', 'end', 'priority')
+
+    def __init__(self, cog, word: str, start: int, end: int, priority: int = 0):
+        self.cog = cog
+        self.word = word
+        self.start = start
+        self.end = end
+        self.priority = priority
+
+    def __repr__(self):
+        return f"TriggerMatch({getattr(self.cog, 'name', self.cog)!r}, {self.word!r}, {self.start})"
+
+
+class TriggerIndex:
+    """All cogs' trigger words compiled into one case-insensitive regex.
+
+    A message is scanned once and every match comes back with its cog and
+    position. Words match on word boundaries unless a cog sets
+    `trigger_word_boundaries = False`, so '4o' no longer fires inside other
+    words. When several cogs match, the highest `trigger_priority` (default 0)
+    wins, then the earliest match, then the longest word.
+    """
+
+    def __init__(self, cogs: Iterable = ()):
+        self._pattern: Optional[re.Pattern] = None
+        self._owners: Dict[str, List] = {}
+        self.build(cogs)
+
+    def build(self, cogs: Iterable):
+        owners: Dict[str, List] = {}
+        bounded = set()
+        for cog in cogs:
+            words = getattr(cog, 'trigger_words', None)
+            if not words or not hasattr(cog, 'handle_message'):
+                continue
+            boundaries = getattr(cog, 'trigger_word_boundaries', True)
+            for word in words:
+                key = word.lower().strip()
+                if not key:
+                    continue
+                owners.setdefault(key, []).append(cog)
+                if boundaries:
+                    bounded.add(key)
+
+        alternatives = []
+        if bounded:
+            alternatives.append(rf"(?<!\w){_trie_regex(bounded)}(?!\w)")
+        unbounded = set(owners) - bounded
+        if unbounded:
+            alternatives.append(_trie_regex(unbounded))
+        self._owners = owners
+        self._pattern = re.compile('|'.join(alternatives), re.IGNORECASE) if alternatives else None
+        logging.debug("[TriggerIndex] Built index with %s trigger words", len(owners))
+
+    def find_all(self, content: str) -> List[TriggerMatch]:
+        """Every trigger occurrence in the message, in order of position"""
+        if self._pattern is None or not content:
+            return []
+        matches = []
+        for found in self._pattern.finditer(content):
+            word = found.group(0).lower()
+            for cog in self._owners.get(word, ()):
+                matches.append(TriggerMatch(cog, word, found.start(), found.end(),
+                                            getattr(cog, 'trigger_priority', 0)))
+        return matches
+
+    def best(self, content: str) -> Optional[TriggerMatch]:
+        """The match that decides which cog handles the message"""
+        matches = self.find_all(content)
+        if not matches:
+            return None
+        return min(matches, key=lambda m: (-m.priority, m.start, -(m.end - m.start)))
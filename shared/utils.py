@@ -4,6 +4,7 @@ import sqlite3
 import aiosqlite
 from datetime import datetime
 from typing import Optional, List, Dict, Any, Union
+from shared.persistence import message_writer
 
 def analyze_emotion(text):
     """
@@ -112,7 +113,7 @@ async def store_alt_text(message_id: str, channel_id: str, alt_text: str, attach
                 VALUES (?, ?, ?, ?)
             """, (str(message_id), str(channel_id), alt_text, attachment_url))
             await conn.commit()
-            logging.debug(f"Stored alt text for message {message_id}")
+            logging.debug("Stored alt text for message %s", message_id)
             return True
     except Exception as e:
         logging.error(f"Failed to store alt text: {str(e)}")
@@ -163,72 +164,93 @@ async def log_interaction(user_id: Union[int, str], guild_id: Optional[Union[int
     """
     Log interaction details to SQLite database
     """
+    await log_interactions([{
+        'user_id': user_id,
+        'guild_id': guild_id,
+        'persona_name': persona_name,
+        'user_message': user_message,
+        'assistant_reply': assistant_reply,
+        'emotion': emotion,
+        'channel_id': channel_id
+    }])
+
+def _interaction_row(entry: Dict) -> Dict:
+    """Normalize one log_interaction entry to the stored string values"""
+    user_message = entry['user_message']
+    # Handle user_message that might be a Discord Message object or other complex type
+    if isinstance(user_message, str):
+        user_message_content = user_message
+    elif isinstance(user_message, dict):
+        user_message_content = json.dumps(user_message)
+    else:
+        # Try to convert to string, fallback to repr if needed
+        try:
+            user_message_content = str(user_message)
+        except:
+            user_message_content = repr(user_message)
+    return {
+        'timestamp': entry.get('timestamp') or datetime.now().isoformat(),
+        'user_id': str(entry['user_id']),
+        'guild_id': str(entry['guild_id']) if entry.get('guild_id') else None,
+        'channel_id': str(entry['channel_id']) if entry.get('channel_id') else None,
+        'persona': str(entry['persona_name']),
+        'user_message': user_message_content,
+        'assistant_reply': str(entry['assistant_reply']),
+        'emotion': str(entry['emotion']) if entry.get('emotion') else None
+    }
+
+async def log_interactions(entries: List[Dict]):
+    """
+    Log several interactions in one transaction, through the message writer.
+    Each entry has the keyword arguments of log_interaction.
+    """
+    if not entries:
+        return
+    rows = []
     try:
-        db_path = 'databases/interaction_logs.db'
-        async with aiosqlite.connect(db_path) as conn:
-            # Convert all values to strings to prevent type issues
-            channel_id = str(channel_id) if channel_id else None
-            guild_id = str(guild_id) if guild_id else None
-            user_id = str(user_id)
-            persona_name = str(persona_name)
-            
-            # Handle user_message that might be a Discord Message object or other complex type
-            if isinstance(user_message, str):
-                user_message_content = user_message
-            elif isinstance(user_message, dict):
-                user_message_content = json.dumps(user_message)
-            else:
-                # Try to convert to string, fallback to repr if needed
-                try:
-                    user_message_content = str(user_message)
-                except:
-                    user_message_content = repr(user_message)
-            
-            assistant_reply = str(assistant_reply)
-            emotion = str(emotion) if emotion else None
-            timestamp = datetime.now().isoformat()
-            
-            # Log user message
+        rows = [_interaction_row(entry) for entry in entries]
+
+        async def insert(conn):
             cursor = await conn.cursor()
-            await cursor.execute("""
-                INSERT INTO messages (
-                    channel_id, guild_id, user_id, content, 
-                    is_assistant, emotion, timestamp
-                ) VALUES (?, ?, ?, ?, ?, ?, ?)
-            """, (channel_id, guild_id, user_id, user_message_content, False, None, timestamp))
-            
-            user_message_id = cursor.lastrowid
-            
-            # Log assistant reply
-            await cursor.execute("""
-                INSERT INTO messages (
-                    channel_id, guild_id, user_id, persona_name,
-                    content, is_assistant, emotion, parent_message_id,
-                    timestamp
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (channel_id, guild_id, user_id, persona_name,
-                 assistant_reply, True, emotion, user_message_id, timestamp))
-            
-            await conn.commit()
-            logging.debug(f"Successfully logged interaction for user {user_id}")
-            
-    except Exception as e:
-        logging.error(f"Failed to log interaction: {str(e)}")
-        # Fallback to JSONL logging if database fails
-        try:
-            log_entry = {
-                'timestamp': datetime.now().isoformat(),
-                'user_id': str(user_id),
-                'guild_id': str(guild_id) if guild_id else None,
-                'channel_id': str(channel_id) if channel_id else None,
-                'persona': str(persona_name),
-                'user_message': str(user_message_content) if 'user_message_content' in locals() else str(user_message),
-                'assistant_reply': str(assistant_reply),
-                'emotion': str(emotion) if emotion else None
-            }
-            
-            with open('interaction_logs.jsonl', 'a', encoding='utf-8') as f:
-                f.write(json.dumps(log_entry) + '\n')
+            for row in rows:
+                # Log user message
+                await cursor.execute("""
+                    INSERT INTO messages (
+                        channel_id, guild_id, user_id, content, 
+                        is_assistant, emotion, timestamp
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?)
+                """, (row['channel_id'], row['guild_id'], row['user_id'], row['user_message'], False, None, row['timestamp']))
                 
-        except Exception as e2:
-            logging.error(f"Failed to log interaction to JSONL: {str(e2)}")
+                user_message_id = cursor.lastrowid
+                
+                # Log assistant reply
+                await cursor.execute("""
+                    INSERT INTO messages (
+                        channel_id, guild_id, user_id, persona_name,
+                        content, is_assistant, emotion, parent_message_id,
+                        timestamp
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, (row['channel_id'], row['guild_id'], row['user_id'], row['persona'],
+                     row['assistant_reply'], True, row['emotion'], user_message_id, row['timestamp']))
+
+        # Committed with the writer's next batch; a failed write falls back to JSONL then
+        written = message_writer.execute(insert)
+        written.add_done_callback(
+            lambda done: done.cancelled() or done.exception() is None or _log_to_jsonl(rows, done.exception())
+        )
+
+    except Exception as e:
+        if not rows:
+            rows = [{key: str(value) for key, value in entry.items()} for entry in entries]
+        _log_to_jsonl(rows, e)
+
+def _log_to_jsonl(rows: List[Dict], error: Exception):
+    """Fallback to JSONL logging if the database write fails"""
+    logging.error(f"Failed to log interaction: {str(error)}")
+    try:
+        with open('interaction_logs.jsonl', 'a', encoding='utf-8') as f:
+            for row in rows:
+                f.write(json.dumps(row) + '\n')
+
+    except Exception as e2:
+        logging.error(f"Failed to log interaction to JSONL: {str(e2)}")
@@ -0,0 +1,60 @@
+import sqlite3
+import pytest
+from shared.access_control import AccessControl
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "interaction_logs.db")
+    db = sqlite3.connect(path)
+    db.executescript('''
+        CREATE TABLE banned_users (
+            user_id TEXT PRIMARY KEY,
+            banned_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            reason TEXT DEFAULT 'opt-out'
+        );
+        CREATE TABLE channel_activations (
+            channel_id TEXT PRIMARY KEY,
+            guild_id TEXT NOT NULL,
+            activated_by TEXT NOT NULL,
+            activated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            is_active BOOLEAN NOT NULL DEFAULT TRUE
+        );
+        INSERT INTO banned_users (user_id) VALUES ('42');
+        INSERT INTO channel_activations (channel_id, guild_id, activated_by, is_active) VALUES ('100', '1', '7', TRUE);
+        INSERT INTO channel_activations (channel_id, guild_id, activated_by, is_active) VALUES ('200', '1', '7', FALSE);
+    ''')
+    db.commit()
+    db.close()
+    return path
+
+def test_loads_existing_state(db_path):
+    acl = AccessControl(db_path)
+    assert acl.is_banned(42)
+    assert not acl.is_banned("43")
+    assert acl.is_channel_active("100", "1")
+    assert not acl.is_channel_active("100", "2")  # wrong guild
+    assert not acl.is_channel_active("200", "1")
+    assert acl.active_channels("1") == ["100"]
+
+def test_writes_go_through_to_database(db_path):
+    acl = AccessControl(db_path)
+    assert acl.ban("43")
+    assert acl.set_channel_active("200", "1", "7", True)
+    assert acl.set_channel_active("100", "1", "7", False)
+
+    assert acl.is_banned("43")
+    assert acl.is_channel_active("200", "1")
+    assert not acl.is_channel_active("100", "1")
+
+    # A fresh cache sees the same state
+    reloaded = AccessControl(db_path)
+    assert reloaded.is_banned("43")
+    assert reloaded.is_channel_active("200", "1")
+    assert not reloaded.is_channel_active("100", "1")
+
+def test_missing_tables_fail_closed(tmp_path):
+    acl = AccessControl(str(tmp_path / "empty.db"))
+    assert not acl.is_banned("42")
+    assert not acl.is_channel_active("100", "1")
+    assert not acl.ban("42")
+    assert not acl.loaded
@@ -1,6 +1,8 @@
 import pytest
-from unittest.mock import AsyncMock, MagicMock
-from cogs.base_cog import BaseCog
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+from cogs.base_cog import BaseCog, RerollView
+from shared.output_strategy import OutputStrategy, ATTACHMENT
 
 @pytest.mark.asyncio
 async def test_is_user_banned():
@@ -27,3 +29,128 @@ async def test_generate_response():
     cog.generate_response = AsyncMock(return_value=AsyncMock())
     response = await cog.generate_response(message)
     assert response is not None
+
+@pytest.mark.asyncio
+async def test_build_messages_reuses_snapshot():
+    bot = MagicMock()
+    bot.get_cog.return_value.get_context_messages = AsyncMock(return_value=[{'content': 'earlier'}])
+    cog = BaseCog(bot, "TestCog", "TestNickname", ["trigger"], "test_model")
+    message = MagicMock(id=1, content="hi")
+
+    first = await cog.build_messages(message, "prompt")
+    assert [m['content'] for m in first] == ["prompt", "earlier", "hi"]
+    cog.context_cog.get_context_messages.return_value = [{'content': 'newer'}]
+    assert await cog.build_messages(message, "prompt") == first
+    cog.context_cog.get_context_messages.assert_awaited_once()
+
+    # A reroll view carries its own snapshot in case the cog's copy was evicted
+    history = cog.context_snapshots[message.id]
+    cog.context_snapshots.clear()
+    view = RerollView(cog, message, "reply", history)
+    cog.remember_history(message, view.history)
+    assert (await cog.build_messages(message, "prompt"))[1:] == history
+
+@pytest.mark.asyncio
+async def test_stream_reply_edits_live_message():
+    cog = BaseCog(MagicMock(), "TestCog", "TestNickname", ["trigger"], "test_model")
+    cog.send_reply = AsyncMock()
+    message = MagicMock(id=1)
+    live = MagicMock()
+    editor = AsyncMock()
+    view = MagicMock()
+
+    async def chunks():
+        for chunk in ("Hel", "lo"):
+            yield chunk
+
+    response, sent = await cog.stream_reply(message, chunks(), live_message=live, editor=editor, view=view)
+
+    assert response == "Hello"
+    assert sent == []
+    cog.send_reply.assert_not_called()
+    # The rerolled message drops any attachment or embed of the earlier response
+    editor.assert_awaited_with(live, "[TestCog] Hello", view, attachments=[], embed=None)
+    assert view.original_response == "Hello"
+
+@pytest.mark.asyncio
+async def test_long_stream_reply_becomes_attachment():
+    cog = BaseCog(MagicMock(), "TestCog", "TestNickname", ["trigger"], "test_model")
+    sent = []
+
+    async def send_reply(message, content, view=None):
+        reply = MagicMock(id=len(sent) + 10)
+        reply.edit = AsyncMock()
+        sent.append(reply)
+        return reply
+
+    cog.send_reply = send_reply
+    message = MagicMock(id=1)
+    view = MagicMock()
+
+    async def chunks():
+        for i in range(60):
+            yield f"Paragraph {i} " + "words " * 30 + "\n\n"
+
+    with patch('cogs.base_cog.output_strategy', OutputStrategy(ATTACHMENT, max_parts=2)):
+        response, messages = await cog.stream_reply(message, chunks(), view=view)
+
+    assert len(response) > 10000
+    assert len(messages) == 2  # nothing is posted past the part limit
+    kwargs = messages[-1].edit.await_args.kwargs
+    assert kwargs['content'].endswith("Full response attached.*")
+    assert kwargs['attachments'][0].filename == "testcog_response.txt"
+
+@pytest.mark.asyncio
+async def test_newer_reroll_cancels_streaming_one():
+    cog = BaseCog(MagicMock(), "TestCog", "TestNickname", ["trigger"], "test_model")
+    cog.generate_response = AsyncMock(return_value=MagicMock())
+    started = asyncio.Event()
+    calls = []
+
+    async def stream_reply(*args, **kwargs):
+        calls.append(kwargs['live_message'])
+        if len(calls) == 1:
+            started.set()
+            await asyncio.sleep(10)
+        return "second", []
+
+    cog.stream_reply = AsyncMock(side_effect=stream_reply)
+    message = MagicMock()
+    message.add_reaction = AsyncMock()
+    view = RerollView(cog, message, "original")
+    interaction = MagicMock()
+    interaction.response.defer = AsyncMock()
+    interaction.followup.send = AsyncMock()
+
+    first = asyncio.create_task(view.reroll.callback(interaction))
+    await started.wait()
+    await view.reroll.callback(interaction)
+
+    assert first.cancelled()
+    assert calls == [interaction.message, interaction.message]
+    assert view.generation is None
+    interaction.followup.send.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_handle_message_returns_result():
+    cog = BaseCog(MagicMock(), "TestCog", "TestNickname", ["trigger"], "test_model")
+    cog.context_cog = None
+    cog.start_typing = AsyncMock()
+    cog.generate_response = AsyncMock(return_value=object())
+    cog.stream_reply = AsyncMock(return_value=("I'm so happy!", [MagicMock(id=7), MagicMock(id=8)]))
+    message = MagicMock(id=1, guild=None)
+
+    with patch('cogs.base_cog.side_effects') as queue:
+        result = await cog.handle_message(message)
+
+    assert result.ok and result.cog == "TestCog"
+    assert result.text == "I'm so happy!"
+    assert result.message_ids == [7, 8]
+    assert result.emotion == '😄'
+    assert list(result.timings) == ['request', 'stream']
+    queue.submit.assert_called_once()
+
+    cog.generate_response = AsyncMock(side_effect=Exception("boom"))
+    message.reply = AsyncMock()
+    result = await cog.handle_message(message)
+    assert not result.ok and result.error == "boom"
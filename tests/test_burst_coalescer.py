@@ -0,0 +1,192 @@
+import pytest
+import asyncio
+from unittest.mock import MagicMock, AsyncMock
+from shared.burst_coalescer import BurstCoalescer, MAX_MESSAGES
+from shared.dispatcher import Route
+
+def make_message(message_id, content, author_id=1, channel_id=100):
+    message = MagicMock()
+    message.id = message_id
+    message.content = content
+    message.author = MagicMock(id=author_id, display_name=f"user{author_id}")
+    message.channel = MagicMock(id=channel_id)
+    return message
+
+@pytest.mark.asyncio
+async def test_burst_is_merged_into_one_turn():
+    coalescer = BurstCoalescer(window=0.05, max_hold=1)
+    router = Route(MagicMock(), Route.ROUTER)
+    handler = AsyncMock()
+
+    messages = [make_message(i, text) for i, text in enumerate(["hey", "quick question", "how do magnets work"])]
+    for message in messages:
+        coalescer.add(message, router, handler)
+        await asyncio.sleep(0.01)
+    await asyncio.sleep(0.15)
+
+    handler.assert_awaited_once()
+    route, message = handler.await_args.args
+    assert message is messages[-1] and message.content == "how do magnets work"  # left as it is
+    assert route.cog is router.cog and route.reason == Route.ROUTER
+    assert route.content == "hey\nquick question\nhow do magnets work"
+    assert route.burst_ids == {"0", "1", "2"}
+    assert coalescer.stats == {'bursts': 1, 'merged': 2, 'llm_calls_saved': 4}
+    assert coalescer.pending() == 0
+
+@pytest.mark.asyncio
+async def test_trigger_route_wins_and_users_are_separate():
+    coalescer = BurstCoalescer(window=0.05, max_hold=1)
+    router = Route(MagicMock(), Route.ROUTER)
+    grok = Route(MagicMock(), Route.TRIGGER, 'grok')
+    handler = AsyncMock()
+
+    coalescer.add(make_message(1, "grok"), grok, handler)
+    coalescer.add(make_message(2, "you there?"), router, handler)
+    coalescer.add(make_message(3, "unrelated", author_id=2), router, handler)
+    await asyncio.sleep(0.15)
+
+    assert handler.await_count == 2
+    routes = {call.args[0].cog: call.args[0] for call in handler.await_args_list}
+    assert routes[grok.cog].trigger == 'grok' and routes[grok.cog].content == "grok\nyou there?"
+    assert routes[router.cog] is router  # a single message keeps its own route
+    assert coalescer.stats['llm_calls_saved'] == 2
+
+@pytest.mark.asyncio
+async def test_channel_scope_labels_authors():
+    coalescer = BurstCoalescer(window=0.05, max_hold=1, scope='channel')
+    router = Route(MagicMock(), Route.ROUTER)
+    handler = AsyncMock()
+
+    first, second = make_message(1, "hi"), make_message(2, "hello", author_id=2)
+    coalescer.add(first, router, handler)
+    coalescer.add(second, router, handler)
+    await asyncio.sleep(0.15)
+
+    route, message = handler.await_args.args
+    assert message is second and second.content == "hello"
+    assert route.content == "user1: hi\nuser2: hello"
+
+@pytest.mark.asyncio
+async def test_long_bursts_and_max_hold_flush_early():
+    coalescer = BurstCoalescer(window=10, max_hold=0.05)
+    router = Route(MagicMock(), Route.ROUTER)
+    handler = AsyncMock()
+
+    for i in range(MAX_MESSAGES):
+        coalescer.add(make_message(i, f"line {i}"), router, handler)
+    await asyncio.sleep(0)
+    await asyncio.sleep(0)
+    assert handler.await_count == 1
+
+    coalescer.add(make_message(99, "again"), router, handler)
+    await asyncio.sleep(0.1)  # the window is long but max_hold ends the burst
+    assert handler.await_count == 2
+
+@pytest.mark.asyncio
+async def test_close_answers_held_bursts():
+    coalescer = BurstCoalescer(window=10, max_hold=10)
+    router = Route(MagicMock(), Route.ROUTER)
+    handler = AsyncMock()
+
+    first, second = make_message(1, "still"), make_message(2, "typing")
+    coalescer.add(first, router, handler)
+    coalescer.add(second, router, handler)
+    await coalescer.close()
+
+    route, message = handler.await_args.args
+    assert message is second and route.content == "still\ntyping"
+    assert coalescer.pending() == 0 and coalescer.stats['bursts'] == 1
+
+@pytest.mark.asyncio
+async def test_dispatcher_holds_only_ambient_channel_messages():
+    from shared.dispatcher import MessageDispatcher
+    from unittest.mock import patch
+
+    bot = MagicMock()
+    bot.user = MagicMock(id=12345)
+    router_cog = MagicMock()
+    router_cog.route_message = AsyncMock()
+    router_cog._mentions_other_bot = MagicMock(return_value=False)
+    bot.cogs = {'RouterCog': router_cog}
+    bot.get_cog.side_effect = lambda name: bot.cogs.get(name)
+    coalescer = BurstCoalescer(window=0.05, max_hold=1)
+    dispatcher = MessageDispatcher(bot, coalescer=coalescer)
+
+    with patch('shared.dispatcher.access_control') as acl:
+        acl.is_banned.return_value = False
+        acl.is_channel_active.return_value = True
+        ambient = [make_message(i, "msg") for i in range(2)]
+        for message in ambient:
+            message.author.bot = False
+            message.mentions = []
+            await dispatcher.dispatch(message)
+        router_cog.route_message.assert_not_awaited()
+
+        mention = make_message(10, "hey bot", author_id=3)
+        mention.author.bot = False
+        mention.mentions = [bot.user]
+        await dispatcher.dispatch(mention)
+        router_cog.route_message.assert_awaited_once_with(mention)
+
+        await asyncio.sleep(0.15)
+        assert router_cog.route_message.await_count == 2
+
+@pytest.mark.asyncio
+async def test_burst_lines_are_assembled_once(tmp_path):
+    from datetime import datetime
+    from unittest.mock import patch
+    from cogs.context_cog import ContextCog
+    from shared import migrations
+    from shared.context_assembler import ContextAssembler
+    from shared.dispatcher import MessageDispatcher
+
+    path = str(tmp_path / "burst.db")
+    migrations._migrated.clear()
+    migrations.migrate(path)
+    cog = ContextCog.__new__(ContextCog)
+    cog.bot = MagicMock()
+    cog.last_messages = {}
+    cog.db_path = path
+    cog.summarizer.threshold = 0
+
+    lines = ["my deploy broke", "the staging deploy", "what do I check first"]
+    messages = [make_message(i + 1, text) for i, text in enumerate(lines)]
+    for message in messages:
+        # What ContextCog.on_message stores for each message as it arrives
+        cog.store.append({
+            'id': str(message.id), 'channel_id': "100", 'guild_id': "1", 'user_id': "1", 'content': message.content,
+            'is_assistant': False, 'persona_name': None, 'emotion': None, 'timestamp': datetime.now().isoformat(),
+        })
+    await cog.store.flush()
+
+    assembled = []
+    router_cog = MagicMock()
+    router_cog._mentions_other_bot = MagicMock(return_value=False)
+
+    async def route_message(message, full_content=None):
+        assembled.append(await assembler.assemble(cog, message))
+    router_cog.route_message = route_message
+    bot = MagicMock()
+    bot.cogs = {'RouterCog': router_cog}
+    bot.get_cog.side_effect = lambda name: bot.cogs.get(name)
+    assembler = ContextAssembler()
+    dispatcher = MessageDispatcher(bot, coalescer=BurstCoalescer(window=0.05, max_hold=1))
+
+    try:
+        with patch('shared.dispatcher.access_control') as acl, patch('shared.dispatcher.context_assembler', assembler):
+            acl.is_banned.return_value = False
+            acl.is_channel_active.return_value = True
+            for message in messages:
+                message.author.bot = False
+                message.mentions = []
+                await dispatcher.dispatch(message)
+            await asyncio.sleep(0.15)
+    finally:
+        await cog.store.close()
+        await cog.search.close()
+
+    assert len(assembled) == 1
+    text = "\n".join(m['content'] for m in assembled[0])
+    for line in lines:
+        assert text.count(line) == 1
+    assert assembled[0][-1] == {'role': 'user', 'content': "\n".join(lines)}
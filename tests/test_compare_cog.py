@@ -0,0 +1,79 @@
+import pytest
+import asyncio
+from unittest.mock import MagicMock, AsyncMock
+from cogs.compare_cog import CompareCog
+from cogs.base_cog import BaseCog
+from shared.reply_result import ReplyResult
+
+def make_persona(name, delay=0.05):
+    cog = MagicMock()
+    cog.name = name
+
+    async def handle_message(message):
+        result = ReplyResult(name)
+        await asyncio.sleep(delay)
+        result.text = f"{name} says hi"
+        result.lap('stream')
+        return result
+
+    cog.handle_message = AsyncMock(side_effect=handle_message)
+    return cog
+
+@pytest.fixture
+def bot():
+    bot = MagicMock()
+    bot.cogs = {f"{name}Cog": make_persona(name) for name in ("Grok", "Claude3Haiku", "GPT4O")}
+    return bot
+
+def test_find_personas(bot):
+    cog = CompareCog(bot)
+    found, unknown = cog._find_personas("grok, gpt4o grok nope")
+    assert [c.name for c in found] == ["Grok", "GPT4O"]
+    assert unknown == ["nope"]
+
+@pytest.mark.asyncio
+async def test_fan_out_runs_personas_concurrently(bot):
+    cog = CompareCog(bot)
+    message = MagicMock(content="Why is the sky blue?")
+    message.guild.id = 1
+    message.author.id = 2
+
+    results, wall, sequential = await cog.fan_out(message, list(bot.cogs.values()))
+
+    assert [r.text for r in results] == ["Grok says hi", "Claude3Haiku says hi", "GPT4O says hi"]
+    assert sequential >= 0.15
+    assert wall < sequential
+    assert cog.recent_runs[-1][0] == ["Grok", "Claude3Haiku", "GPT4O"]
+
+@pytest.mark.asyncio
+async def test_compare_command_validates_personas(bot):
+    cog = CompareCog(bot)
+    ctx = MagicMock()
+    ctx.reply = AsyncMock()
+
+    await cog.compare.callback(cog, ctx, "grok", question="hi")
+    assert "between 2" in ctx.reply.await_args.args[0]
+
+    await cog.compare.callback(cog, ctx, "grok,bard", question="hi")
+    assert "bard" in ctx.reply.await_args.args[0]
+
+@pytest.mark.asyncio
+async def test_concurrent_personas_share_one_history_fetch():
+    bot = MagicMock()
+    personas = [BaseCog(bot, name, name, [], "model") for name in ("Grok", "GPT4O", "Hermes")]
+    context_cog = MagicMock()
+
+    async def fetch(channel_id, **kwargs):
+        await asyncio.sleep(0.01)
+        return [{'content': 'earlier'}]
+
+    context_cog.get_context_messages = AsyncMock(side_effect=fetch)
+    for persona in personas:
+        persona.context_cog = context_cog
+    message = MagicMock(id=5, content="hi")
+
+    histories = await asyncio.gather(*(persona.build_messages(message, persona.name) for persona in personas))
+
+    assert [[m['content'] for m in history] for history in histories] == [
+        [persona.name, 'earlier', 'hi'] for persona in personas]
+    context_cog.get_context_messages.assert_awaited_once()
@@ -0,0 +1,85 @@
+import copy
+import json
+import pytest
+import asyncio
+from unittest.mock import ANY, AsyncMock, MagicMock
+from shared.context_assembler import AssembledMessages, ContextAssembler, FrozenMessage
+
+def message(message_id=1, content="what now?"):
+    return MagicMock(id=message_id, content=content, channel=MagicMock(id=100))
+
+def context_cog(rows):
+    cog = MagicMock()
+    cog.get_context_messages = AsyncMock(return_value=rows)
+    return cog
+
+@pytest.mark.asyncio
+async def test_rows_become_roles_and_the_message_comes_last():
+    cog = context_cog([
+        {'user_id': 'SYSTEM', 'content': '[SUMMARY] Alice asked about Postgres', 'is_assistant': False},
+        {'user_id': '42', 'content': 'Alice: hello', 'is_assistant': False},
+        {'user_id': '7', 'content': 'Hi Alice', 'is_assistant': True},
+    ])
+    messages = await ContextAssembler().assemble(cog, message(), limit=20, model_id="infermatic/x")
+
+    assert list(messages) == [
+        {'role': 'system', 'content': 'Alice asked about Postgres'},
+        {'role': 'user', 'content': 'Alice: hello'},
+        {'role': 'assistant', 'content': 'Hi Alice'},
+        {'role': 'user', 'content': 'what now?'},
+    ]
+    cog.get_context_messages.assert_awaited_once_with(
+        "100", limit=20, exclude_message_id="1", query="what now?", policy=ANY, model_id="infermatic/x")
+    with pytest.raises(TypeError):
+        messages[0]['content'] = "changed"
+    # Copies are ordinary enough for the API client and request logs
+    assert json.loads(json.dumps(messages.with_system("prompt")))[0] == {'role': 'system', 'content': 'prompt'}
+    assert copy.deepcopy(messages) == messages
+
+@pytest.mark.asyncio
+async def test_callers_share_one_build_until_it_expires():
+    assembler = ContextAssembler(ttl=30)
+    cog = context_cog([])
+
+    async def slow(channel_id, **kwargs):
+        await asyncio.sleep(0.01)
+        return [{'user_id': '42', 'content': 'Alice: hello'}]
+
+    cog.get_context_messages.side_effect = slow
+    first, second = await asyncio.gather(assembler.assemble(cog, message(), now=0),
+                                         assembler.assemble(cog, message(), now=1))
+    assert first is second
+    assert await assembler.assemble(cog, message(content="edited"), now=2) is not first
+    assert await assembler.assemble(cog, message(), now=31) is not first
+    assert assembler.stats == {'assembled': 3, 'reused': 1, 'failures': 0}
+
+@pytest.mark.asyncio
+async def test_a_failed_fetch_is_retried_by_the_next_caller():
+    assembler = ContextAssembler()
+    cog = context_cog([])
+    cog.get_context_messages.side_effect = [RuntimeError("locked"), []]
+
+    with pytest.raises(RuntimeError):
+        await assembler.assemble(cog, message())
+    assert list(await assembler.assemble(cog, message())) == [{'role': 'user', 'content': 'what now?'}]
+    assert assembler.stats['failures'] == 1
+
+@pytest.mark.asyncio
+async def test_api_sends_assembled_messages_without_validating_them_again():
+    from shared.api import API
+    api = object.__new__(API)  # not the shared instance
+    api.session = object()
+    api._validate_message_roles = AsyncMock()
+    api._enforce_rate_limit = AsyncMock()
+    api.response_budget = MagicMock()
+    api.response_budget.suggest.return_value = {'max_tokens': 100, 'stop': None}
+    api.openpipe_client = MagicMock()
+    api.openpipe_client.chat.completions.create = AsyncMock(side_effect=RuntimeError("offline"))
+    api.report = AsyncMock()
+    messages = AssembledMessages([FrozenMessage(role="user", content="hi")]).with_system("prompt")
+
+    with pytest.raises(Exception, match="offline"):
+        await api.call_openpipe(messages=messages, model="m")
+
+    api._validate_message_roles.assert_not_awaited()
+    assert api.openpipe_client.chat.completions.create.call_args.kwargs['messages'] == list(messages)
@@ -0,0 +1,102 @@
+import json
+import sqlite3
+import pytest
+from datetime import datetime, timedelta
+from shared import migrations
+from shared.context_policy import ContextPolicies, ContextPolicy
+from shared.context_store import ContextStore
+from shared.persistence import MessageWriter
+from shared.retrieval import HistorySearch
+
+@pytest.fixture
+def settings(tmp_path):
+    path = tmp_path / "context_settings.json"
+
+    def write(values):
+        path.write_text(json.dumps(values))
+        return str(path)
+    return write
+
+def test_settings_are_layered_by_guild_channel_and_persona(settings):
+    windows = {"200": 30}
+    policies = ContextPolicies(settings({
+        "max_history_messages": 10, "context_window_minutes": 30, "include_system_messages": False,
+        "guilds": {"1": {"include_bot_messages": False}},
+        "channels": {"300": {"context_window_minutes": 0}},
+        "personas": {"magnum": {"max_history_messages": 6}, "grok": {"max_history_messages": 40}},
+    }), windows)
+
+    assert policies.resolve("1", "100") == ContextPolicy(10, 30, True, False, False)
+    assert policies.resolve("2", "200").max_messages == 30  # /setcontext
+    assert policies.resolve("2", "200", "Magnum").max_messages == 6
+    assert policies.resolve("2", "200", "Grok").max_messages == 30  # a persona only lowers the count
+    assert policies.resolve("2", "300").window_minutes == 0
+
+def test_policies_are_cached_until_settings_change(settings):
+    windows = {}
+    path = settings({"max_history_messages": 10})
+    policies = ContextPolicies(path, windows)
+    assert policies.resolve("1", "100", now=0).max_messages == 10
+    assert policies.resolve("1", "100", now=1).max_messages == 10
+    assert policies.stats['hits'] == 1
+
+    windows["100"] = 25
+    assert policies.resolve("1", "100", now=2).max_messages == 10  # cached until invalidated
+    policies.invalidate("100")
+    assert policies.resolve("1", "100", now=3).max_messages == 25
+
+    settings({"max_history_messages": 10, "include_bot_messages": False, "padding": "x"})
+    assert policies.resolve("1", "100", now=100).include_bot is False
+    assert policies.stats['reloads'] == 2
+
+def test_sql_condition_matches_allows():
+    rows = [(user_id, is_assistant) for user_id in ("42", "SYSTEM") for is_assistant in (0, 1)]
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE messages (user_id TEXT, is_assistant BOOLEAN)")
+    conn.executemany("INSERT INTO messages VALUES (?, ?)", rows)
+    for flags in [(u, b, s) for u in (True, False) for b in (True, False) for s in (True, False)]:
+        policy = ContextPolicy(10, 0, *flags)
+        selected = conn.execute(f"SELECT user_id, is_assistant FROM messages WHERE 1{policy.sql()}").fetchall()
+        assert selected == [r for r in rows if policy.allows({'user_id': r[0], 'is_assistant': r[1]})]
+
+@pytest.mark.asyncio
+async def test_policy_is_applied_in_the_ring_and_the_search(tmp_path):
+    path = str(tmp_path / "policy.db")
+    migrations._migrated.clear()
+    migrations.migrate(path)
+    store = ContextStore(path, writer=MessageWriter(path, flush_delay=60))
+    now = datetime.now()
+    for i, (minutes_ago, is_assistant) in enumerate([(90, False), (20, True), (10, False), (5, True)]):
+        store.append({
+            'id': str(i), 'channel_id': "100", 'guild_id': "1", 'user_id': "7" if is_assistant else "42",
+            'content': f"pasta recipe {i}", 'is_assistant': is_assistant, 'persona_name': None, 'emotion': None,
+            'timestamp': (now - timedelta(minutes=minutes_ago)).isoformat(),
+        })
+    await store.flush()
+
+    policy = ContextPolicy(max_messages=10, window_minutes=30, include_bot=False)
+    assert [r['id'] for r in await store.recent("100", 10, policy=policy)] == ["2"]
+    assert [r['id'] for r in await store.recent("100", 10)] == ["3", "2", "1", "0"]
+    search = HistorySearch(path)
+    found = await search.search("100", "pasta", policy=policy)
+    assert sorted(r['id'] for r in found) == ["0", "2"]  # older matches, but no bot replies
+    await search.close()
+    await store.close()
+
+@pytest.mark.asyncio
+async def test_default_policy_uses_the_channel_guild(settings, monkeypatch):
+    from unittest.mock import AsyncMock, MagicMock
+    from cogs.context_cog import ContextCog
+    policies = ContextPolicies(settings({"max_history_messages": 30, "guilds": {"1": {"max_history_messages": 5}}}), {})
+    monkeypatch.setattr("cogs.context_cog.context_policies", policies)
+    cog = ContextCog.__new__(ContextCog)
+    cog.bot = MagicMock()
+    cog.bot.get_channel.return_value.guild.id = 1
+    cog.store = MagicMock()
+    cog.store.recent = AsyncMock(return_value=[])
+    cog.summarizer = MagicMock(enabled=False)
+
+    assert await cog.get_context_messages("100") == []
+
+    cog.bot.get_channel.assert_called_once_with(100)
+    assert cog.store.recent.call_args.args[1] == 5
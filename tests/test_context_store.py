@@ -0,0 +1,94 @@
+import pytest
+import sqlite3
+from unittest.mock import patch
+from shared.context_store import ContextStore, ROW_OVERHEAD
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "context.db")
+    with sqlite3.connect(path) as conn:
+        with open('databases/schema.sql', 'r') as f:
+            conn.executescript(f.read())
+    return path
+
+def row(message_id, content, channel_id="100", timestamp=None):
+    return {
+        'id': str(message_id),
+        'channel_id': channel_id,
+        'guild_id': "1",
+        'user_id': "42",
+        'content': content,
+        'is_assistant': False,
+        'persona_name': None,
+        'emotion': None,
+        'timestamp': timestamp or f"2024-01-01T00:00:{message_id:02d}",
+    }
+
+@pytest.mark.asyncio
+async def test_hot_channel_reads_skip_the_database(db_path):
+    store = ContextStore(db_path, flush_delay=60)
+    assert await store.recent("100", 10) == []  # the one lazy load
+    for i in range(3):
+        store.append(row(i, f"message {i}"))
+    store.append(row(2, "message 2, edited"))
+
+    with patch('shared.context_store.aiosqlite.connect', side_effect=AssertionError("database read")):
+        rows = await store.recent("100", 10, exclude_id="0")
+
+    assert [r['content'] for r in rows] == ["message 2, edited", "message 1"]
+    assert store.stats['loads'] == 1 and store.stats['hits'] == 1
+    await store.close()
+
+@pytest.mark.asyncio
+async def test_writes_are_persisted_behind(db_path):
+    store = ContextStore(db_path, flush_delay=60)
+    for i in range(3):
+        store.append(row(i, f"message {i}"))
+    with sqlite3.connect(db_path) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM messages").fetchone()[0] == 0
+
+    await store.close()
+
+    with sqlite3.connect(db_path) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM messages").fetchone()[0] == 3
+    # A cold store loads the channel lazily, unflushed rows included
+    fresh = ContextStore(db_path, flush_delay=60)
+    fresh.append(row(3, "message 3"))
+    rows = await fresh.recent("100", 2)
+    assert [r['content'] for r in rows] == ["message 3", "message 2"]
+    await fresh.close()
+
+@pytest.mark.asyncio
+async def test_least_recently_used_channels_are_evicted(db_path):
+    store = ContextStore(db_path, memory_budget=3 * (ROW_OVERHEAD + 10), flush_delay=60)
+    for channel in ("a", "b", "c"):
+        await store.recent(channel, 10)
+        store.append(row(ord(channel), "x" * 10, channel_id=channel))
+
+    assert list(store._rings) == ["a", "b", "c"]
+    await store.recent("a", 10)  # a is now the most recently used
+    store.append(row(200, "y" * 10, channel_id="c"))
+
+    assert list(store._rings) == ["a", "c"]
+    assert store.stats['evictions'] == 1
+    await store.close()
+    # The evicted channel's rows are still in the database
+    assert [r['id'] for r in await store.recent("b", 10)] == [str(ord("b"))]
+
+@pytest.mark.asyncio
+async def test_clear_drops_memory_pending_and_database_rows(db_path):
+    store = ContextStore(db_path, flush_delay=60)
+    await store.recent("100", 10)
+    store.append(row(1, "old"))
+    await store.flush()
+    store.append(row(2, "new"))
+    store.append(row(3, "newest"))
+
+    await store.clear("100", before="2024-01-01T00:00:03")
+    assert [r['content'] for r in await store.recent("100", 10)] == ["newest"]
+
+    await store.clear("100")
+    await store.close()
+    assert await store.recent("100", 10) == []
+    with sqlite3.connect(db_path) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM messages").fetchone()[0] == 0
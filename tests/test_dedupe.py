@@ -0,0 +1,42 @@
+from shared.dedupe import MessageDedupe, snowflake_time, DISCORD_EPOCH_MS
+
+def snowflake_at(unix_seconds):
+    return (int(unix_seconds * 1000) - DISCORD_EPOCH_MS) << 22
+
+def test_duplicates_are_suppressed_and_counted():
+    dedupe = MessageDedupe()
+    assert dedupe.check(1, now=1000.0)
+    assert not dedupe.check(1, now=1001.0)
+    assert dedupe.check(2, now=1001.0)
+    assert dedupe.stats['accepted'] == 2
+    assert dedupe.stats['duplicates'] == 1
+
+def test_entries_expire_after_ttl():
+    dedupe = MessageDedupe(ttl=60)
+    dedupe.check(1, now=1000.0)
+    dedupe.check(2, now=1030.0)
+
+    assert dedupe.check(3, now=1061.0)
+    assert 1 not in dedupe and 2 in dedupe
+    assert dedupe.stats['expired'] == 1
+
+def test_capacity_is_fixed_and_oldest_evicted_first():
+    dedupe = MessageDedupe(capacity=3)
+    for message_id in range(5):
+        dedupe.check(message_id, now=1000.0)
+
+    assert len(dedupe) == 3
+    assert [i in dedupe for i in range(5)] == [False, False, True, True, True]
+    assert dedupe.stats['evicted'] == 2
+
+def test_old_snowflakes_are_rejected_after_their_entry_is_gone():
+    now = 1700000000.0
+    dedupe = MessageDedupe(ttl=600)
+    recent = snowflake_at(now - 5)
+    old = snowflake_at(now - 3600)
+
+    assert abs(snowflake_time(recent) - (now - 5)) < 0.01
+    assert dedupe.check(recent, now=now)
+    assert not dedupe.check(old, now=now)
+    assert dedupe.stats['stale'] == 1
+    assert snowflake_time(12345) is None  # not a snowflake, no age check
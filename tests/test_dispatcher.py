@@ -0,0 +1,96 @@
+import pytest
+from unittest.mock import MagicMock, AsyncMock, patch
+import discord
+from shared.dispatcher import MessageDispatcher, Route
+
+def make_cog(name, trigger_words):
+    cog = MagicMock()
+    cog.name = name
+    cog.trigger_words = trigger_words
+    cog.handle_message = AsyncMock()
+    cog.route_message = AsyncMock()
+    cog._mentions_other_bot = MagicMock(return_value=False)
+    return cog
+
+@pytest.fixture
+def bot():
+    bot = MagicMock()
+    bot.user = MagicMock(id=12345)
+    router = make_cog("Router", [])
+    grok = make_cog("Grok", ["grok", "x.ai"])
+    bot.cogs = {'RouterCog': router, 'GrokCog': grok}
+    bot.get_cog.side_effect = lambda name: bot.cogs.get(name)
+    return bot
+
+@pytest.fixture
+def message():
+    message = MagicMock()
+    message.id = 1
+    message.content = "hello there"
+    message.author = MagicMock(bot=False, id=67890)
+    message.mentions = []
+    message.channel = MagicMock(id=100)
+    message.guild = MagicMock(id=1)
+    return message
+
+@pytest.fixture
+def acl():
+    with patch('shared.dispatcher.access_control') as acl:
+        acl.is_banned.return_value = False
+        acl.is_channel_active.return_value = True
+        yield acl
+
+@pytest.mark.asyncio
+async def test_trigger_goes_to_exactly_one_cog(bot, message, acl):
+    message.content = "Hey GROK, what's up?"
+    route = await MessageDispatcher(bot).dispatch(message)
+
+    assert route.reason == Route.TRIGGER and route.trigger == "grok"
+    bot.cogs['GrokCog'].handle_message.assert_awaited_once_with(message)
+    bot.cogs['RouterCog'].route_message.assert_not_awaited()
+
+@pytest.mark.asyncio
+async def test_untriggered_message_goes_to_router_once(bot, message, acl):
+    dispatcher = MessageDispatcher(bot)
+    await dispatcher.dispatch(message)
+    await dispatcher.dispatch(message)  # duplicate delivery
+
+    bot.cogs['RouterCog'].route_message.assert_awaited_once_with(message)
+    assert dispatcher.stats == {'dispatched': 1, 'dropped': 1}
+
+@pytest.mark.asyncio
+async def test_gating(bot, message, acl):
+    dispatcher = MessageDispatcher(bot)
+
+    acl.is_banned.return_value = True
+    assert dispatcher.resolve(message) is None
+
+    acl.is_banned.return_value = False
+    acl.is_channel_active.return_value = False
+    message.id = 2
+    message.content = "grok?"
+    assert dispatcher.resolve(message) is None
+
+    # A mention still reaches the router outside activated channels
+    message.id = 3
+    message.mentions = [bot.user]
+    assert dispatcher.resolve(message).reason == Route.ROUTER
+
+    message.id = 4
+    message.author.bot = True
+    assert dispatcher.resolve(message) is None
+
+@pytest.mark.asyncio
+async def test_dm_skips_activation_check(bot, message, acl):
+    acl.is_channel_active.return_value = False
+    message.channel = MagicMock(spec=discord.DMChannel)
+    message.guild = None
+    assert MessageDispatcher(bot).resolve(message).reason == Route.ROUTER
+
+def test_trigger_table_rebuilds_after_invalidate(bot):
+    dispatcher = MessageDispatcher(bot)
+    assert dispatcher.find_trigger("ask claude") is None
+
+    bot.cogs['ClaudeCog'] = make_cog("Claude", ["claude"])
+    dispatcher.invalidate()
+    assert dispatcher.find_trigger("ask claude").cog is bot.cogs['ClaudeCog']
@@ -0,0 +1,74 @@
+import time
+import asyncio
+import pytest
+from unittest.mock import MagicMock, AsyncMock
+from shared.edit_scheduler import EditScheduler
+
+@pytest.fixture
+def scheduler():
+    # Short window so the tests run quickly: 5 edits per 0.1s
+    return EditScheduler(limit=5, per=0.1, min_interval=0.02)
+
+@pytest.fixture
+def mock_message():
+    message = MagicMock()
+    message.id = 1
+    message.edit = AsyncMock()
+    return message
+
+@pytest.mark.asyncio
+async def test_updates_are_coalesced(scheduler, mock_message):
+    stream = scheduler.open_stream(123)
+    for i in range(50):
+        stream.update(mock_message, f"text {i}")
+    await asyncio.sleep(0.1)
+    await stream.close()
+
+    # Only the latest text is sent, once
+    mock_message.edit.assert_awaited_once_with(content="text 49")
+    assert scheduler.stats['coalesced'] == 49
+
+@pytest.mark.asyncio
+async def test_flush_sends_final_state_immediately(scheduler, mock_message):
+    stream = scheduler.open_stream(123)
+    stream.update(mock_message, "partial")
+    view = MagicMock()
+    await stream.flush(mock_message, "final", view=view)
+    await stream.close()
+
+    mock_message.edit.assert_awaited_once_with(content="final", view=view)
+    # The bucket remembers the edit until it leaves the window
+    assert scheduler.buckets['123'].streams == 0
+
+@pytest.mark.asyncio
+async def test_mid_stream_flush_waits_for_bucket_slot(scheduler, mock_message):
+    stream = scheduler.open_stream(123)
+    loop = asyncio.get_running_loop()
+    for i in range(5):
+        stream.bucket.record(time.monotonic())
+
+    # A full bucket doesn't hold back the final state...
+    start = loop.time()
+    await stream.flush(mock_message, "final")
+    assert loop.time() - start < 0.05
+
+    # ...but a message sealed mid-stream waits until an edit leaves the window
+    start = loop.time()
+    await stream.flush(mock_message, "sealed", wait=True)
+    assert loop.time() - start >= 0.05
+    await stream.close()
+
+    assert mock_message.edit.await_count == 2
+
+@pytest.mark.asyncio
+async def test_streams_share_channel_bucket(scheduler):
+    first = scheduler.open_stream(123)
+    second = scheduler.open_stream(123)
+    other = scheduler.open_stream(456)
+
+    assert first.bucket is second.bucket
+    assert scheduler.interval_for(first.bucket) == pytest.approx(2 * scheduler.interval_for(other.bucket))
+
+    for stream in (first, second, other):
+        await stream.close()
+    assert scheduler.buckets == {}
@@ -0,0 +1,89 @@
+import pytest
+import asyncio
+from shared.generation_scheduler import GenerationScheduler, INTERACTIVE, AMBIENT
+
+async def run_all(scheduler, requests):
+    """Start every (guild, user, priority) generation while the single slot is held; return serve order"""
+    order = []
+    gate = asyncio.Event()
+
+    async def generate(label, guild, user, priority):
+        async with scheduler.admit(guild, user, priority):
+            order.append(label)
+            await gate.wait()
+
+    blocker = scheduler.admit(0, 0, AMBIENT)
+    await blocker.__aenter__()
+    tasks = [asyncio.create_task(generate(*request)) for request in requests]
+    await asyncio.sleep(0)
+    gate.set()
+    await blocker.__aexit__(None, None, None)
+    await asyncio.gather(*tasks)
+    return order
+
+@pytest.mark.asyncio
+async def test_concurrency_is_capped():
+    scheduler = GenerationScheduler(max_concurrent=2, max_queue=10)
+    running = []
+    peak = 0
+
+    async def generate(i):
+        nonlocal peak
+        async with scheduler.admit(1, i):
+            running.append(i)
+            peak = max(peak, len(running))
+            await asyncio.sleep(0.01)
+            running.remove(i)
+
+    await asyncio.gather(*(generate(i) for i in range(6)))
+
+    assert peak == 2
+    assert scheduler.active == 0 and scheduler.waiting == 0
+    assert scheduler.stats['queued'] == 4
+
+@pytest.mark.asyncio
+async def test_interactive_first_then_round_robin_across_guilds_and_users():
+    scheduler = GenerationScheduler(max_concurrent=1, max_queue=10)
+    order = await run_all(scheduler, [
+        ('a1', 1, 10, AMBIENT),
+        ('a2', 1, 10, AMBIENT),
+        ('a3', 1, 11, AMBIENT),
+        ('b1', 2, 20, AMBIENT),
+        ('dm', None, 30, INTERACTIVE),
+    ])
+
+    assert order == ['dm', 'a1', 'b1', 'a3', 'a2']
+
+@pytest.mark.asyncio
+async def test_ambient_is_shed_before_interactive():
+    scheduler = GenerationScheduler(max_concurrent=1, max_queue=1)
+    holder = scheduler.admit(1, 1)
+    await holder.__aenter__()
+    waiter = asyncio.create_task(scheduler.admit(1, 2).__aenter__())
+    await asyncio.sleep(0)
+
+    assert scheduler.admit(1, 3, AMBIENT) is None
+    assert scheduler.admit(1, 3, INTERACTIVE) is not None
+    assert scheduler.stats['shed'] == 1
+
+    waiter.cancel()
+    await asyncio.gather(waiter, return_exceptions=True)
+    assert scheduler.waiting == 0
+    await holder.__aexit__(None, None, None)
+    assert scheduler.active == 0
+
+@pytest.mark.asyncio
+async def test_wait_stats():
+    scheduler = GenerationScheduler(max_concurrent=1)
+    assert scheduler.wait_stats()['count'] == 0
+
+    async def generate(i):
+        async with scheduler.admit(1, i):
+            await asyncio.sleep(0.01)
+
+    await asyncio.gather(*(generate(i) for i in range(3)))
+    stats = scheduler.wait_stats()
+
+    assert stats['count'] == 3
+    assert stats['max'] >= 0.02
+    assert stats['max'] >= stats['p95'] >= stats['mean'] > 0
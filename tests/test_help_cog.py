@@ -58,14 +58,13 @@ async def test_set_system_prompt():
     
     cog = HelpCog(bot)
     
-    # Mock the file operations
-    with patch('builtins.open', create=True) as mock_open:
-        mock_open.return_value.__enter__.return_value.read.return_value = '{"system_prompts": {}}'
+    with patch('cogs.help_cog.prompt_store') as mock_store:
+        mock_store.set_override.return_value = True
         await cog.set_system_prompt.callback(cog, ctx, agent=agent, prompt=prompt)
         
-        # Verify the prompt was set
+        # Verify the prompt was stored as a persona-wide override
         ctx.send.assert_awaited_once_with(f"✅ System prompt updated for {agent}")
-        assert mock_agent_cog.raw_prompt == prompt
+        mock_store.set_override.assert_called_once_with(agent, prompt)
 
 @pytest.mark.asyncio
 async def test_reset_system_prompt():
@@ -77,19 +76,37 @@ async def test_reset_system_prompt():
     # Create a mock cog that will be "found" by the command
     mock_agent_cog = MagicMock()
     mock_agent_cog.name = agent
-    mock_agent_cog.default_prompt = "Default prompt"
     bot.cogs.values.return_value = [mock_agent_cog]
     
     cog = HelpCog(bot)
     
-    # Mock the file operations
-    with patch('builtins.open', create=True) as mock_open:
-        mock_open.return_value.__enter__.return_value.read.return_value = '{"system_prompts": {"testagent": "Custom prompt"}}'
+    with patch('cogs.help_cog.prompt_store') as mock_store:
+        mock_store.clear_override.return_value = True
         await cog.reset_system_prompt.callback(cog, ctx, agent=agent)
         
-        # Verify the prompt was reset
+        # Verify the override was removed
         ctx.send.assert_awaited_once_with(f"✅ System prompt reset to default for {agent}")
-        assert mock_agent_cog.raw_prompt == mock_agent_cog.default_prompt
+        mock_store.clear_override.assert_called_once_with(agent)
+
+@pytest.mark.asyncio
+async def test_set_channel_prompt():
+    bot = MagicMock()
+    ctx = MagicMock()
+    ctx.send = AsyncMock()
+    ctx.guild.id = 1
+    ctx.channel.id = 100
+    mock_agent_cog = MagicMock()
+    mock_agent_cog.name = "TestAgent"
+    bot.cogs.values.return_value = [mock_agent_cog]
+    
+    cog = HelpCog(bot)
+    
+    with patch('cogs.help_cog.prompt_store') as mock_store:
+        mock_store.set_override.return_value = True
+        await cog.set_channel_prompt.callback(cog, ctx, agent="testagent", prompt="Be brief")
+        
+        mock_store.set_override.assert_called_once_with("TestAgent", "Be brief", 1, 100)
+        ctx.send.assert_awaited_once_with("✅ System prompt for testagent updated in this channel")
 
 @pytest.mark.asyncio
 async def test_set_system_prompt_invalid_agent():
@@ -121,3 +138,26 @@ async def test_reset_system_prompt_invalid_agent():
     
     # Verify error message was sent
     ctx.send.assert_awaited_once_with(f"❌ Agent '{agent}' not found")
+
+@pytest.mark.asyncio
+async def test_hook_command_uses_reply_result():
+    from shared.reply_result import ReplyResult
+    bot = MagicMock()
+    result = ReplyResult("Grok")
+    result.text = "Hello from Grok"
+    router = MagicMock()
+    router.handle_message = AsyncMock(return_value=result)
+    webhooks = MagicMock()
+    webhooks.broadcast_to_webhooks = AsyncMock(return_value=True)
+    bot.get_cog.side_effect = lambda name: {'RouterCog': router, 'WebhookCog': webhooks}.get(name)
+    ctx = MagicMock()
+    ctx.message.add_reaction = AsyncMock()
+    ctx.channel.history = MagicMock()
+    cog = HelpCog(bot)
+
+    await cog.hook_command.callback(cog, ctx, content="hi grok")
+
+    assert router.handle_message.await_args.args[0].content == "hi grok"
+    webhooks.broadcast_to_webhooks.assert_awaited_once_with("[Grok] Hello from Grok")
+    ctx.message.add_reaction.assert_awaited_once_with('✅')
+    ctx.channel.history.assert_not_called()  # no Discord reads
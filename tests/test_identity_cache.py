@@ -0,0 +1,75 @@
+import pytest
+from unittest.mock import MagicMock, AsyncMock
+from shared.identity_cache import IdentityCache
+
+def user(user_id, name):
+    u = MagicMock()
+    u.id = user_id
+    u.display_name = name
+    return u
+
+def test_names_are_kept_per_guild():
+    cache = IdentityCache()
+    cache.remember(user(1, "Alice"), guild_id=10)
+    cache.remember(user(1, "Ali (nick)"), guild_id=20)
+
+    assert cache.get(1, 10) == "Alice"
+    assert cache.get("1", "20") == "Ali (nick)"
+    assert cache.get(1) is None
+    assert cache.stats['hits'] == 2 and cache.stats['misses'] == 1
+
+def test_entries_expire_and_are_bounded():
+    cache = IdentityCache(capacity=2, ttl=60)
+    cache.remember(user(1, "Alice"), now=0)
+    cache.remember(user(2, "Bob"), now=0)
+    assert cache.get(1, now=10) == "Alice"  # Bob is now the least recently used
+    cache.remember(user(3, "Carol"), now=10)
+
+    assert len(cache) == 2
+    assert cache.get(2, now=10) is None
+    assert cache.get(1, now=100) is None  # past the TTL
+    assert cache.get(3, now=69) == "Carol"
+
+    cache.forget(3)
+    assert cache.get(3, now=69) is None
+
+@pytest.mark.asyncio
+async def test_resolve_prefers_memory_then_gateway_and_rate_limits_rest():
+    cache = IdentityCache(fetch_interval=60)
+    bot = MagicMock()
+    bot.get_user = MagicMock(side_effect=lambda uid: user(uid, "Gateway") if uid == 2 else None)
+    bot.fetch_user = AsyncMock(side_effect=lambda uid: user(uid, f"Fetched {uid}"))
+    cache.remember(user(1, "Alice"))
+
+    assert await cache.resolve(bot, 1) == "Alice"
+    assert await cache.resolve(bot, 2) == "Gateway"
+    assert await cache.resolve(bot, 3) == "Fetched 3"
+    assert await cache.resolve(bot, 4) is None  # second REST call inside the interval
+    assert await cache.resolve(bot, 3) == "Fetched 3"  # remembered
+
+    bot.fetch_user.assert_awaited_once_with(3)
+    assert cache.stats['fetches'] == 1 and cache.stats['rate_limited'] == 1
+    assert cache.fetches_avoided == 4
+
+@pytest.mark.asyncio
+async def test_context_cog_names_authors_without_fetching(monkeypatch):
+    from cogs import context_cog
+    cache = IdentityCache()
+    monkeypatch.setattr(context_cog, 'identity_cache', cache)
+    bot = MagicMock()
+    bot.fetch_user = AsyncMock()
+    cog = context_cog.ContextCog.__new__(context_cog.ContextCog)
+    cog.bot = bot
+    cog.store = MagicMock()
+    cog.last_messages = {}
+
+    message = MagicMock()
+    message.content = "hello there"
+    message.guild.id = 10
+    message.channel.id = 100
+    message.author = user(42, "Alice")
+    await cog.on_message(message)
+
+    row = cog.store.append.call_args[0][0]
+    assert row['content'] == "Alice: hello there"
+    bot.fetch_user.assert_not_awaited()
@@ -0,0 +1,26 @@
+import logging
+import queue
+from shared.logging_setup import LocalQueueHandler
+
+def test_local_queue_handler_defers_formatting():
+    log_queue = queue.SimpleQueue()
+    handler = LocalQueueHandler(log_queue)
+    record = logging.LogRecord("test", logging.INFO, __file__, 1, "[%s] Sending %s messages", ("Grok", 3), None)
+    handler.emit(record)
+    queued = log_queue.get_nowait()
+    assert queued.getMessage() == "[Grok] Sending 3 messages"
+    assert queued.args is None
+    # The Formatter (asctime etc.) has not run on the calling thread
+    assert not hasattr(queued, 'asctime')
+
+def test_debug_arguments_not_formatted_when_disabled():
+    class Expensive:
+        formatted = False
+        def __str__(self):
+            Expensive.formatted = True
+            return "prompt"
+
+    logger = logging.getLogger("test.lazy")
+    logger.setLevel(logging.INFO)
+    logger.debug("[Grok] Formatted prompt: %s", Expensive())
+    assert Expensive.formatted is False
@@ -27,3 +27,26 @@ async def test_generate_response():
     cog.generate_response = AsyncMock(return_value=AsyncMock())
     response = await cog.generate_response(message)
     assert response is not None
+
+@pytest.mark.asyncio
+async def test_queue_stats_reports_waits_and_duplicates(monkeypatch):
+    from shared.dedupe import MessageDedupe
+    from shared.generation_scheduler import GenerationScheduler
+    scheduler = GenerationScheduler()
+    scheduler._waits.extend([0.1, 0.3, 2.0])
+    scheduler.stats.update(admitted=3, queued=2)
+    monkeypatch.setattr("cogs.management_cog.generation_scheduler", scheduler)
+    dedupe = MessageDedupe()
+    for message_id in (1, 2, 1, 1):
+        dedupe.check(message_id, now=0)
+    monkeypatch.setattr("cogs.management_cog.message_dedupe", dedupe)
+    cog = ManagementCog(MagicMock())
+    ctx = MagicMock()
+    ctx.send = AsyncMock()
+
+    await cog.queue_stats.callback(cog, ctx)
+
+    report = ctx.send.call_args.args[0]
+    assert "3 admitted, 2 queued, 0 shed" in report
+    assert "mean 0.80s, p95 2.00s, max 2.00s over the last 3" in report
+    assert "2 suppressed of 2 accepted" in report
@@ -0,0 +1,113 @@
+import random
+import pytest
+from shared.message_splitter import MessageSplitter, split_message, _is_joiner
+
+PREFIX = "[Grok] "
+WORDS = ["hello", "world", "splinter", "tree", "a" * 40, "naïve", "👍🏽", "👨‍👩‍👧", "é", "- item", "1. step"]
+
+
+def random_text(rng, length):
+    parts = []
+    size = 0
+    while size < length:
+        roll = rng.random()
+        if roll < 0.05:
+            lang = rng.choice(["python", "js", ""])
+            body = "\n".join(rng.choice(WORDS) * rng.randint(1, 5) for _ in range(rng.randint(1, 80)))
+            part = f"\n```{lang}\n{body}\n```\n"
+        elif roll < 0.15:
+            part = "\n" * rng.randint(1, 2)
+        elif roll < 0.17:
+            part = "x" * rng.randint(100, 3000)  # no break opportunities
+        else:
+            part = rng.choice(WORDS) + " "
+        parts.append(part)
+        size += len(part)
+    return "".join(parts)
+
+
+def feed_randomly(rng, text, prefix=PREFIX, limit=2000):
+    splitter = MessageSplitter(prefix, limit)
+    messages = []
+    pos = 0
+    while pos < len(text):
+        step = rng.randint(1, 300)
+        messages.extend(splitter.feed(text[pos:pos + step]))
+        assert len(splitter.current) <= limit
+        pos += step
+    messages.append(splitter.finish())
+    return messages
+
+
+def fence_lines(message):
+    return [line for line in message.split("\n") if line.strip().startswith("```")]
+
+
+@pytest.mark.parametrize("seed", range(25))
+def test_messages_fit_and_keep_prefix(seed):
+    rng = random.Random(seed)
+    text = random_text(rng, rng.randint(1, 20000))
+    for message in feed_randomly(rng, text):
+        assert len(message) <= 2000
+        assert message.startswith(PREFIX)
+
+
+@pytest.mark.parametrize("seed", range(25))
+def test_incremental_matches_single_pass(seed):
+    rng = random.Random(seed)
+    text = random_text(rng, 15000)
+    assert feed_randomly(rng, text) == split_message(text, PREFIX)
+
+
+@pytest.mark.parametrize("seed", range(25))
+def test_no_text_lost_and_fences_balanced(seed):
+    rng = random.Random(seed)
+    text = random_text(rng, 15000)
+    messages = split_message(text, PREFIX)
+
+    rebuilt = []
+    for message in messages:
+        body = message[len(PREFIX):]
+        # Each message must be valid markdown on its own
+        assert len(fence_lines(body)) % 2 == 0
+        rebuilt.append(body)
+    # Splitting only removes whitespace and adds fence lines
+    def strip(s):
+        lines = [line for line in s.split("\n") if not line.strip().startswith("```")]
+        return "".join("".join(lines).split())
+    assert strip("\n".join(rebuilt)) == strip(text)
+
+
+@pytest.mark.parametrize("seed", range(25))
+def test_never_splits_inside_grapheme(seed):
+    rng = random.Random(seed)
+    text = "".join(rng.choice(["👨‍👩‍👧", "👍🏽", "é", "ab"]) for _ in range(3000))
+    for message in feed_randomly(rng, text):
+        body = message[len(PREFIX):]
+        assert not _is_joiner(body[0])
+        assert not body.endswith("‍")
+
+
+def test_code_block_reopened_with_language():
+    code = "\n".join(f"value_{i} = {i}" for i in range(400))
+    messages = split_message(f"Here you go:\n```python\n{code}\n```\nDone.", PREFIX)
+
+    assert len(messages) > 1
+    for message in messages[1:-1]:
+        assert message.startswith(PREFIX + "```python\n")
+        assert message.endswith("\n```")
+    assert messages[-1].endswith("Done.")
+
+
+def test_prefers_line_breaks_for_lists():
+    items = "\n".join(f"- list item number {i} with some words" for i in range(200))
+    messages = split_message(items, PREFIX)
+
+    for message in messages:
+        for line in message[len(PREFIX):].split("\n"):
+            assert line.startswith("- list item number")
+            assert line.endswith("with some words")
+
+
+def test_short_text_single_message():
+    assert split_message("hi there", PREFIX) == ["[Grok] hi there"]
@@ -0,0 +1,93 @@
+import pytest
+import sqlite3
+from shared import migrations
+from shared.migrations import migrate, schema_version, MIGRATIONS
+
+# The queries run on every message or page load, with the index each must use
+HOT_QUERIES = [
+    # ContextStore._load
+    ('''SELECT discord_message_id, channel_id, guild_id, user_id, content, is_assistant, persona_name, emotion, timestamp
+        FROM messages WHERE channel_id = ? AND discord_message_id IS NOT NULL ORDER BY timestamp DESC LIMIT ?''',
+     ("100", 64), 'idx_messages_channel_time'),
+    # ContextStore.clear with a cutoff
+    ('DELETE FROM messages WHERE channel_id = ? AND timestamp < ?', ("100", "2024-01-01"), 'idx_messages_channel_time'),
+    # utils.get_message_history
+    ('SELECT content, is_assistant, persona_name, timestamp FROM messages WHERE channel_id = ? ORDER BY timestamp DESC LIMIT ?',
+     ("100", 50), 'idx_messages_channel_time'),
+    # HistorySearch.search
+    ('''SELECT m.content FROM messages_fts JOIN messages m ON m.id = messages_fts.rowid
+        WHERE messages_fts MATCH ? AND m.channel_id = ? ORDER BY bm25(messages_fts) LIMIT ?''',
+     ('"cat"', "100", 8), 'INTEGER PRIMARY KEY'),
+    # ChannelSummarizer.latest
+    ('SELECT start_timestamp, end_timestamp, summary FROM chat_summaries WHERE channel_id = ? ORDER BY end_timestamp DESC LIMIT 1',
+     ("100",), 'idx_summaries_channel_end'),
+    # ResponseBudget._load_rows
+    ('SELECT tags, response, requested_at, received_at, guild_id FROM logs WHERE status_code = 200 ORDER BY id DESC LIMIT ?',
+     (2000,), 'idx_logs_status_code'),
+    # Dashboard: messages today, recent activity, most active persona
+    ('SELECT COUNT(*) FROM messages WHERE timestamp >= ?', ("2024-01-01",), 'idx_messages_timestamp'),
+    ('SELECT timestamp, content, is_assistant, persona_name FROM messages ORDER BY timestamp DESC LIMIT 10', (),
+     'idx_messages_timestamp'),
+    ('''SELECT persona_name, COUNT(*) as count FROM messages WHERE is_assistant = 1 AND persona_name IS NOT NULL
+        GROUP BY persona_name ORDER BY count DESC LIMIT 1''', (), 'COVERING INDEX idx_messages_persona_assistant'),
+]
+
+LEGACY_INDEXES = '''
+CREATE INDEX idx_messages_channel ON messages(channel_id);
+CREATE INDEX idx_messages_persona ON messages(persona_name);
+CREATE INDEX idx_messages_discord_id ON messages(discord_message_id);
+CREATE INDEX idx_summaries_channel ON chat_summaries(channel_id);
+'''
+
+@pytest.fixture(autouse=True)
+def fresh_process():
+    migrations._migrated.clear()
+    yield
+    migrations._migrated.clear()
+
+def indexes(conn):
+    return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL")}
+
+@pytest.mark.parametrize("sql,params,index", HOT_QUERIES)
+def test_hot_queries_use_indexes(tmp_path, sql, params, index):
+    path = str(tmp_path / "plan.db")
+    migrate(path)
+    with sqlite3.connect(path) as conn:
+        steps = [row[-1] for row in conn.execute(f'EXPLAIN QUERY PLAN {sql}', params)]
+    assert any(index in step for step in steps), steps
+    # No full table scans, and no sorting rows the index already returns in order
+    # (counts and relevance ranks are computed, so those are sorted)
+    assert not {'SCAN messages', 'SCAN logs'} & set(steps), steps
+    assert 'USE TEMP B-TREE FOR ORDER BY' not in steps or 'GROUP BY' in sql or 'bm25' in sql, steps
+
+def test_migrate_upgrades_a_legacy_database_once(tmp_path):
+    path = str(tmp_path / "legacy.db")
+    with sqlite3.connect(path) as conn:
+        with open('databases/schema.sql', 'r') as f:
+            conn.executescript(f.read())
+        conn.executescript(LEGACY_INDEXES)
+        conn.execute("INSERT INTO messages (discord_message_id, channel_id, user_id, content, is_assistant) "
+                     "VALUES ('1', '100', '42', 'hello', 0)")
+
+    assert migrate(path) == MIGRATIONS[-1][0]
+    migrations._migrated.clear()  # a second start of the bot
+    assert migrate(path) == MIGRATIONS[-1][0]
+
+    with sqlite3.connect(path) as conn:
+        names = indexes(conn)
+        assert {'idx_messages_channel_time', 'idx_messages_persona_assistant', 'idx_summaries_channel_end'} <= names
+        assert not names & {'idx_messages_channel', 'idx_messages_persona', 'idx_messages_discord_id', 'idx_summaries_channel'}
+        assert conn.execute('SELECT COUNT(*) FROM schema_version').fetchone()[0] == len(MIGRATIONS)
+        assert conn.execute('SELECT content FROM messages').fetchone()[0] == 'hello'
+
+def test_failed_migration_rolls_back(tmp_path, monkeypatch):
+    path = str(tmp_path / "broken.db")
+    monkeypatch.setattr(migrations, 'MIGRATIONS', MIGRATIONS + [
+        (99, "broken", ['CREATE INDEX idx_broken ON messages(channel_id)', 'CREATE INDEX idx_oops ON missing(x)']),
+    ])
+    with pytest.raises(sqlite3.OperationalError):
+        migrate(path)
+
+    with sqlite3.connect(path) as conn:
+        assert schema_version(conn) == MIGRATIONS[-1][0]
+        assert 'idx_broken' not in indexes(conn)
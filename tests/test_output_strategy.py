@@ -0,0 +1,45 @@
+import pytest
+from unittest.mock import MagicMock
+import discord
+from shared.output_strategy import OutputStrategy, PageButton, SPLIT, ATTACHMENT, PAGINATE
+from shared.message_splitter import MESSAGE_LIMIT
+
+LONG = "# Notes\n\n" + "lorem ipsum " * 1000
+
+def test_split_never_overflows():
+    strategy = OutputStrategy(SPLIT, max_parts=1)
+    assert not strategy.overflows(10)
+    assert strategy.part_limit == MESSAGE_LIMIT
+
+def test_unknown_mode_falls_back_to_split():
+    assert OutputStrategy('carrier pigeon').mode == SPLIT
+
+def test_attachment_finish():
+    strategy = OutputStrategy(ATTACHMENT, max_parts=2)
+    assert not strategy.overflows(2) and strategy.overflows(3)
+    assert len(strategy.preview("x" * strategy.part_limit)) <= MESSAGE_LIMIT
+
+    content, extra = strategy.finish("Grok", "[Grok] preview", LONG, MagicMock(), overflowed=True, replacing=False)
+
+    assert content.startswith("[Grok] preview")
+    assert extra['attachments'][0].filename == "grok_response.md"
+    assert extra['embed'] is None
+    assert strategy.stats[ATTACHMENT] == 1
+
+@pytest.mark.asyncio
+async def test_paginate_finish_adds_page_buttons():
+    strategy = OutputStrategy(PAGINATE)
+    view = discord.ui.View()
+
+    content, extra = strategy.finish("Grok", "[Grok] preview", LONG, view, overflowed=True, replacing=False)
+
+    assert content is None
+    assert extra['embed'].footer.text == f"Grok · page 1/{len(view.pages)}"
+    assert len(view.pages) > 1
+    assert sum(isinstance(item, PageButton) for item in view.children) == 2
+
+    # A shorter reroll removes the buttons and clears the embed
+    content, extra = strategy.finish("Grok", "[Grok] short", "short", view, overflowed=False, replacing=True)
+    assert content == "[Grok] short"
+    assert extra == {'attachments': [], 'embed': None}
+    assert not any(isinstance(item, PageButton) for item in view.children)
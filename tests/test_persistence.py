@@ -0,0 +1,125 @@
+import pytest
+import sqlite3
+from unittest.mock import MagicMock
+from shared.persistence import MessageWriter
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "messages.db")
+    with sqlite3.connect(path) as conn:
+        with open('databases/schema.sql', 'r') as f:
+            conn.executescript(f.read())
+    return path
+
+def row(message_id, content, channel_id="100"):
+    return {
+        'id': str(message_id), 'channel_id': channel_id, 'guild_id': "1", 'user_id': "42", 'content': content,
+        'is_assistant': True, 'persona_name': "Grok", 'emotion': None, 'timestamp': "2024-01-01T00:00:00",
+    }
+
+def stored(db_path):
+    with sqlite3.connect(db_path) as conn:
+        return conn.execute("SELECT id, discord_message_id, content FROM messages ORDER BY id").fetchall()
+
+@pytest.mark.asyncio
+async def test_repeated_writes_to_a_row_merge_into_one_upsert(db_path):
+    writer = MessageWriter(db_path, flush_delay=60)
+    for content in ("Hel", "Hello", "Hello there"):
+        writer.upsert(row(1, content))
+    writer.upsert(row(2, "Other channel", channel_id="200"))
+
+    # Readers see the latest pending version before it is committed
+    assert [r['content'] for r in writer.rows("100")] == ["Hello there"]
+    assert stored(db_path) == []
+
+    await writer.flush()
+    writer.upsert(row(1, "Hello there, edited"))
+    await writer.close()
+
+    # The second commit updated the row in place instead of replacing it
+    assert stored(db_path) == [(1, "1", "Hello there, edited"), (2, "2", "Other channel")]
+    assert writer.stats['merged'] == 2 and writer.stats['batches'] == 2 and writer.rows("100") == []
+
+@pytest.mark.asyncio
+async def test_operations_run_in_order_and_fail_alone(db_path):
+    writer = MessageWriter(db_path, flush_delay=60)
+    writer.upsert(row(1, "kept"))
+
+    async def insert(conn):
+        cursor = await conn.execute("INSERT INTO messages (channel_id, user_id, content, is_assistant) "
+                                    "VALUES ('100', '42', 'log', 0)")
+        return cursor.lastrowid
+
+    async def broken(conn):
+        await conn.execute("INSERT INTO messages (channel_id, user_id, content, is_assistant) "
+                           "VALUES ('100', '42', 'half done', 0)")
+        await conn.execute("INSERT INTO missing VALUES (1)")
+
+    first, second = writer.execute(insert), writer.execute(broken)
+    await writer.flush()
+
+    assert await first == 1
+    with pytest.raises(sqlite3.OperationalError):
+        await second
+    assert [content for _, _, content in stored(db_path)] == ["log", "kept"]
+    assert writer.stats['failures'] == 1
+    await writer.close()
+
+@pytest.mark.asyncio
+async def test_context_cog_writes_streamed_replies_once(db_path):
+    from cogs.context_cog import ContextCog
+    cog = ContextCog.__new__(ContextCog)
+    cog.bot = MagicMock()
+    cog.last_messages = {}
+    cog.db_path = db_path
+
+    for content in ("Hi", "Hi there", "Hi there user"):
+        await cog.add_message_to_context("5", "100", "1", "42", content, True, "Grok")
+    await cog.add_message_to_context(None, None, "1", "42", "no ids", True)
+
+    await cog.store.close()
+    assert stored(db_path) == [(1, "5", "Assistant: Hi there user")]
+    assert cog.store.writer.stats['batches'] == 1
+
+@pytest.mark.asyncio
+async def test_persona_reply_is_stored_as_an_assistant_row(db_path):
+    from unittest.mock import patch
+    from cogs.base_cog import BaseCog
+    from cogs.context_cog import ContextCog
+    bot = MagicMock()
+    bot.user.id = 7
+    cog = ContextCog.__new__(ContextCog)
+    cog.bot = bot
+    cog.last_messages = {}
+    cog.db_path = db_path
+    bot.get_cog.return_value = cog
+    persona = BaseCog(bot, "Grok", "Grok", ["grok"], "test_model")
+
+    asked = MagicMock(id=554, content="hi grok", webhook_id=None)
+    asked.author.id = 42
+    asked.guild.id, asked.channel.id = 1, 100
+    reply = MagicMock(id=555, content="[Grok] Hello", webhook_id=None)
+    reply.author.id = 7
+    reply.guild.id, reply.channel.id = 1, 100
+
+    # Discord delivers the bot's own reply to on_message before record_reply runs
+    await cog.on_message(reply)
+    await cog.store.flush()
+    with patch('cogs.base_cog.side_effects'):
+        await persona.record_reply(asked, "hi grok", "Hello", reply.id)
+    await cog.store.close()
+
+    with sqlite3.connect(db_path) as conn:
+        rows = conn.execute("SELECT discord_message_id, is_assistant, content, persona_name, user_id FROM messages").fetchall()
+    assert rows == [("555", 1, "Assistant: Hello", "Grok", "7")]
+
+@pytest.mark.asyncio
+async def test_upsert_replaces_the_author_and_role(db_path):
+    writer = MessageWriter(db_path, flush_delay=60)
+    writer.upsert({**row(1, "Assistant: Hello"), 'is_assistant': False, 'persona_name': None, 'user_id': "99"})
+    await writer.flush()
+    writer.upsert(row(1, "Assistant: Hello"))
+    await writer.close()
+
+    with sqlite3.connect(db_path) as conn:
+        assert conn.execute("SELECT user_id, is_assistant, persona_name FROM messages").fetchall() == [("42", 1, "Grok")]
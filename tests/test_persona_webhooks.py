@@ -0,0 +1,79 @@
+import pytest
+import discord
+from unittest.mock import MagicMock, AsyncMock
+from shared.persona_webhooks import PersonaPresenter, WEBHOOK_NAME
+
+def make_channel(channel_id=100, manage_webhooks=True, existing=()):
+    channel = MagicMock(spec=discord.TextChannel)
+    channel.id = channel_id
+    channel.guild.me.id = 1
+    channel.permissions_for.return_value.manage_webhooks = manage_webhooks
+    channel.webhooks = AsyncMock(return_value=list(existing))
+    webhook = MagicMock()
+    webhook.id = 555
+    webhook.send = AsyncMock(return_value=MagicMock(name="webhook_message"))
+    channel.create_webhook = AsyncMock(return_value=webhook)
+    return channel
+
+def make_message(channel):
+    message = MagicMock()
+    message.channel = channel
+    message.reply = AsyncMock(return_value=MagicMock(name="reply"))
+    return message
+
+@pytest.mark.asyncio
+async def test_creates_webhook_once_and_posts_as_persona():
+    presenter = PersonaPresenter()
+    channel = make_channel()
+    message = make_message(channel)
+
+    sent = await presenter.send(message, "[Grok] hi", "Grok", "https://example.com/grok.png")
+    await presenter.send(message, "[Claude] hello", "Claude")
+
+    channel.create_webhook.assert_awaited_once_with(name=WEBHOOK_NAME, reason="Persona replies")
+    webhook = channel.create_webhook.return_value
+    assert sent is webhook.send.return_value
+    first = webhook.send.await_args_list[0]
+    assert first.args == ("[Grok] hi",)
+    assert first.kwargs['username'] == "Grok"
+    assert first.kwargs['avatar_url'] == "https://example.com/grok.png"
+    assert first.kwargs['wait'] is True
+    assert webhook.send.await_args_list[1].kwargs['username'] == "Claude"
+    message.reply.assert_not_called()
+    assert presenter.stats == {'webhook': 2, 'fallback': 0}
+
+@pytest.mark.asyncio
+async def test_reuses_existing_bot_webhook():
+    existing = MagicMock()
+    existing.name = WEBHOOK_NAME
+    existing.token = "token"
+    existing.user.id = 1
+    channel = make_channel(existing=[existing])
+
+    assert await PersonaPresenter().webhook_for(channel) is existing
+    channel.create_webhook.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_falls_back_to_reply_without_permission_or_in_dms():
+    presenter = PersonaPresenter()
+    guild_message = make_message(make_channel(manage_webhooks=False))
+    dm_message = make_message(MagicMock(spec=discord.DMChannel))
+
+    await presenter.send(guild_message, "[Grok] hi", "Grok")
+    await presenter.send(dm_message, "[Grok] hi", "Grok")
+
+    guild_message.reply.assert_awaited_once_with("[Grok] hi")
+    dm_message.reply.assert_awaited_once_with("[Grok] hi")
+    guild_message.channel.create_webhook.assert_not_called()
+    assert presenter.stats == {'webhook': 0, 'fallback': 2}
+
+@pytest.mark.asyncio
+async def test_disabled_presenter_always_replies():
+    presenter = PersonaPresenter(enabled=False)
+    channel = make_channel()
+    message = make_message(channel)
+
+    await presenter.send(message, "[Grok] hi", "Grok")
+
+    message.reply.assert_awaited_once_with("[Grok] hi")
+    channel.webhooks.assert_not_called()
@@ -0,0 +1,68 @@
+import json
+import sqlite3
+from unittest.mock import MagicMock
+from shared.prompt_store import PromptStore, compile_template
+
+TEMPLATE = "You are {MODEL_ID} talking to {USERNAME} ({DISCORD_USER_ID}) at {TIME} {TZ} in {SERVER_NAME}/#{CHANNEL_NAME}. Reply in {{json}}."
+
+def make_store(tmp_path):
+    db_path = str(tmp_path / "prompts.db")
+    db = sqlite3.connect(db_path)
+    db.execute('''CREATE TABLE prompt_overrides (
+        persona TEXT NOT NULL, guild_id TEXT NOT NULL DEFAULT '', channel_id TEXT NOT NULL DEFAULT '',
+        prompt TEXT NOT NULL, updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (persona, guild_id, channel_id))''')
+    db.commit()
+    db.close()
+    prompts_file = tmp_path / "prompts.json"
+    prompts_file.write_text(json.dumps({'system_prompts': {'grok_prompts': TEMPLATE}}))
+    store = PromptStore(db_path, str(prompts_file))
+    store.register("Grok", "grok_prompts", "default")
+    store.load()
+    return store
+
+def make_message(guild_id=1, channel_id=100):
+    message = MagicMock()
+    message.guild.id = guild_id
+    message.guild.name = "Server"
+    message.channel.id = channel_id
+    message.channel.name = "general"
+    message.author.display_name = "Alice"
+    message.author.id = 42
+    return message
+
+def test_render_matches_str_format(tmp_path):
+    store = make_store(tmp_path)
+    store.current_time = lambda: "09:15 AM"
+
+    expected = TEMPLATE.format(MODEL_ID="Grok", USERNAME="Alice", DISCORD_USER_ID=42, TIME="09:15 AM",
+                               TZ="Pacific Time", SERVER_NAME="Server", CHANNEL_NAME="general")
+    assert store.render("Grok", make_message()) == expected
+
+def test_overrides_apply_by_specificity_and_persist(tmp_path):
+    store = make_store(tmp_path)
+    version = store.version
+
+    assert store.set_override("Grok", "persona {MODEL_ID}")
+    assert store.set_override("Grok", "server", guild_id=1)
+    assert store.set_override("Grok", "channel", guild_id=1, channel_id=100)
+    assert store.version == version + 3
+
+    assert store.render("Grok", make_message()) == "channel"
+    assert store.render("Grok", make_message(channel_id=101)) == "server"
+    assert store.render("Grok", make_message(guild_id=2, channel_id=200)) == "persona Grok"
+
+    store.clear_override("Grok", guild_id=1, channel_id=100)
+    assert store.render("Grok", make_message()) == "server"
+
+    reloaded = PromptStore(store.db_path, store.prompts_file)
+    reloaded.register("Grok", "grok_prompts", "default")
+    assert reloaded.template("Grok", 1, 101) == "server"
+
+def test_unknown_placeholder_raises_like_format():
+    try:
+        compile_template("Hello {NOPE}", {})
+    except KeyError:
+        pass
+    else:
+        raise AssertionError("expected KeyError")
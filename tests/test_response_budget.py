@@ -0,0 +1,118 @@
+import json
+import sqlite3
+import pytest
+from shared.response_budget import ResponseBudget, FIXED_MAX_TOKENS
+
+@pytest.fixture
+def logs_db(tmp_path):
+    db_path = str(tmp_path / "logs.db")
+    conn = sqlite3.connect(db_path)
+    with open('databases/schema.sql', 'r') as f:
+        conn.executescript(f.read())
+
+    def add(model_cog, prompt_file, guild_id, content, elapsed_ms=1000):
+        tags = {"model_cog": model_cog, "prompt_file": prompt_file, "guild_id": guild_id}
+        response = {"choices": [{"message": {"content": content}}]}
+        conn.execute(
+            "INSERT INTO logs (requested_at, received_at, request, response, status_code, tags, guild_id) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (0, elapsed_ms, "{}", json.dumps(response), 200, json.dumps(tags), guild_id)
+        )
+
+    for _ in range(30):
+        add("Router", "router", "1", "<modelCog>GPT4O")
+        add("", "nemotron_prompts", "1", "x" * 2400, elapsed_ms=4000)
+    conn.commit()
+    conn.close()
+    return db_path
+
+def test_router_budget_is_small_with_stop_sequence(logs_db):
+    budget = ResponseBudget(logs_db)
+    budget.refresh()
+    result = budget.suggest(model_cog="Router", prompt_file="router", guild_id="1")
+    assert result['max_tokens'] == budget.floor
+    assert result['stop'] == ['</modelCog>']
+
+def test_long_form_budget_tracks_observed_lengths(logs_db):
+    budget = ResponseBudget(logs_db)
+    budget.refresh()
+    result = budget.suggest(prompt_file="nemotron_prompts", guild_id="1")
+    assert 600 <= result['max_tokens'] <= FIXED_MAX_TOKENS
+    assert result['stop'] is None
+
+def test_unknown_cog_falls_back_to_fixed_limit(logs_db):
+    budget = ResponseBudget(logs_db)
+    budget.refresh()
+    result = budget.suggest(model_cog="Unknown", prompt_file="unknown", guild_id="2")
+    assert result['max_tokens'] == FIXED_MAX_TOKENS
+    assert result['key'] is None
+
+def test_report_counts_time_saved(logs_db):
+    budget = ResponseBudget(logs_db)
+    budget.refresh()
+    budget.suggest(model_cog="Router", prompt_file="router", guild_id="1")
+    router_rows = [row for row in budget.report() if row['key'] == ('guild', 'router', '1')]
+    assert router_rows[0]['requests'] == 1
+    assert router_rows[0]['seconds_saved'] > 0
+    assert router_rows[0]['truncated'] == 0
+
+def test_truncation_is_counted_and_raises_the_cap(logs_db):
+    budget = ResponseBudget(logs_db)
+    budget.refresh()
+    first = budget.suggest(prompt_file="nemotron_prompts", guild_id="1")
+
+    assert budget.record_finish(first['key'], first['max_tokens'], 'stop') is False
+    assert budget.record_finish(None, first['max_tokens'], 'length') is False  # not an adaptive cap
+    assert budget.record_finish(first['key'], first['max_tokens'], 'length') is True
+    raised = budget.suggest(prompt_file="nemotron_prompts", guild_id="1")
+    assert raised['max_tokens'] == min(FIXED_MAX_TOKENS, first['max_tokens'] * 2)
+
+    budget.refresh()  # new log rows don't undo the raise
+    assert budget.suggest(prompt_file="nemotron_prompts", guild_id="1")['max_tokens'] == raised['max_tokens']
+    row = [row for row in budget.report() if row['key'] == first['key']][0]
+    assert row['truncated'] == 1 and row['requests'] == 3
+
+@pytest.mark.asyncio
+async def test_call_openpipe_retries_a_truncated_answer_under_the_fixed_limit(logs_db):
+    from types import SimpleNamespace
+    from unittest.mock import AsyncMock
+    from shared.api import API
+    api = object.__new__(API)  # not the shared instance
+    api.session = object()
+    api._enforce_rate_limit = AsyncMock()
+    api.report = AsyncMock()
+    api.response_budget = ResponseBudget(logs_db)
+    api.response_budget.refresh()
+
+    def completion(content, finish_reason):
+        message = SimpleNamespace(content=content, tool_calls=None)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message, finish_reason=finish_reason)])
+
+    create = AsyncMock(side_effect=[completion("cut o", "length"), completion("cut off no more", "stop")])
+    api.openpipe_client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+
+    result = await api.call_openpipe(messages=[{"role": "user", "content": "hi"}], model="m",
+                                     prompt_file="nemotron_prompts", guild_id="1")
+
+    assert result['choices'][0]['message']['content'] == "cut off no more"
+    assert [call.kwargs['max_tokens'] for call in create.call_args_list][1] == FIXED_MAX_TOKENS
+    assert create.call_args_list[0].kwargs['max_tokens'] < FIXED_MAX_TOKENS
+
+@pytest.mark.asyncio
+async def test_a_cut_off_stream_is_counted(logs_db):
+    from types import SimpleNamespace
+    from unittest.mock import AsyncMock
+    from shared.api import API
+    api = object.__new__(API)  # not the shared instance
+    api.report = AsyncMock()
+    api.response_budget = ResponseBudget(logs_db)
+    api.response_budget.refresh()
+    budget = api.response_budget.suggest(prompt_file="nemotron_prompts", guild_id="1")
+
+    async def chunks():
+        for text, finish_reason in (("cut", None), (" o", "length")):
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text), finish_reason=finish_reason)])
+
+    stream = api._stream_response(chunks(), 0, {'max_tokens': budget['max_tokens']}, None, None, "1",
+                                  "nemotron_prompts", None, budget['key'])
+    assert "".join([text async for text in stream]) == "cut o"
+    assert api.response_budget.applied[budget['key']]['truncated'] == 1
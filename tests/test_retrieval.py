@@ -0,0 +1,116 @@
+import pytest
+import aiosqlite
+from unittest.mock import MagicMock
+from shared import migrations
+from shared.migrations import migrate
+from shared.persistence import MessageWriter
+from shared.retrieval import HistorySearch, match_query, mix
+from shared.context_policy import ContextPolicy
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "search.db")
+    migrations._migrated.clear()
+    migrate(path)
+    return path
+
+def row(message_id, content, channel_id="100", minute=0):
+    return {
+        'id': str(message_id), 'channel_id': channel_id, 'guild_id': "1", 'user_id': "42", 'content': content,
+        'is_assistant': False, 'persona_name': None, 'emotion': None,
+        'timestamp': f"2024-01-01T{minute // 60:02d}:{minute % 60:02d}:00",
+    }
+
+def test_match_query_keeps_significant_words():
+    assert match_query("What did we decide about the Postgres migration?") == '"migration" OR "postgres" OR "decide"'
+    assert match_query('NEAR AND "quotes"') == '"quotes" OR "near"'
+    assert match_query("is it ok?") is None
+
+def test_mix_keeps_recent_rows_then_matches_within_budget():
+    recent = [row(i, "r" * 40, minute=i) for i in range(10, 0, -1)]  # newest first, 11 tokens each
+    matches = [row(100, "m" * 40, minute=0)]
+    chosen = mix(recent, matches, window=50, budget=50, recent_k=3)
+
+    assert [r['id'] for r in chosen] == ["100", "8", "9", "10"]  # oldest first
+    assert [r['id'] for r in mix(recent, matches, window=2, recent_k=3)] == ["100", "10"]
+
+@pytest.mark.asyncio
+async def test_index_follows_writes_and_search_ranks_within_the_channel(db_path):
+    writer = MessageWriter(db_path, flush_delay=60)
+    writer.upsert(row(1, "Alice: the deploy failed on the staging cluster"))
+    writer.upsert(row(2, "Bob: lunch anyone?"))
+    writer.upsert(row(3, "Carol: staging cluster is fine now", channel_id="200"))
+    await writer.flush()
+    writer.upsert(row(2, "Bob: the staging deploy is fixed"))  # an edit replaces the indexed text
+    await writer.flush()
+
+    search = HistorySearch(db_path)
+    found = await search.search("100", "Which deploy failed on staging?")
+    assert [r['id'] for r in found] == ["1", "2"]
+    assert await search.search("100", "lunch") == []
+    assert [r['id'] for r in await search.search("100", "staging", exclude_ids={"1"})] == ["2"]
+
+    async def delete(conn):
+        await conn.execute("DELETE FROM messages WHERE discord_message_id = '1'")
+    writer.execute(delete)
+    await writer.close()
+    assert [r['id'] for r in await search.search("100", "staging cluster")] == ["2"]
+    assert search.stats['queries'] == 4 and search.stats['failures'] == 0
+    await search.close()
+
+@pytest.mark.asyncio
+async def test_context_mixes_old_matches_with_recent_messages(db_path):
+    from cogs.context_cog import ContextCog
+    cog = ContextCog.__new__(ContextCog)
+    cog.bot = MagicMock()
+    cog.last_messages = {}
+    cog.db_path = db_path
+    cog.summarizer.threshold = 0
+    cog.store.writer.upsert(row(1, "Alice: my cat is called Biscuit", minute=0))
+    for i in range(2, 80):
+        cog.store.writer.upsert(row(i, f"Bob: unrelated chatter {i}", minute=i))
+    await cog.store.flush()
+
+    policy = ContextPolicy(max_messages=20)
+    plain = await cog.get_context_messages("100", policy=policy)
+    mixed = await cog.get_context_messages("100", exclude_message_id="80", query="What is my cat called?", policy=policy)
+
+    assert "1" not in [m['id'] for m in plain]
+    assert [m['id'] for m in mixed][:2] == ["1", "61"]
+    assert len(mixed) == 20
+    await cog.store.close()
+    await cog.search.close()
+
+@pytest.mark.asyncio
+async def test_words_in_most_messages_are_left_out_of_the_search(db_path, monkeypatch):
+    monkeypatch.setattr("shared.retrieval.COMMON_TERM_MIN_DOCS", 0)
+    writer = MessageWriter(db_path, flush_delay=60)
+    for i in range(1, 11):
+        writer.upsert(row(i, f"Bob: hello again {i}" + (" pizza" if i == 4 else "")))
+    await writer.close()
+
+    search = HistorySearch(db_path, common_share=0.5)
+    assert await search.search("100", "hello") == []
+    assert [r['id'] for r in await search.search("100", "hello pizza")] == ["4"]
+    assert search.stats['common_terms'] == 2
+    await search.close()
+
+@pytest.mark.asyncio
+async def test_searches_share_one_connection_and_cached_counts(db_path, monkeypatch):
+    writer = MessageWriter(db_path, flush_delay=60)
+    writer.upsert(row(1, "Alice: the staging deploy failed"))
+    await writer.close()
+
+    connects = []
+    connect = aiosqlite.connect
+    monkeypatch.setattr("shared.retrieval.aiosqlite.connect", lambda *a, **kw: connects.append(a) or connect(*a, **kw))
+    search = HistorySearch(db_path)
+    statements = []
+    for _ in range(3):
+        assert [r['id'] for r in await search.search("100", "staging deploy")] == ["1"]
+        if not statements:
+            await search._conn.set_trace_callback(statements.append)
+    assert len(connects) == 1
+    # The table size and term counts are looked up by the first search only
+    assert not [sql for sql in statements if "MAX(id)" in sql or "messages_fts_vocab" in sql]
+    await search.close()
@@ -1,6 +1,7 @@
 import pytest
 from unittest.mock import MagicMock, AsyncMock, patch, call
 from cogs.router_cog import RouterCog
+from shared.dispatcher import MessageDispatcher
 import discord
 
 @pytest.fixture
@@ -74,8 +75,10 @@ async def test_on_message_dm_flow(mock_bot, mock_message, mock_api):
         cog.api_client = mock_api
         cog.router_system_prompt = "System prompt: {user_message}"
 
-        # Execute on_message
-        await cog.on_message(mock_message)
+        # Messages reach the router through the bot's dispatcher
+        mock_bot.get_cog.side_effect = lambda name: cog if name == 'RouterCog' else gpt4o_cog
+        mock_bot.cogs = {'RouterCog': cog}
+        await MessageDispatcher(mock_bot).dispatch(mock_message)
 
         # Verify interactions
         mock_api.call_openpipe.assert_called_once()
@@ -168,3 +171,27 @@ async def test_route_message_multiple_cogs(mock_bot, mock_message, mock_api):
         mock_api.call_openpipe.assert_called_once()
         hermes_cog.handle_message.assert_called_once_with(mock_message)
         gpt4o_cog.handle_message.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_extract_model_name_without_closing_tag(mock_bot):
+    cog = RouterCog(mock_bot)
+    assert cog._extract_model_name("<modelCog>Hermes") == "Hermes"
+
+@pytest.mark.asyncio
+async def test_route_message_returns_cog_result(mock_bot, mock_message, mock_api):
+    from shared.reply_result import ReplyResult
+    reply = ReplyResult("GPT-4o")
+    reply.text = "Hi!"
+    reply.timings = {'request': 0.1, 'stream': 0.5}
+    with patch.object(mock_message.channel, 'typing', return_value=AsyncMock()):
+        gpt4o_cog = MagicMock()
+        gpt4o_cog.handle_message = AsyncMock(return_value=reply)
+        mock_bot.get_cog.return_value = gpt4o_cog
+        cog = RouterCog(mock_bot)
+        cog.api_client = mock_api
+        cog.router_system_prompt = "System prompt: {user_message}"
+
+        result = await cog.route_message(mock_message)
+
+    assert result is reply and result.ok
+    assert list(result.timings) == ['route', 'request', 'stream']
@@ -0,0 +1,70 @@
+import pytest
+import asyncio
+from unittest.mock import MagicMock, AsyncMock
+from shared.side_effects import SideEffectQueue, HIGH, NORMAL, LOW
+
+@pytest.mark.asyncio
+async def test_runs_by_priority_and_drains():
+    queue = SideEffectQueue(workers=1)
+    order = []
+
+    def job(name):
+        async def run():
+            order.append(name)
+        return run
+
+    queue.submit(job('log'), LOW)
+    queue.submit(job('reaction'), NORMAL)
+    queue.submit(job('context'), HIGH)
+    await queue.drain()
+
+    assert order == ['context', 'reaction', 'log']
+    assert queue.stats['done'] == 3
+    assert not queue.submit(job('late'))
+
+@pytest.mark.asyncio
+async def test_nickname_edits_are_skipped_when_unchanged():
+    queue = SideEffectQueue()
+    guild = MagicMock(id=1)
+    guild.me.edit = AsyncMock()
+
+    assert queue.set_nickname(guild, "Grok")
+    assert not queue.set_nickname(guild, "Grok")
+    assert queue.set_nickname(guild, "Claude")  # merged into the queued edit
+    await queue.drain()
+
+    guild.me.edit.assert_awaited_once_with(nick="Claude")
+    assert queue.stats['nick_skipped'] == 1
+    assert queue.stats['merged'] == 1
+
+@pytest.mark.asyncio
+async def test_reactions_and_batches_are_merged():
+    queue = SideEffectQueue()
+    message = MagicMock(id=5)
+    message.add_reaction = AsyncMock()
+    flushed = []
+
+    async def flush(items):
+        flushed.append(items)
+
+    queue.add_reaction(message, "😄")
+    queue.add_reaction(message, "😄")
+    for i in range(3):
+        queue.submit_batch('log', i, flush)
+    await queue.drain()
+
+    message.add_reaction.assert_awaited_once_with("😄")
+    assert flushed == [[0, 1, 2]]
+
+@pytest.mark.asyncio
+async def test_failed_nickname_edit_is_retried_next_time():
+    queue = SideEffectQueue()
+    guild = MagicMock(id=1)
+    guild.me.edit = AsyncMock(side_effect=Exception("Missing Permissions"))
+
+    queue.set_nickname(guild, "Grok")
+    await asyncio.sleep(0.01)
+
+    assert queue.stats['failed'] == 1
+    assert queue.set_nickname(guild, "Grok")
+    await queue.drain()
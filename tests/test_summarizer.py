@@ -0,0 +1,132 @@
+import pytest
+import asyncio
+import sqlite3
+from unittest.mock import AsyncMock, MagicMock
+from shared.persistence import MessageWriter
+from shared.summarizer import ChannelSummarizer, SUMMARY_PREFIX
+from shared.context_policy import ContextPolicy
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "summaries.db")
+    with sqlite3.connect(path) as conn:
+        with open('databases/schema.sql', 'r') as f:
+            conn.executescript(f.read())
+        conn.executemany(
+            "INSERT INTO messages (discord_message_id, channel_id, user_id, content, is_assistant, persona_name, timestamp) "
+            "VALUES (?, '100', '42', ?, ?, ?, ?)",
+            [(str(i), f"Assistant: reply {i}" if i % 2 else f"Alice: message {i} " + "x" * 40,
+              i % 2, "Grok" if i % 2 else None, f"2024-01-01T00:{i // 60:02d}:{i % 60:02d}")
+             for i in range(30)]
+        )
+    return path
+
+def summarizer(db_path, complete, **kwargs):
+    kwargs.setdefault('threshold', 100)
+    kwargs.setdefault('keep_recent', 10)
+    kwargs.setdefault('writer', MessageWriter(db_path, flush_delay=0))
+    return ChannelSummarizer(db_path, complete, call_interval=0, **kwargs)
+
+@pytest.mark.asyncio
+async def test_history_over_the_threshold_is_summarized_incrementally(db_path):
+    complete = AsyncMock(side_effect=["first summary", "second summary"])
+    s = summarizer(db_path, complete)
+
+    assert await s.summarize("100") is False  # written, and no backlog beyond this pass
+    latest = await s.latest("100")
+    assert latest.text == "first summary" and latest.end == "2024-01-01T00:00:19"
+    prompt = complete.call_args[0][0][1]['content']
+    assert "Grok: reply 1\n" in prompt and "message 19" not in prompt and "(none yet)" in prompt
+
+    # Nothing new beyond the kept messages: no call
+    assert await s.summarize("100") is False
+    assert complete.await_count == 1
+
+    with sqlite3.connect(db_path) as conn:
+        conn.executemany(
+            "INSERT INTO messages (discord_message_id, channel_id, user_id, content, is_assistant, timestamp) "
+            "VALUES (?, '100', '42', ?, 0, ?)",
+            [(str(i), "Alice: later " + "y" * 60, f"2024-01-01T00:00:{i}") for i in range(30, 45)]
+        )
+    await s.summarize("100")
+    assert (await s.latest("100")).text == "second summary"
+    assert "first summary" in complete.call_args[0][0][1]['content']
+    await s.writer.close()
+
+    with sqlite3.connect(db_path) as conn:
+        rows = conn.execute("SELECT start_timestamp, end_timestamp FROM chat_summaries ORDER BY id").fetchall()
+    assert rows == [("2024-01-01T00:00:00", "2024-01-01T00:00:19"), ("2024-01-01T00:00:00", "2024-01-01T00:00:34")]
+
+@pytest.mark.asyncio
+async def test_a_restarted_summarizer_resumes_from_the_stored_summary(db_path):
+    first = summarizer(db_path, AsyncMock(return_value="before the crash"))
+    await first.summarize("100")
+    await first.writer.close()
+
+    complete = AsyncMock(return_value="unused")
+    restarted = summarizer(db_path, complete)
+    assert (await restarted.latest("100")).text == "before the crash"
+    assert await restarted.summarize("100") is False
+    complete.assert_not_awaited()
+
+@pytest.mark.asyncio
+async def test_checks_are_rate_limited_per_channel(db_path):
+    s = summarizer(db_path, AsyncMock(return_value="summary"), check_interval=60)
+    s.note("100", now=0)
+    s.note("100", now=30)
+    await s._task
+    s.note("100", now=61)
+    await s._task
+
+    assert s.stats['checks'] == 2 and s.stats['summaries'] == 1
+    disabled = summarizer(db_path, AsyncMock(), threshold=0)
+    disabled.note("100")
+    assert disabled._task is None
+    await s.writer.close()
+
+@pytest.mark.asyncio
+async def test_context_uses_the_summary_instead_of_covered_messages(db_path):
+    from cogs.context_cog import ContextCog
+    cog = ContextCog.__new__(ContextCog)
+    cog.bot = MagicMock()
+    cog.bot.api_client.call_openpipe = AsyncMock(
+        return_value={'choices': [{'message': {'content': "Alice and Grok chatted"}}]})
+    cog.last_messages = {}
+    cog.db_path = db_path
+    cog.summarizer.keep_recent = 10
+    cog.summarizer.threshold = 100
+    cog.store.writer.flush_delay = 0
+
+    await cog.summarizer.summarize("100")
+    messages = await cog.get_context_messages("100", policy=ContextPolicy(max_messages=50))
+
+    assert messages[0]['user_id'] == 'SYSTEM'
+    assert messages[0]['content'] == f"{SUMMARY_PREFIX} Alice and Grok chatted"
+    assert [m['id'] for m in messages[1:]] == [str(i) for i in range(20, 30)]
+    await cog.store.close()
+
+@pytest.mark.asyncio
+async def test_inactive_channels_are_not_summarized(db_path):
+    from unittest.mock import patch
+    from cogs.context_cog import ContextCog
+    cog = ContextCog.__new__(ContextCog)
+    cog.bot = MagicMock()
+    cog.bot.api_client.call_openpipe = AsyncMock()
+    cog.last_messages = {}
+    cog.db_path = db_path
+    cog.summarizer.threshold = 1
+    cog.summarizer.note = MagicMock(wraps=cog.summarizer.note)
+
+    with patch('cogs.context_cog.access_control') as acl:
+        acl.is_channel_active.return_value = False
+        for i in range(50):
+            await cog.add_message_to_context(str(1000 + i), "300", "1", "42", f"chatter {i} " * 20, False)
+        await asyncio.sleep(0)
+        cog.summarizer.note.assert_not_called()
+        cog.bot.api_client.call_openpipe.assert_not_awaited()
+
+        # Once a persona answers there, the channel's history is worth summarizing
+        await cog.add_message_to_context("2000", "300", "1", "7", "a reply", True, "Grok")
+        cog.summarizer.note.assert_called_once_with("300", "1")
+    await cog.summarizer.close()
+    await cog.store.close()
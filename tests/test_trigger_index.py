@@ -0,0 +1,55 @@
+from unittest.mock import MagicMock
+from shared.trigger_index import TriggerIndex
+
+def make_cog(name, trigger_words, **attrs):
+    cog = MagicMock(spec=['name', 'trigger_words', 'handle_message'] + list(attrs))
+    cog.name = name
+    cog.trigger_words = trigger_words
+    for key, value in attrs.items():
+        setattr(cog, key, value)
+    return cog
+
+GPT4O = make_cog("GPT-4o", ['gpt4o', '4o', 'openai'])
+CLAUDE = make_cog("Claude-3-Haiku", ['claude3haiku', 'haiku', 'claude'])
+GROK = make_cog("Grok", ['grok', 'xAI'])
+VISION = make_cog("LlamaVision", ['llamavision', 'vision', 'image', 'describe this image'])
+QWEN = make_cog("Qwen", ['qwen', 'qwen2.5'])
+
+def test_word_boundaries():
+    index = TriggerIndex([GPT4O, GROK])
+    assert index.best("ask 4o about it").cog is GPT4O
+    assert index.best("4o?").cog is GPT4O
+    assert index.best("I4ope so") is None
+    assert index.best("groking the code") is None
+    assert index.best("Hey xAI folks").cog is GROK  # mixed-case trigger word
+
+def test_find_all_returns_positions_in_order():
+    index = TriggerIndex([GPT4O, CLAUDE, GROK, VISION, QWEN])
+    matches = index.find_all("Claude, can you describe this image? grok and qwen2.5 too")
+
+    assert [(m.cog.name, m.word, m.start) for m in matches] == [
+        ("Claude-3-Haiku", "claude", 0),
+        ("LlamaVision", "describe this image", 16),
+        ("Grok", "grok", 37),
+        ("Qwen", "qwen2.5", 46),
+    ]
+
+def test_earliest_match_wins_by_default():
+    index = TriggerIndex([GPT4O, GROK])
+    assert index.best("grok or openai?").cog is GROK
+
+def test_priority_overrides_position():
+    urgent = make_cog("Urgent", ['urgent'], trigger_priority=10)
+    index = TriggerIndex([GROK, urgent])
+    assert index.best("grok, this is urgent").cog is urgent
+
+def test_boundaries_can_be_disabled_per_cog():
+    loose = make_cog("Loose", ['nemo'], trigger_word_boundaries=False)
+    index = TriggerIndex([loose, GROK])
+    assert index.best("unslopnemo please").cog is loose
+    assert index.best("groking") is None
+
+def test_cogs_without_triggers_are_ignored():
+    router = make_cog("Router", [])
+    index = TriggerIndex([router])
+    assert index.find_all("router please") == []
@@ -24,9 +24,9 @@ class {class_name}(BaseCog):
             prompt_file="{prompt_file}",
             supports_vision={supports_vision}
         )
-        logging.debug(f"[{log_name}] Initialized with raw_prompt: {{self.raw_prompt}}")
-        logging.debug(f"[{log_name}] Using provider: {{self.provider}}")
-        logging.debug(f"[{log_name}] Vision support: {{self.supports_vision}}")
+        logging.debug("[{log_name}] Initialized with raw_prompt: %s", self.raw_prompt)
+        logging.debug("[{log_name}] Using provider: %s", self.provider)
+        logging.debug("[{log_name}] Vision support: %s", self.supports_vision)
 
         # Load temperature settings
         try:
@@ -52,43 +52,17 @@ RESPONSE_TEMPLATE = '''
         try:
             # Format system prompt
             formatted_prompt = self.format_prompt(message)
-            messages = [{{"role": "system", "content": formatted_prompt}}]
 
-            # Get last 50 messages from database, excluding current message
-            channel_id = str(message.channel.id)
-            history_messages = await self.context_cog.get_context_messages(
-                channel_id, 
-                limit=50,
-                exclude_message_id=str(message.id)
-            )
-            
-            # Format history messages with proper roles
-            for msg in history_messages:
-                role = "assistant" if msg['is_assistant'] else "user"
-                content = msg['content']
-                
-                # Handle system summaries
-                if msg['user_id'] == 'SYSTEM' and content.startswith('[SUMMARY]'):
-                    role = "system"
-                    content = content[9:].strip()  # Remove [SUMMARY] prefix
-                
-                messages.append({{
-                    "role": role,
-                    "content": content
-                }})
-
-            # Add the current message
-            messages.append({{
-                "role": "user",
-                "content": message.content
-            }})
+            # Channel history allowed by the context policy and the current message, assembled once
+            # for every persona answering it; a rerolled response gets the same snapshot as the original
+            messages = await self.build_messages(message, formatted_prompt)
 
-            logging.debug(f"[{log_name}] Sending {{len(messages)}} messages to API")
-            logging.debug(f"[{log_name}] Formatted prompt: {{formatted_prompt}}")
+            logging.debug("[{log_name}] Sending %s messages to API", len(messages))
+            logging.debug("[{log_name}] Formatted prompt: %s", formatted_prompt)
 
             # Get temperature for this agent
             temperature = self.get_temperature()
-            logging.debug(f"[{log_name}] Using temperature: {{temperature}}")
+            logging.debug("[{log_name}] Using temperature: %s", temperature)
 
             # Get user_id and guild_id
             user_id = str(message.author.id)
@@ -9,21 +9,16 @@ from functools import wraps
 from contextlib import contextmanager
 import secrets
 from pathlib import Path
+from shared.logging_setup import configure_logging
+from shared.migrations import migrate
 
 # Create required directories before configuring logging
 Path('databases').mkdir(exist_ok=True)
 Path('logs').mkdir(exist_ok=True)
 Path('static').mkdir(exist_ok=True)
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('logs/web_server.log', encoding='utf-8'),
-        logging.StreamHandler()
-    ]
-)
+# Configure logging (queued, rotating; file and stream I/O happen off the request path)
+configure_logging('logs/web_server.log', level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
@@ -746,14 +741,9 @@ def main():
             img.save(favicon_path, 'PNG')
             logger.info("Created favicon")
         
-        # Initialize database if needed
-        if not Path(DB_PATH).exists():
-            with open('databases/schema.sql', 'r') as f:
-                schema_sql = f.read()
-            
-            with get_db_connection() as conn:
-                conn.executescript(schema_sql)
-                logger.info("Database initialized")
+        # Create the database or bring its schema up to date
+        version = migrate(DB_PATH)
+        logger.info(f"Database at schema version {version}")
         
         # Create default config if it doesn't exist
         if not Path(CONFIG_PATH).exists():